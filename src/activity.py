@@ -0,0 +1,124 @@
+"""
+Login Activity Recorder for Asisten Shadow
+"""
+
+import time
+import atexit
+import weakref
+import threading
+from typing import Dict, Optional, Tuple
+from utils import get_timestamp
+from config import LOGIN_FLUSH_INTERVAL, LOGIN_MAX_PENDING
+
+
+# Semua recorder yang masih hidup, di-flush saat interpreter keluar
+_open_recorders = weakref.WeakSet()
+
+
+def _flush_all_recorders():
+    # Store bisa saja sudah di-flush lebih dulu saat exit; tulis sekali lagi
+    for recorder in list(_open_recorders):
+        if recorder.flush():
+            recorder._store.flush()
+
+
+atexit.register(_flush_all_recorders)
+
+
+class ActivityRecorder:
+    """
+    Buffer statistik login (login_count, last_login) per pengguna
+
+    Login hanya menambah penghitung di memori; record pengguna ditulis
+    dalam satu commit saat ``flush_interval`` terlewati, ``max_pending``
+    login terkumpul, atau saat ``flush``/shutdown.
+    """
+
+    def __init__(self, store, flush_interval: float = LOGIN_FLUSH_INTERVAL,
+                 max_pending: int = LOGIN_MAX_PENDING):
+        """
+        Inisialisasi ActivityRecorder
+
+        Args:
+            store: Store data pengguna
+            flush_interval: Jeda maksimum (detik) sebelum aktivitas ditulis;
+                0 berarti setiap login langsung ditulis
+            max_pending: Jumlah login maksimum yang boleh tertunda
+        """
+        self._store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending: Dict[str, Tuple[int, str]] = {}
+        self._events = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        _open_recorders.add(self)
+
+    def record_login(self, username: str) -> bool:
+        """
+        Mencatat satu login
+
+        Returns:
+            False jika flush yang dipicu login ini gagal
+        """
+        with self._lock:
+            count, _ = self._pending.get(username, (0, None))
+            self._pending[username] = (count + 1, get_timestamp())
+            self._events += 1
+
+            if (self.flush_interval <= 0
+                    or self._events >= self.max_pending
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                with self._store.pinned():
+                    return self._flush_locked()
+        return True
+
+    def pending(self, username: str) -> Optional[Tuple[int, str]]:
+        """Login yang belum ditulis: (jumlah, last_login) atau None"""
+        with self._lock:
+            return self._pending.get(username)
+
+    def discard(self, username: str) -> None:
+        """Membuang aktivitas tertunda (misalnya saat akun dihapus)"""
+        with self._lock:
+            self._pending.pop(username, None)
+
+    def flush(self) -> bool:
+        """Menulis semua aktivitas tertunda dalam satu commit"""
+        with self._lock, self._store.pinned():
+            return self._flush_locked()
+
+    def _flush_locked(self) -> bool:
+        if not self._pending:
+            return True
+
+        applied = []
+        changes = []
+        for username, (count, last_login) in self._pending.items():
+            user = self._store.get(username)
+            if user is None:
+                continue
+            applied.append((user, user.get("login_count", 0), user.get("last_login")))
+            user["login_count"] = user.get("login_count", 0) + count
+            user["last_login"] = last_login
+            changes.append(("set", [username], user))
+
+        if changes and not self._store.commit(changes):
+            # Kembalikan record agar penghitung tidak terhitung dua kali
+            for user, login_count, last_login in applied:
+                user["login_count"] = login_count
+                user["last_login"] = last_login
+            return False
+
+        self._pending.clear()
+        self._events = 0
+        self._last_flush = time.monotonic()
+        return True
+
+    def close(self) -> bool:
+        """Flush lalu berhenti mengikuti shutdown"""
+        success = self.flush()
+        _open_recorders.discard(self)
+        return success
@@ -0,0 +1,209 @@
+"""
+Asyncio API for Asisten Shadow
+
+AsyncNotesManager dan AsyncUserManager membungkus manager biasa: setiap
+operasi (I/O file dan hash KDF) dijalankan di thread pool sehingga event
+loop tidak terblokir. Manager yang dibungkus aman dipakai banyak thread,
+jadi satu instance (dan store-nya) boleh dipakai bersama kode sinkron.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Union
+from notes_manager import NoteBatch, NotesManager
+from user_manager import UserManager
+from config import ASYNC_WORKERS, ASYNC_MAX_PENDING
+
+
+def _offload(name: str, owner: type) -> Callable:
+    async def method(self, *args, **kwargs):
+        return await self._run(getattr(self.manager, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = f"Versi async dari ``{owner.__name__}.{name}``"
+    return method
+
+
+class _AsyncManager:
+    """
+    Dasar manager async dengan thread pool dan antrean terbatas
+
+    Paling banyak ``max_pending`` request boleh menunggu atau berjalan;
+    request berikutnya menunggu slot kosong (backpressure). Slot baru
+    dilepas saat pekerjaan di thread selesai, walaupun pemanggilnya sudah
+    dibatalkan.
+    """
+
+    def __init__(self, manager: Any, executor: Optional[Executor] = None,
+                 max_pending: int = ASYNC_MAX_PENDING, timeout: Optional[float] = None):
+        """
+        Inisialisasi manager async
+
+        Args:
+            manager: Manager sinkron yang dibungkus
+            executor: Executor bersama (misalnya dipakai juga oleh manager
+                async lain); None = thread pool sendiri sebanyak ASYNC_WORKERS
+            max_pending: Jumlah request maksimum yang boleh antre/berjalan
+            timeout: Batas waktu menunggu slot antrean (None = tunggu terus)
+        """
+        self.manager = manager
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=ASYNC_WORKERS or None, thread_name_prefix="asisten-io"
+        )
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def _run(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Menjalankan fungsi blocking di thread pool
+
+        Raises:
+            TimeoutError: Antrean penuh sampai timeout habis
+        """
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Antrean request async penuh") from None
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+        return await asyncio.wrap_future(future)
+
+    async def flush(self) -> bool:
+        """Menulis perubahan tertunda ke disk"""
+        return await self._run(self.manager.flush)
+
+    async def close(self) -> bool:
+        """Flush, melepaskan cache, lalu menghentikan thread pool milik sendiri"""
+        success = await self._run(self.manager.close)
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+        return success
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback) -> bool:
+        await self.close()
+        return False
+
+
+class AsyncNotesManager(_AsyncManager):
+    """
+    Versi asyncio dari NotesManager
+
+    Method mengembalikan nilai yang sama dengan versi sinkronnya. Callback
+    ``progress`` pada export_notes dipanggil dari thread pool.
+    """
+
+    def __init__(self, manager: Optional[NotesManager] = None,
+                 executor: Optional[Executor] = None,
+                 max_pending: int = ASYNC_MAX_PENDING, timeout: Optional[float] = None):
+        """
+        Inisialisasi AsyncNotesManager
+
+        Args:
+            manager: NotesManager yang dibungkus (default NotesManager baru
+                sesuai config)
+            executor: Lihat _AsyncManager
+            max_pending: Lihat _AsyncManager
+            timeout: Lihat _AsyncManager
+        """
+        super().__init__(manager if manager is not None else NotesManager(),
+                         executor, max_pending, timeout)
+
+    open_session = _offload("open_session", NotesManager)
+    change_password = _offload("change_password", NotesManager)
+    end_session = _offload("end_session", NotesManager)
+    add_note = _offload("add_note", NotesManager)
+    get_notes = _offload("get_notes", NotesManager)
+    get_note_by_index = _offload("get_note_by_index", NotesManager)
+    get_note_by_id = _offload("get_note_by_id", NotesManager)
+    list_notes = _offload("list_notes", NotesManager)
+    view_note = _offload("view_note", NotesManager)
+    view_note_by_id = _offload("view_note_by_id", NotesManager)
+    edit_note = _offload("edit_note", NotesManager)
+    edit_note_by_id = _offload("edit_note_by_id", NotesManager)
+    delete_note = _offload("delete_note", NotesManager)
+    delete_note_by_id = _offload("delete_note_by_id", NotesManager)
+    toggle_favorite = _offload("toggle_favorite", NotesManager)
+    toggle_favorite_by_id = _offload("toggle_favorite_by_id", NotesManager)
+    search_notes = _offload("search_notes", NotesManager)
+    query_notes = _offload("query_notes", NotesManager)
+    get_notes_by_tag = _offload("get_notes_by_tag", NotesManager)
+    get_notes_by_tags = _offload("get_notes_by_tags", NotesManager)
+    get_top_tags = _offload("get_top_tags", NotesManager)
+    get_favorites = _offload("get_favorites", NotesManager)
+    get_statistics = _offload("get_statistics", NotesManager)
+    export_notes = _offload("export_notes", NotesManager)
+    import_notes = _offload("import_notes", NotesManager)
+
+    async def open_note(self, username: str, index: int,
+                        key: str = None) -> tuple[bool, Union[AsyncIterator[str], str]]:
+        """
+        Versi async dari ``NotesManager.open_note``
+
+        Returns:
+            Tuple (success: bool, iterator async potongan isi atau pesan
+            error); setiap potongan dibaca/didekripsi di thread pool
+        """
+        success, result = await self._run(self.manager.open_note, username, index, key)
+        if not success:
+            return False, result
+        return True, self._iterate(result)
+
+    async def _iterate(self, chunks: Iterator[str]) -> AsyncIterator[str]:
+        done = object()
+        while True:
+            chunk = await self._run(next, chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+
+    def batch(self, username: str) -> NoteBatch:
+        """Batch mutasi (hanya mencatat operasi); terapkan dengan commit_batch"""
+        return self.manager.batch(username)
+
+    async def commit_batch(self, batch: NoteBatch) -> tuple[bool, str]:
+        """Versi async dari ``NoteBatch.commit``"""
+        return await self._run(batch.commit)
+
+
+class AsyncUserManager(_AsyncManager):
+    """Versi asyncio dari UserManager"""
+
+    def __init__(self, manager: Optional[UserManager] = None,
+                 executor: Optional[Executor] = None,
+                 max_pending: int = ASYNC_MAX_PENDING, timeout: Optional[float] = None):
+        """
+        Inisialisasi AsyncUserManager
+
+        Args:
+            manager: UserManager yang dibungkus (default UserManager baru
+                sesuai config)
+            executor: Lihat _AsyncManager
+            max_pending: Lihat _AsyncManager
+            timeout: Lihat _AsyncManager
+        """
+        super().__init__(manager if manager is not None else UserManager(),
+                         executor, max_pending, timeout)
+
+    register = _offload("register", UserManager)
+    login = _offload("login", UserManager)
+    get_user_info = _offload("get_user_info", UserManager)
+    update_profile = _offload("update_profile", UserManager)
+    change_password = _offload("change_password", UserManager)
+    delete_user = _offload("delete_user", UserManager)
+    get_all_users = _offload("get_all_users", UserManager)
+    user_exists = _offload("user_exists", UserManager)
+    get_user_stats = _offload("get_user_stats", UserManager)
@@ -0,0 +1,154 @@
+"""
+Note Body Store for Asisten Shadow
+"""
+
+import os
+import mmap
+import threading
+from typing import List, Optional
+from utils import sync_file
+from file_lock import FileLock
+
+# Referensi isi catatan di file body: [offset, panjang dalam byte]
+BodyRef = List[int]
+
+
+class BodyStore:
+    """
+    File append-only berisi isi catatan (UTF-8 atau terenkripsi), dibaca lewat mmap
+
+    Metadata catatan hanya menyimpan ``[offset, length]`` sehingga memuat
+    daftar catatan tidak ikut memuat isinya. Isi lama yang sudah diedit atau
+    dihapus tetap tersisa di file (append-only).
+    """
+
+    def __init__(self, filename: str):
+        """
+        Inisialisasi BodyStore
+
+        Args:
+            filename: Path ke file body
+        """
+        self.filename = filename
+        self._writer = None
+        self._reader = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._unsynced = False
+        # Proses lain boleh menambah isi ke file yang sama; offset harus
+        # dibaca dan ditulis tanpa diselingi
+        self._lock = FileLock(filename)
+        self._guard = threading.Lock()
+
+    # ==============================
+    # INTERNAL HELPERS
+    # ==============================
+
+    def _map(self, end: int) -> mmap.mmap:
+        """Memastikan mmap mencakup byte sampai ``end`` (file bisa bertambah)"""
+        mapped = self._mmap
+        if mapped is not None and len(mapped) >= end:
+            return mapped
+
+        with self._guard:
+            if self._mmap is not None and len(self._mmap) >= end:
+                return self._mmap
+
+            if self._reader is None:
+                self._reader = open(self.filename, "rb")
+
+            size = os.fstat(self._reader.fileno()).st_size
+            if size < end:
+                raise ValueError("Referensi isi catatan di luar file body")
+            # mmap lama tidak ditutup karena thread lain mungkin masih
+            # membacanya; ia tertutup sendiri saat tidak dirujuk lagi
+            self._mmap = mmap.mmap(self._reader.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mmap
+
+    # ==============================
+    # PUBLIC METHODS
+    # ==============================
+
+    def append(self, text: str) -> BodyRef:
+        """
+        Menulis isi catatan ke akhir file
+
+        Data langsung terbaca lewat ``read``; panggil ``sync`` sebelum
+        metadata yang merujuknya di-commit agar crash paling buruk hanya
+        menyisakan isi yang tidak terpakai.
+
+        Returns:
+            Referensi [offset, length]
+        """
+        return self.append_bytes(text.encode("utf-8"))
+
+    def append_bytes(self, data: bytes) -> BodyRef:
+        """Seperti append, untuk isi biner (misalnya isi terenkripsi)"""
+        with self._lock.hold(exclusive=True):
+            if self._writer is None:
+                self._writer = open(self.filename, "ab")
+            self._writer.seek(0, os.SEEK_END)
+            offset = self._writer.tell()
+            self._writer.write(data)
+            self._writer.flush()
+        self._unsynced = True
+        return [offset, len(data)]
+
+    def sync(self) -> None:
+        """fsync isi yang baru ditulis sesuai SAVE_DURABILITY"""
+        if self._unsynced:
+            sync_file(self._writer)
+            self._unsynced = False
+
+    def read(self, ref: BodyRef, limit: Optional[int] = None) -> str:
+        """
+        Membaca isi catatan langsung dari halaman yang di-mmap
+
+        Args:
+            ref: Referensi [offset, length]
+            limit: Batas byte yang dibaca (untuk preview); karakter yang
+                terpotong di batas diabaikan
+
+        Returns:
+            Isi catatan
+
+        Raises:
+            OSError: File body tidak bisa dibuka
+            ValueError: Referensi di luar file atau isi rusak
+        """
+        offset, length = ref
+        errors = "strict"
+        if limit is not None and limit < length:
+            length = limit
+            errors = "ignore"
+        if length == 0:
+            return ""
+
+        with memoryview(self._map(offset + length)) as whole:
+            with whole[offset:offset + length] as view:
+                return str(view, "utf-8", errors)
+
+    def read_bytes(self, ref: BodyRef) -> bytes:
+        """
+        Menyalin byte mentah dari file body
+
+        Raises:
+            OSError: File body tidak bisa dibuka
+            ValueError: Referensi di luar file
+        """
+        offset, length = ref
+        if length == 0:
+            return b""
+        return self._map(offset + length)[offset:offset + length]
+
+    def close(self) -> None:
+        """Menutup mmap dan file"""
+        self.sync()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        for f in (self._reader, self._writer):
+            if f is not None:
+                f.close()
+        self._reader = None
+        self._writer = None
+        self._lock.close()
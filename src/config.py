@@ -21,10 +21,37 @@ os.makedirs(DATA_DIR, exist_ok=True)
 USER_FILE = os.path.join(DATA_DIR, "users.json")
 NOTES_FILE = os.path.join(DATA_DIR, "notes.json")
 
+# Storage Settings
+STORAGE_BACKEND = "json"  # "json", "journal", "sharded" atau "sqlite"
+JOURNAL_COMPACT_SIZE = 1024 * 1024  # byte log sebelum dilipat ke snapshot
+STORE_FLUSH_INTERVAL = 0.0  # detik; 0 = tulis langsung setiap perubahan
+STORE_MAX_PENDING = 100  # jumlah perubahan tertunda sebelum flush paksa
+STORE_CHECK_INTERVAL = 0.0  # detik antar cek mtime file oleh proses lain; 0 = setiap akses
+STORAGE_FORMAT = "json"  # "json", "compact", "jsonl" atau "marshal"; dikenali otomatis saat load
+SAVE_DURABILITY = "file"  # "none", "file" (fsync file) atau "dir" (fsync file + direktori)
+STORE_FILE_LOCKING = True  # flock shared/exclusive antar proses lewat <file>.lock (butuh fcntl)
+
 # Security Settings
 MIN_USERNAME_LENGTH = 3
 MIN_PASSWORD_LENGTH = 6
 HASH_ALGORITHM = "sha256"
+KDF_ALGORITHM = "pbkdf2_sha256"  # "pbkdf2_sha256" atau "scrypt" untuk password & kunci catatan
+KDF_PBKDF2_ITERATIONS = 600000
+KDF_SCRYPT_N = 2 ** 15
+KDF_SCRYPT_R = 8
+KDF_SCRYPT_P = 1
+KDF_TARGET_MS = 250  # target latensi per hash untuk `python src/kdf.py`
+VERIFY_EXECUTOR = None  # None (inline), "process" atau "thread" untuk hash/verifikasi KDF
+VERIFY_WORKERS = 0  # 0 = jumlah core
+VERIFY_MAX_QUEUE = 64  # pekerjaan KDF maksimum yang antre sebelum pemanggil menunggu
+ASYNC_WORKERS = 0  # thread I/O untuk AsyncNotesManager/AsyncUserManager; 0 = bawaan ThreadPoolExecutor
+ASYNC_MAX_PENDING = 128  # request async maksimum yang berjalan/antre sebelum pemanggil menunggu
+UNLOCK_CACHE_TTL = 300.0  # detik kunci catatan yang sudah dibuka diingat per sesi; 0 = nonaktif
+UNLOCK_CACHE_SIZE = 256  # entri maksimum (LRU)
+NOTE_ENCRYPTION = None  # None, "aesgcm" atau "chacha20poly1305" untuk isi catatan (butuh paket cryptography)
+NOTE_CIPHER_CHUNK_SIZE = 64 * 1024  # byte teks per chunk terenkripsi (didekripsi bertahap)
+LOGIN_FLUSH_INTERVAL = 5.0  # detik; statistik login ditulis berkala, 0 = setiap login
+LOGIN_MAX_PENDING = 100  # jumlah login tertunda sebelum flush paksa
 
 # UI Settings
 SCREEN_WIDTH = 50
@@ -33,11 +60,16 @@ SEPARATOR_CHAR = "-"
 
 # Note Settings
 MAX_PREVIEW_LENGTH = 30
+LIST_PAGE_SIZE = 20
 MAX_SEARCH_RESULTS = 20
+SEARCH_INDEX_PERSIST = True  # simpan index pencarian ke <notes file>.idx
+SEARCH_PREFIX_MAX_TOKENS = 512  # token maksimum hasil ekspansi query prefix (kata*)
+NOTE_BODY_STORE = False  # simpan isi catatan baru di <notes file>.bodies (dibaca via mmap)
 
 # Export Settings
 EXPORT_FORMAT = "json"
 EXPORT_INDENT = 4
+IMPORT_CHUNK_SIZE = 5000  # catatan per commit saat import
 
 # Validation Messages
 MESSAGES = {
@@ -57,10 +89,13 @@ MESSAGES = {
     "note_deleted": "✔ Catatan berhasil dihapus!",
     "no_notes": "⚠ Belum ada catatan.",
     "invalid_note_number": "❌ Nomor catatan tidak valid!",
+    "note_not_found": "❌ Catatan tidak ditemukan!",
     "export_success": "✔ Catatan berhasil diekspor!",
     "export_failed": "❌ Gagal mengekspor catatan!",
     "no_search_results": "⚠ Tidak ada catatan yang cocok.",
     "save_failed": "❌ Gagal menyimpan data!",
+    "session_opened": "✔ Kunci catatan terbuka!",
+    "session_locked": "🔑 Catatan terenkripsi! Buka sesi dengan password dulu.",
 }
 
 # Feature Flags
@@ -0,0 +1,100 @@
+"""
+Inter-Process File Lock for Asisten Shadow
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from config import STORE_FILE_LOCKING
+
+try:
+    import fcntl
+except ImportError:  # Windows: tanpa penguncian antar proses
+    fcntl = None
+
+
+class FileLock:
+    """
+    Lock shared/exclusive antar proses lewat ``fcntl.flock``
+
+    Lock dipasang pada file ``<path>.lock`` terpisah, bukan pada file data,
+    karena file data diganti lewat rename saat disimpan. Descriptor file
+    lock hanya terbuka selama lock dipegang, sehingga banyak FileLock (mis.
+    satu per shard) tidak menghabiskan batas file terbuka. Di dalam satu
+    proses, pemegang lock (shared maupun exclusive) diserialkan per thread.
+    Pemakaian bersarang di thread yang sama diperbolehkan selama tidak
+    menaikkan shared menjadi exclusive.
+    """
+
+    def __init__(self, path: str, enabled: bool = STORE_FILE_LOCKING):
+        """
+        Inisialisasi FileLock
+
+        Args:
+            path: Path file data yang dilindungi
+            enabled: False (atau fcntl tidak tersedia) = lock tidak
+                melakukan apa-apa
+        """
+        self.lock_file = path + ".lock"
+        self.enabled = enabled and fcntl is not None
+
+        self._fd: Optional[int] = None
+        self._exclusive = False
+        self._depth = 0
+        self._guard = threading.RLock()
+
+    def _acquire(self, exclusive: bool) -> None:
+        directory = os.path.dirname(self.lock_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _release(self) -> None:
+        # Menutup descriptor ikut melepas flock
+        fd, self._fd = self._fd, None
+        os.close(fd)
+
+    @contextmanager
+    def hold(self, exclusive: bool = False) -> Iterator[None]:
+        """
+        Memegang lock selama blok with
+
+        Args:
+            exclusive: True untuk penulis (exclusive), False untuk pembaca
+                (shared, boleh bersamaan dengan pembaca lain)
+
+        Raises:
+            RuntimeError: Meminta exclusive saat thread ini memegang shared
+        """
+        with self._guard:
+            # Thread lain di proses ini tetap diserialkan walau flock nonaktif
+            if not self.enabled:
+                yield
+                return
+
+            if self._depth == 0:
+                self._acquire(exclusive)
+                self._exclusive = exclusive
+            elif exclusive and not self._exclusive:
+                raise RuntimeError("Shared lock tidak bisa dinaikkan menjadi exclusive")
+
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._release()
+
+    def close(self) -> None:
+        """Tidak ada descriptor yang tertinggal di luar ``hold``; untuk kompatibilitas"""
+        with self._guard:
+            if self._fd is not None and self._depth == 0:
+                self._release()
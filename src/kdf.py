@@ -0,0 +1,238 @@
+"""
+Key Derivation Module for Asisten Shadow
+
+Format hash yang disimpan:
+    pbkdf2_sha256$<iterasi>$<salt hex>$<hash hex>
+    scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+
+Format lama tetap bisa diverifikasi dan di-hash ulang saat dipakai:
+    <salt>$<sha256 hex>   (password pengguna versi lama)
+    <sha256/md5 hex>      (kunci catatan tanpa salt)
+
+Kalibrasi biaya ke target latensi di mesin ini:
+    python src/kdf.py [target_ms] [pbkdf2_sha256|scrypt]
+"""
+
+import sys
+import hmac
+import time
+import hashlib
+import secrets
+from typing import Dict, Optional, Tuple
+from config import (
+    KDF_ALGORITHM, KDF_PBKDF2_ITERATIONS, KDF_SCRYPT_N, KDF_SCRYPT_R, KDF_SCRYPT_P,
+    KDF_TARGET_MS
+)
+
+ALGORITHMS = ("pbkdf2_sha256", "scrypt")
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def default_params(algorithm: Optional[str] = None) -> Dict[str, int]:
+    """Parameter biaya dari config untuk algoritma yang dipilih"""
+    algorithm = algorithm or KDF_ALGORITHM
+    if algorithm == "pbkdf2_sha256":
+        return {"iterations": KDF_PBKDF2_ITERATIONS}
+    if algorithm == "scrypt":
+        return {"n": KDF_SCRYPT_N, "r": KDF_SCRYPT_R, "p": KDF_SCRYPT_P}
+    raise ValueError(f"Algoritma KDF tidak dikenal: {algorithm}")
+
+
+def current_scheme() -> Tuple[str, Dict[str, int]]:
+    """Algoritma dan parameter biaya yang sedang dikonfigurasi"""
+    return KDF_ALGORITHM, default_params(KDF_ALGORITHM)
+
+
+def _derive(secret: str, salt: bytes, algorithm: str, params: Dict[str, int]) -> bytes:
+    if algorithm == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac("sha256", secret.encode(), salt,
+                                   params["iterations"], HASH_BYTES)
+
+    n, r, p = params["n"], params["r"], params["p"]
+    return hashlib.scrypt(secret.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p + (1 << 20), dklen=HASH_BYTES)
+
+
+def derive_key(secret: str, salt: bytes, algorithm: Optional[str] = None,
+               params: Optional[Dict[str, int]] = None) -> bytes:
+    """
+    Menurunkan kunci 32 byte dari password (misalnya untuk membungkus kunci data)
+
+    Args:
+        secret: Password
+        salt: Salt acak yang disimpan bersama hasil turunan
+        algorithm: "pbkdf2_sha256" atau "scrypt" (default KDF_ALGORITHM)
+        params: Parameter biaya (default dari config)
+
+    Returns:
+        Kunci mentah 32 byte
+    """
+    algorithm = algorithm or KDF_ALGORITHM
+    return _derive(secret, salt, algorithm, params or default_params(algorithm))
+
+
+def hash_secret(secret: str, algorithm: Optional[str] = None,
+                params: Optional[Dict[str, int]] = None) -> str:
+    """
+    Membuat hash bersalt untuk password atau kunci catatan
+
+    Args:
+        secret: Password/kunci
+        algorithm: "pbkdf2_sha256" atau "scrypt" (default KDF_ALGORITHM)
+        params: Parameter biaya (default dari config)
+
+    Returns:
+        String hash yang menyimpan algoritma, parameter dan salt
+    """
+    algorithm = algorithm or KDF_ALGORITHM
+    params = params or default_params(algorithm)
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _derive(secret, salt, algorithm, params).hex()
+
+    if algorithm == "pbkdf2_sha256":
+        return f"pbkdf2_sha256${params['iterations']}${salt.hex()}${digest}"
+    return f"scrypt${params['n']}${params['r']}${params['p']}${salt.hex()}${digest}"
+
+
+def parse_hash(encoded: str) -> Optional[Tuple[str, Dict[str, int], bytes, bytes]]:
+    """
+    Mengurai hash KDF
+
+    Returns:
+        Tuple (algoritma, parameter, salt, hash) atau None untuk format lama
+        maupun string yang tidak valid
+    """
+    parts = encoded.split("$")
+    try:
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            params = {"iterations": int(parts[1])}
+        elif parts[0] == "scrypt" and len(parts) == 6:
+            params = {"n": int(parts[1]), "r": int(parts[2]), "p": int(parts[3])}
+        else:
+            return None
+        return parts[0], params, bytes.fromhex(parts[-2]), bytes.fromhex(parts[-1])
+    except ValueError:
+        return None
+
+
+def _verify_legacy(encoded: str, secret: str) -> bool:
+    if "$" in encoded:
+        salt, stored = encoded.split("$", 1)
+        check = hashlib.sha256((salt + secret).encode()).hexdigest()
+    else:
+        stored = encoded
+        algorithm = "md5" if len(encoded) == 32 else "sha256"
+        check = hashlib.new(algorithm, secret.encode()).hexdigest()
+    return hmac.compare_digest(check.encode(), stored.encode())
+
+
+def verify_secret(encoded: str, secret: str) -> bool:
+    """
+    Memverifikasi password/kunci terhadap hash (format baru maupun lama)
+
+    Args:
+        encoded: Hash yang tersimpan
+        secret: Password/kunci yang dimasukkan
+
+    Returns:
+        True jika cocok
+    """
+    if not encoded:
+        return False
+
+    parsed = parse_hash(encoded)
+    if parsed is None:
+        if encoded.startswith(ALGORITHMS):
+            return False
+        return _verify_legacy(encoded, secret)
+
+    algorithm, params, salt, stored = parsed
+    try:
+        derived = _derive(secret, salt, algorithm, params)
+    except (ValueError, MemoryError):
+        return False
+    return hmac.compare_digest(derived, stored)
+
+
+def needs_rehash(encoded: str, algorithm: Optional[str] = None,
+                 params: Optional[Dict[str, int]] = None) -> bool:
+    """True jika hash memakai format lama atau parameter yang berbeda dari config"""
+    algorithm = algorithm or KDF_ALGORITHM
+    parsed = parse_hash(encoded)
+    if parsed is None:
+        return True
+    return parsed[0] != algorithm or parsed[1] != (params or default_params(algorithm))
+
+
+def benchmark(algorithm: Optional[str] = None, params: Optional[Dict[str, int]] = None,
+              rounds: int = 3) -> float:
+    """Waktu (detik) satu hash; diambil yang tercepat dari beberapa percobaan"""
+    algorithm = algorithm or KDF_ALGORITHM
+    params = params or default_params(algorithm)
+    salt = secrets.token_bytes(SALT_BYTES)
+
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _derive("benchmark", salt, algorithm, params)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(target_ms: float = KDF_TARGET_MS,
+              algorithm: Optional[str] = None) -> Dict[str, int]:
+    """
+    Mencari parameter biaya yang mendekati target latensi di mesin ini
+
+    Args:
+        target_ms: Target waktu satu hash (milidetik)
+        algorithm: Algoritma yang dikalibrasi
+
+    Returns:
+        Parameter untuk default_params/config
+    """
+    algorithm = algorithm or KDF_ALGORITHM
+    target = target_ms / 1000
+
+    if algorithm == "pbkdf2_sha256":
+        # Biaya PBKDF2 linear terhadap iterasi: ukur sekali lalu skalakan
+        iterations = 1000
+        while True:
+            elapsed = benchmark(algorithm, {"iterations": iterations})
+            if elapsed >= target / 4 or iterations >= 1 << 26:
+                break
+            iterations *= 4
+        scaled = int(iterations * target / max(elapsed, 1e-9))
+        return {"iterations": max(1000, scaled // 1000 * 1000)}
+
+    if algorithm == "scrypt":
+        # n harus pangkat dua; naikkan selama hash masih di bawah target
+        params = {"n": 1 << 10, "r": KDF_SCRYPT_R, "p": KDF_SCRYPT_P}
+        while params["n"] < 1 << 20:
+            candidate = dict(params, n=params["n"] * 2)
+            if benchmark(algorithm, candidate, rounds=1) > target:
+                break
+            params = candidate
+        return params
+
+    raise ValueError(f"Algoritma KDF tidak dikenal: {algorithm}")
+
+
+def main():
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else KDF_TARGET_MS
+    algorithm = sys.argv[2] if len(sys.argv) > 2 else KDF_ALGORITHM
+
+    params = calibrate(target_ms, algorithm)
+    elapsed = benchmark(algorithm, params) * 1000
+    print(f"Target {target_ms:.0f} ms, hasil {elapsed:.0f} ms per hash. Set di config.py:")
+    print(f'KDF_ALGORITHM = "{algorithm}"')
+    for name, value in params.items():
+        prefix = "KDF_PBKDF2_" if algorithm == "pbkdf2_sha256" else "KDF_SCRYPT_"
+        print(f"{prefix}{name.upper()} = {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
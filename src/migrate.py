@@ -0,0 +1,119 @@
+"""
+Migration Tool for Asisten Shadow
+
+Memindahkan data dari users.json/notes.json (termasuk journal
+``<file>.log`` dan shard ``notes.d/``) ke backend SQLite.
+
+Penggunaan:
+    python src/migrate.py [users.json] [notes.json] [backend sumber]
+"""
+
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+from config import USER_FILE, NOTES_FILE, STORAGE_BACKEND
+from storage import open_store, shard_dir, sqlite_path
+from sqlite_store import SqliteNoteStore, SqliteUserStore
+
+
+def _source_backend(filename: str, backend: str, kind: str) -> str:
+    """Backend sumber; bila config sudah "sqlite", tebak dari file yang ada"""
+    if backend != "sqlite":
+        return backend
+    if kind == "notes" and os.path.isdir(shard_dir(filename)):
+        return "sharded"
+    if os.path.exists(filename + ".log"):
+        return "journal"
+    return "json"
+
+
+def _leftover_files(filename: str, kind: str) -> List[str]:
+    """File journal/shard yang seharusnya berisi data"""
+    leftovers = []
+    if os.path.exists(filename + ".log"):
+        leftovers.append(filename + ".log")
+    if kind == "notes" and os.path.isdir(shard_dir(filename)) and os.listdir(shard_dir(filename)):
+        leftovers.append(shard_dir(filename))
+    return leftovers
+
+
+def _read_source(filename: str, backend: str, kind: str) -> Tuple[Dict, Dict]:
+    """Membaca seluruh data dan metadata lewat store backend sumber"""
+    store = open_store(filename, _source_backend(filename, backend, kind), kind)
+    try:
+        data = {key: store.get(key) for key in store.keys()}
+        meta = {}
+        if kind == "notes":
+            for key in data:
+                if store.meta(key):
+                    meta[key] = dict(store.meta(key))
+        return data, meta
+    finally:
+        # Tidak ada yang di-commit, jadi tidak ada yang ditulis balik
+        store.close()
+
+
+def migrate_to_sqlite(user_file: str = USER_FILE, notes_file: str = NOTES_FILE,
+                      backend: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Migrasi data JSON ke database SQLite
+
+    Data dibaca lewat store backend sumber, sehingga record journal yang
+    belum dilipat dan shard per pengguna ikut terbawa. Data lama tidak
+    dihapus. Migrasi aman diulang: setiap pengguna ditulis ulang
+    seluruhnya dalam satu transaksi per file.
+
+    Args:
+        user_file: Path ke file users.json
+        notes_file: Path ke file notes.json
+        backend: Backend sumber ("json", "journal" atau "sharded");
+            None = STORAGE_BACKEND, ditebak dari file bila sudah "sqlite"
+
+    Returns:
+        Tuple (success: bool, message: str)
+    """
+    backend = backend or STORAGE_BACKEND
+    users, _ = _read_source(user_file, backend, "users")
+    notes, notes_meta = _read_source(notes_file, backend, "notes")
+
+    # Sumber kosong padahal ada journal/shard: salah backend, jangan
+    # sampai migrasi "berhasil" dengan 0 data
+    for filename, kind, data in ((user_file, "users", users), (notes_file, "notes", notes)):
+        leftovers = _leftover_files(filename, kind)
+        if not data and leftovers:
+            return False, (f"❌ Tidak ada data terbaca dari {filename}, padahal ada "
+                           f"{', '.join(leftovers)}. Periksa backend sumber!")
+
+    user_store = SqliteUserStore(sqlite_path(user_file))
+    note_store = SqliteNoteStore(sqlite_path(notes_file))
+
+    try:
+        if not user_store.commit([("set", [name], user) for name, user in users.items()]):
+            return False, "❌ Gagal memigrasi data pengguna!"
+
+        changes = [("set", [name], user_notes) for name, user_notes in notes.items()]
+        changes.extend(("meta", [name], meta) for name, meta in notes_meta.items())
+        if not note_store.commit(changes):
+            return False, "❌ Gagal memigrasi catatan!"
+    finally:
+        user_store.close()
+        note_store.close()
+
+    total_notes = sum(len(user_notes) for user_notes in notes.values())
+    return True, f"✔ {len(users)} pengguna dan {total_notes} catatan berhasil dimigrasi!"
+
+
+def main():
+    user_file = sys.argv[1] if len(sys.argv) > 1 else USER_FILE
+    notes_file = sys.argv[2] if len(sys.argv) > 2 else NOTES_FILE
+    backend = sys.argv[3] if len(sys.argv) > 3 else None
+
+    success, message = migrate_to_sqlite(user_file, notes_file, backend)
+    print(message)
+    if success:
+        print('Set STORAGE_BACKEND = "sqlite" di config.py untuk memakai database.')
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
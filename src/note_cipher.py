@@ -0,0 +1,411 @@
+"""
+Note Encryption Module for Asisten Shadow
+
+Isi catatan dienkripsi dengan AEAD (AES-256-GCM atau ChaCha20-Poly1305)
+memakai kunci data acak per pengguna. Kunci data dibungkus kunci turunan
+password (KDF) dan disimpan di metadata pengguna; setelah dibuka sekali
+saat login, kunci disimpan di KeyRing sampai sesi berakhir.
+
+Format isi terenkripsi (bisa didekripsi bertahap per chunk):
+    header (40 byte): "ASE" | versi | algoritma | id kunci (8) |
+                      ukuran chunk (4) | salt (16) | prefix nonce (7)
+    chunk:            ciphertext + tag 16 byte per ``chunk_size`` byte teks
+
+Setiap isi dienkripsi dengan kunci turunan HMAC(kunci data, salt acak),
+bukan kunci data langsung. Prefix nonce 7 byte saja terlalu pendek untuk
+dipilih acak berulang kali dengan satu kunci (peluang tabrakan ~n²/2^57),
+tetapi di sini setiap kunci turunan hanya dipakai untuk satu isi, jadi
+pasangan kunci+nonce baru berulang jika salt 128 bit ikut bertabrakan.
+
+Nonce tiap chunk = prefix | nomor chunk (4) | flag chunk terakhir (1) dan
+header ikut diautentikasi, sehingga chunk yang ditukar, diubah urutannya
+atau dipotong gagal didekripsi.
+
+Benchmark throughput di mesin ini:
+    python src/note_cipher.py [ukuran_mb]
+"""
+
+import sys
+import hmac
+import time
+import codecs
+import hashlib
+import base64
+import struct
+import secrets
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from kdf import SALT_BYTES, current_scheme, derive_key
+from config import NOTE_ENCRYPTION, NOTE_CIPHER_CHUNK_SIZE
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+except ImportError:  # hanya dibutuhkan jika enkripsi catatan dipakai
+    AESGCM = ChaCha20Poly1305 = None
+
+    class InvalidTag(Exception):
+        pass
+
+ALGORITHMS = {"aesgcm": 1, "chacha20poly1305": 2}
+DEFAULT_ALGORITHM = NOTE_ENCRYPTION or "aesgcm"
+_ALGORITHM_NAMES = {code: name for name, code in ALGORITHMS.items()}
+
+MAGIC = b"ASE"
+VERSION = 2
+KEY_BYTES = 32
+KEY_ID_BYTES = 8
+NONCE_BYTES = 12
+SALT_BYTES_PER_NOTE = 16
+TAG_BYTES = 16
+
+_HEADER = struct.Struct(">3sBB8sI16s7s")
+HEADER_SIZE = _HEADER.size
+
+# Fungsi penurun kunci: (password, salt, algoritma KDF, parameter) -> 32 byte
+DeriveFn = Callable[[str, bytes, str, Dict[str, int]], bytes]
+
+
+class SessionLockedError(LookupError):
+    """Kunci data pengguna belum dibuka di sesi ini"""
+
+
+def _aead(algorithm: str, key: bytes):
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Algoritma enkripsi tidak dikenal: {algorithm}")
+    if AESGCM is None:
+        raise RuntimeError(
+            "Enkripsi catatan membutuhkan paket 'cryptography' (pip install cryptography)"
+        )
+    return AESGCM(key) if algorithm == "aesgcm" else ChaCha20Poly1305(key)
+
+
+def check_algorithm(algorithm: str) -> None:
+    """
+    Memastikan algoritma dikenal dan paket cryptography tersedia
+
+    Raises:
+        ValueError: Algoritma tidak dikenal
+        RuntimeError: Paket cryptography tidak terpasang
+    """
+    _aead(algorithm, bytes(KEY_BYTES))
+
+
+def _nonce(prefix: bytes, index: int, final: bool) -> bytes:
+    return prefix + struct.pack(">I?", index, final)
+
+
+def parse_header(header: bytes) -> Tuple[str, bytes, int, bytes, bytes]:
+    """
+    Mengurai header isi terenkripsi
+
+    Returns:
+        Tuple (algoritma, id kunci, ukuran chunk, salt, prefix nonce)
+
+    Raises:
+        ValueError: Bukan isi terenkripsi yang dikenal
+    """
+    if len(header) < HEADER_SIZE:
+        raise ValueError("Header isi terenkripsi terpotong")
+
+    magic, version, code, key_id, chunk_size, salt, prefix = _HEADER.unpack(
+        header[:HEADER_SIZE]
+    )
+    if magic != MAGIC or version != VERSION or code not in _ALGORITHM_NAMES or not chunk_size:
+        raise ValueError("Header isi terenkripsi tidak valid")
+    return _ALGORITHM_NAMES[code], key_id, chunk_size, salt, prefix
+
+
+class NoteCipher:
+    """Enkripsi/dekripsi chunked isi catatan dengan satu kunci data"""
+
+    def __init__(self, key: bytes, key_id: bytes, algorithm: str = DEFAULT_ALGORITHM,
+                 chunk_size: int = NOTE_CIPHER_CHUNK_SIZE):
+        """
+        Inisialisasi NoteCipher
+
+        Args:
+            key: Kunci data 32 byte
+            key_id: Id kunci (disimpan di header agar kunci bisa dicari)
+            algorithm: Algoritma untuk isi baru; isi lama didekripsi sesuai
+                algoritma di header-nya
+            chunk_size: Byte teks per chunk untuk isi baru
+        """
+        self.key_id = key_id
+        self.algorithm = algorithm
+        self.chunk_size = chunk_size
+        self._key = key
+        check_algorithm(algorithm)
+        # Kunci terpisah untuk blind index agar hash token tidak memakai kunci data langsung
+        self._index_key = hmac.new(key, b"asisten-shadow blind index", hashlib.sha256).digest()
+
+    def _aead_for(self, algorithm: str, salt: bytes):
+        """AEAD dengan kunci turunan untuk satu isi (lihat docstring modul)"""
+        key = hmac.new(self._key, b"asisten-shadow note key" + salt, hashlib.sha256).digest()
+        return _aead(algorithm, key)
+
+    def encrypt(self, text: str) -> bytes:
+        """
+        Mengenkripsi teks menjadi header + chunk
+
+        Args:
+            text: Isi catatan
+
+        Returns:
+            Byte terenkripsi (teks kosong tetap menghasilkan satu chunk)
+        """
+        data = memoryview(text.encode("utf-8"))
+        salt = secrets.token_bytes(SALT_BYTES_PER_NOTE)
+        prefix = secrets.token_bytes(NONCE_BYTES - 5)
+        header = _HEADER.pack(MAGIC, VERSION, ALGORITHMS[self.algorithm],
+                              self.key_id, self.chunk_size, salt, prefix)
+        aead = self._aead_for(self.algorithm, salt)
+
+        count = max(1, -(-len(data) // self.chunk_size))
+        parts = [header]
+        for index in range(count):
+            chunk = data[index * self.chunk_size:(index + 1) * self.chunk_size]
+            parts.append(aead.encrypt(_nonce(prefix, index, index == count - 1),
+                                      bytes(chunk), header))
+        return b"".join(parts)
+
+    def iter_decrypt(self, read: Callable[[int, int], bytes], size: int) -> Iterator[str]:
+        """
+        Mendekripsi isi chunk demi chunk
+
+        Hanya chunk yang sedang didekripsi yang dibaca, sehingga preview
+        cukup membaca chunk pertama.
+
+        Args:
+            read: Fungsi read(offset, length) yang mengembalikan byte isi
+            size: Panjang total isi terenkripsi
+
+        Returns:
+            Iterator potongan teks
+
+        Raises:
+            ValueError: Isi rusak, terpotong atau dienkripsi kunci lain
+        """
+        header = read(0, HEADER_SIZE)
+        algorithm, key_id, chunk_size, salt, prefix = parse_header(header)
+        if key_id != self.key_id:
+            raise ValueError("Isi catatan dienkripsi dengan kunci lain")
+
+        aead = self._aead_for(algorithm, salt)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        offset, index = HEADER_SIZE, 0
+        while True:
+            length = min(chunk_size + TAG_BYTES, size - offset)
+            if length < TAG_BYTES:
+                raise ValueError("Isi terenkripsi terpotong")
+
+            final = offset + length == size
+            try:
+                plain = aead.decrypt(_nonce(prefix, index, final), read(offset, length), header)
+            except InvalidTag:
+                raise ValueError("Isi terenkripsi rusak atau kunci salah") from None
+
+            text = decoder.decode(plain, final)
+            if text:
+                yield text
+            if final:
+                return
+            offset += length
+            index += 1
+
+    def decrypt(self, blob: bytes) -> str:
+        """Mendekripsi seluruh isi sekaligus"""
+        return "".join(self.iter_decrypt(lambda offset, length: blob[offset:offset + length],
+                                         len(blob)))
+
+    def blind_digests(self, tokens: Iterable[str]) -> List[bytes]:
+        """
+        Hash HMAC token untuk blind index (token sama -> hash sama)
+
+        Args:
+            tokens: Token huruf kecil (lihat search_index.tokenize)
+
+        Returns:
+            List hash per token unik
+        """
+        return [hmac.new(self._index_key, token.encode("utf-8"), hashlib.sha256).digest()
+                for token in dict.fromkeys(tokens)]
+
+
+# ==============================
+# KUNCI DATA PENGGUNA
+# ==============================
+
+def wrap_data_key(key: bytes, key_id: bytes, password: str,
+                  derive: DeriveFn = derive_key) -> Dict:
+    """
+    Membungkus kunci data dengan kunci turunan password
+
+    Args:
+        key: Kunci data 32 byte
+        key_id: Id kunci data
+        password: Password pengguna
+        derive: Fungsi penurun kunci (misalnya lewat pool verifikasi)
+
+    Returns:
+        Record untuk metadata pengguna (tanpa kunci data dalam bentuk terbuka)
+    """
+    algorithm, params = current_scheme()
+    salt = secrets.token_bytes(SALT_BYTES)
+    nonce = secrets.token_bytes(NONCE_BYTES)
+    wrapped = _aead("aesgcm", derive(password, salt, algorithm, params)).encrypt(nonce, key, key_id)
+    return {
+        "id": key_id.hex(),
+        "kdf": algorithm,
+        "params": params,
+        "salt": salt.hex(),
+        "key": base64.b64encode(nonce + wrapped).decode(),
+    }
+
+
+def unwrap_data_key(record: Dict, password: str, algorithm: str = DEFAULT_ALGORITHM,
+                    derive: DeriveFn = derive_key) -> NoteCipher:
+    """
+    Membuka kunci data yang dibungkus wrap_data_key
+
+    Args:
+        record: Record dari metadata pengguna
+        password: Password pengguna
+        algorithm: Algoritma untuk isi yang dienkripsi selanjutnya
+        derive: Fungsi penurun kunci
+
+    Returns:
+        NoteCipher dengan kunci data pengguna
+
+    Raises:
+        ValueError: Password salah atau record rusak
+    """
+    try:
+        key_id = bytes.fromhex(record["id"])
+        salt = bytes.fromhex(record["salt"])
+        blob = base64.b64decode(record["key"])
+        kek = derive(password, salt, record["kdf"], record["params"])
+        key = _aead("aesgcm", kek).decrypt(blob[:NONCE_BYTES], blob[NONCE_BYTES:], key_id)
+    except (KeyError, TypeError, InvalidTag, ValueError):
+        raise ValueError("Password salah atau kunci data rusak") from None
+    return NoteCipher(key, key_id, algorithm)
+
+
+def create_data_key(password: str, algorithm: str = DEFAULT_ALGORITHM,
+                    derive: DeriveFn = derive_key) -> Tuple[Dict, NoteCipher]:
+    """
+    Membuat kunci data baru untuk pengguna
+
+    Returns:
+        Tuple (record untuk metadata, NoteCipher)
+    """
+    key = secrets.token_bytes(KEY_BYTES)
+    key_id = secrets.token_bytes(KEY_ID_BYTES)
+    cipher = NoteCipher(key, key_id, algorithm)
+    return wrap_data_key(key, key_id, password, derive), cipher
+
+
+def rewrap_data_key(cipher: NoteCipher, password: str, derive: DeriveFn = derive_key) -> Dict:
+    """Membungkus ulang kunci data yang sudah terbuka (password atau KDF baru)"""
+    return wrap_data_key(cipher._key, cipher.key_id, password, derive)
+
+
+def needs_rewrap(record: Dict) -> bool:
+    """True jika kunci data dibungkus dengan algoritma/parameter KDF lama"""
+    algorithm, params = current_scheme()
+    return record.get("kdf") != algorithm or record.get("params") != params
+
+
+class KeyRing:
+    """
+    Kunci data pengguna yang sudah dibuka selama sesi
+
+    Kunci dicari lewat username (untuk enkripsi) atau lewat id kunci di
+    header isi terenkripsi (untuk dekripsi).
+    """
+
+    def __init__(self):
+        self._users: Dict[str, NoteCipher] = {}
+        self._ids: Dict[bytes, NoteCipher] = {}
+        self._lock = threading.Lock()
+
+    def add(self, username: str, cipher: NoteCipher) -> None:
+        """Menyimpan kunci data pengguna untuk sesi ini"""
+        with self._lock:
+            previous = self._users.pop(username, None)
+            if previous is not None:
+                self._ids.pop(previous.key_id, None)
+            self._users[username] = cipher
+            self._ids[cipher.key_id] = cipher
+
+    def get(self, username: str) -> Optional[NoteCipher]:
+        """Kunci data pengguna, atau None jika sesi belum dibuka"""
+        with self._lock:
+            return self._users.get(username)
+
+    def find(self, header: bytes) -> NoteCipher:
+        """
+        Mencari kunci untuk isi terenkripsi berdasarkan header-nya
+
+        Raises:
+            ValueError: Header tidak valid
+            SessionLockedError: Kunci belum dibuka
+        """
+        key_id = parse_header(header)[1]
+        with self._lock:
+            cipher = self._ids.get(key_id)
+        if cipher is None:
+            raise SessionLockedError(key_id.hex())
+        return cipher
+
+    def discard(self, username: str) -> bool:
+        """Melupakan kunci data pengguna; True jika sebelumnya terbuka"""
+        with self._lock:
+            cipher = self._users.pop(username, None)
+            if cipher is None:
+                return False
+            self._ids.pop(cipher.key_id, None)
+            return True
+
+
+def benchmark(algorithm: str = "aesgcm", size: int = 64 * 1024 * 1024,
+              chunk_size: int = NOTE_CIPHER_CHUNK_SIZE) -> Tuple[float, float]:
+    """
+    Mengukur throughput enkripsi/dekripsi isi catatan (termasuk UTF-8)
+
+    Args:
+        algorithm: Algoritma AEAD
+        size: Ukuran teks uji dalam byte
+        chunk_size: Byte teks per chunk
+
+    Returns:
+        Tuple (MB/s enkripsi, MB/s dekripsi)
+    """
+    cipher = NoteCipher(secrets.token_bytes(KEY_BYTES), secrets.token_bytes(KEY_ID_BYTES),
+                        algorithm, chunk_size)
+    text = "catatan " * (size // 8)
+    megabytes = len(text) / (1024 * 1024)
+
+    start = time.perf_counter()
+    blob = cipher.encrypt(text)
+    encrypt_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cipher.decrypt(blob)
+    decrypt_time = time.perf_counter() - start
+
+    return megabytes / max(encrypt_time, 1e-9), megabytes / max(decrypt_time, 1e-9)
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 64
+    print(f"Isi {size_mb:.0f} MB, chunk {NOTE_CIPHER_CHUNK_SIZE // 1024} KB")
+    for algorithm in ALGORITHMS:
+        encrypt_rate, decrypt_rate = benchmark(algorithm, int(size_mb * 1024 * 1024))
+        print(f"{algorithm:<18} enkripsi {encrypt_rate:8.0f} MB/s   "
+              f"dekripsi {decrypt_rate:8.0f} MB/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,26 +2,457 @@
 Notes Management Module for Asisten Shadow
 """
 from src.utils import truncate_text
-from typing import Dict, List, Optional, Tuple
+import gzip
+import heapq
+import json
+import base64
+import marshal
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 from utils import (
-    load_data, save_data, hash_password, encode_text, 
-    decode_text, get_timestamp, truncate_text
+    encode_text, decode_text, decode_preview, decode_base64_range, get_timestamp,
+    truncate_text, iter_json_items
 )
-from config import NOTES_FILE, MAX_PREVIEW_LENGTH, MESSAGES
+from config import (
+    NOTES_FILE, MAX_PREVIEW_LENGTH, MAX_SEARCH_RESULTS, LIST_PAGE_SIZE,
+    SEARCH_INDEX_PERSIST, NOTE_BODY_STORE, NOTE_ENCRYPTION, EXPORT_FORMAT,
+    EXPORT_INDENT, IMPORT_CHUNK_SIZE, MESSAGES
+)
+from storage import JsonStore, open_store
+from body_store import BodyStore
+from kdf import hash_secret, verify_secret, needs_rehash, derive_key
+from note_cipher import (
+    DEFAULT_ALGORITHM, HEADER_SIZE, KeyRing, SessionLockedError, check_algorithm,
+    create_data_key, needs_rewrap, rewrap_data_key, unwrap_data_key
+)
+from verifier import VerificationExecutor, default_verifier
+from unlock_cache import UnlockCache
+from rw_lock import RWLockTable, read_operation, write_operation
+from search_index import (
+    BlindIndex, IdIndex, IndexCache, NoteStats, SearchIndex, TagIndex, pack_blind, tokenize
+)
+
+
+def _note_copy(note: Dict) -> Dict:
+    # Salinan lepas dari data live (dibuat di bawah lock pengguna): pemanggil
+    # boleh mengubahnya tanpa commit, dan tidak melihat catatan setengah diubah
+    return marshal.loads(marshal.dumps(note))
 
 
 class NotesManager:
-    """Class untuk mengelola catatan pengguna"""
+    """
+    Class untuk mengelola catatan pengguna
+
+    Aman dipakai dari banyak thread. Setiap pengguna punya lock
+    reader/writer sendiri: operasi pengguna berbeda berjalan paralel dan
+    operasi baca pengguna yang sama tidak saling menunggu.
+    """
     
-    def __init__(self, notes_file: str = NOTES_FILE):
+    def __init__(self, notes_file: str = NOTES_FILE, store: Optional[JsonStore] = None,
+                 external_bodies: bool = NOTE_BODY_STORE,
+                 verifier: Optional[VerificationExecutor] = None,
+                 unlock_cache: Optional[UnlockCache] = None,
+                 encryption: Optional[str] = NOTE_ENCRYPTION):
         """
         Inisialisasi NotesManager
         
         Args:
             notes_file: Path ke file database notes
+            store: Store yang sudah ada (opsional, default sesuai
+                STORAGE_BACKEND)
+            external_bodies: Simpan isi catatan baru di file body terpisah
+                (``<notes_file>.bodies``); metadata hanya berisi offset
+            verifier: Executor untuk hash/verifikasi kunci (default sesuai
+                VERIFY_EXECUTOR; None di config berarti inline)
+            unlock_cache: Cache kunci yang sudah terverifikasi per sesi
+                (default UnlockCache baru sesuai config)
+            encryption: Algoritma AEAD untuk isi catatan baru ("aesgcm" atau
+                "chacha20poly1305"); None = tanpa enkripsi. Isi terenkripsi
+                hanya bisa dibaca/ditulis setelah open_session
+        
+        Raises:
+            ValueError: Algoritma enkripsi tidak dikenal
+            RuntimeError: Enkripsi diminta tetapi paket cryptography tidak ada
         """
+        if encryption:
+            check_algorithm(encryption)
+        
         self.notes_file = notes_file
+        self.external_bodies = external_bodies
+        self.encryption = encryption
+        self._store = store if store is not None else open_store(notes_file)
+        self._bodies = BodyStore(notes_file + ".bodies")
+        self._verifier = verifier if verifier is not None else default_verifier()
+        self._unlocks = unlock_cache if unlock_cache is not None else UnlockCache()
+        self._keys = KeyRing()
+        self._user_locks = RWLockTable()
+        self._repair_lock = threading.Lock()
+        self._search = SearchIndex(
+            self._user_notes,
+            self._store.generation_of,
+            index_file=notes_file + ".idx" if SEARCH_INDEX_PERSIST else None,
+            text_of=self._search_text,
+        )
+        # Catatan terenkripsi dicari lewat hash token di metadata, tanpa dekripsi
+        self._blind = IndexCache(
+            lambda notes: BlindIndex.build(
+                None if note["is_locked"] else note.get("blind") for note in notes
+            ),
+            self._user_notes,
+            self._store.generation_of,
+        )
+        self._tags = IndexCache(
+            lambda notes: TagIndex.build(note.get("tags", []) for note in notes),
+            self._user_notes,
+            self._store.generation_of,
+        )
+        self._stats = IndexCache(NoteStats.build, self._user_notes, self._store.generation_of)
+        self._ids = IndexCache(IdIndex.build, self._user_notes, self._store.generation_of)
+    
+    def _user_notes(self, username: str) -> List[Dict]:
+        return self._store.get(username, [])
+    
+    @contextmanager
+    def _locked(self, username: str, write: bool = False) -> Iterator[None]:
+        """Memegang lock pengguna dan menahan store selama satu operasi"""
+        lock = self._user_locks.get(username)
+        with (lock.write() if write else lock.read()), self._store.pinned():
+            yield
+    
+    def flush(self) -> bool:
+        """Menulis perubahan yang tertunda dan index pencarian ke disk"""
+        self._bodies.sync()
+        return self._store.flush() and self._search.save(self._locked)
+    
+    def close(self) -> bool:
+        """Flush perubahan dan melepaskan cache"""
+        saved = self._search.save(self._locked)
+        self._bodies.close()
+        return self._store.close() and saved
+    
+    def _commit(self, changes: List) -> bool:
+        # Isi di file body harus tersimpan sebelum metadata yang merujuknya
+        self._bodies.sync()
+        return self._store.commit(changes)
+    
+    # Isi catatan disimpan inline sebagai base64 ("content") atau di file
+    # body sebagai [offset, length] ("body"); keduanya bisa bercampur. Catatan
+    # dengan "encrypted" menyimpan isi terenkripsi (note_cipher) di field yang
+    # sama; metadata lain (tag, waktu, status) tetap terbuka.
+    
+    def _note_text(self, note: Dict) -> str:
+        try:
+            if note.get("encrypted"):
+                return "".join(self._iter_text(note))
+            if "body" not in note:
+                return decode_text(note["content"])
+            return self._bodies.read(note["body"])
+        except (OSError, ValueError):
+            return "[ERROR: Data rusak]"
+    
+    def _note_preview(self, note: Dict) -> str:
+        if note.get("encrypted"):
+            try:
+                # Cukup chunk pertama yang didekripsi
+                text = next(self._iter_text(note), "")
+            except SessionLockedError:
+                return "[Catatan Terenkripsi]"
+            except (OSError, ValueError):
+                return "[ERROR: Data rusak]"
+            return truncate_text(text, MAX_PREVIEW_LENGTH)
+        
+        if "body" not in note:
+            return decode_preview(note["content"], MAX_PREVIEW_LENGTH)
+        try:
+            # Satu karakter UTF-8 paling banyak 4 byte; baca secukupnya saja
+            text = self._bodies.read(note["body"], (MAX_PREVIEW_LENGTH + 1) * 4)
+        except (OSError, ValueError):
+            return "[ERROR: Data rusak]"
+        return truncate_text(text, MAX_PREVIEW_LENGTH)
+    
+    def _iter_text(self, note: Dict) -> Iterator[str]:
+        """
+        Isi catatan per potongan; isi terenkripsi didekripsi chunk demi chunk
+        
+        Raises:
+            SessionLockedError: Kunci data pemilik belum dibuka
+            OSError, ValueError: Isi tidak bisa dibaca atau rusak
+        """
+        if not note.get("encrypted"):
+            yield self._note_text(note)
+            return
+        
+        if "body" in note:
+            offset, size = note["body"]
+            
+            def read(start: int, length: int) -> bytes:
+                length = max(0, min(length, size - start))
+                return self._bodies.read_bytes([offset + start, length])
+        else:
+            content = note["content"]
+            size = len(content) * 3 // 4 - content[-2:].count("=")
+            
+            def read(start: int, length: int) -> bytes:
+                return decode_base64_range(content, start, length)
+        
+        cipher = self._keys.find(read(0, HEADER_SIZE))
+        yield from cipher.iter_decrypt(read, size)
+    
+    def _search_text(self, note: Dict) -> Optional[str]:
+        # Isi terenkripsi tidak masuk index kata (yang bisa disimpan ke disk);
+        # catatan tersebut dicari lewat blind index
+        if note.get("encrypted"):
+            return None
+        return self._note_text(note)
+    
+    def _hash_key(self, key: str) -> str:
+        if self._verifier is not None:
+            return self._verifier.hash(key)
+        return hash_secret(key)
+    
+    def _verify_key(self, username: str, note: Dict, key: str) -> bool:
+        if self._unlocks.check(username, note, key):
+            return True
+        
+        if self._verifier is not None:
+            verified = self._verifier.verify(note["lock"], key)
+        else:
+            verified = verify_secret(note["lock"], key)
+        
+        if verified:
+            self._unlocks.remember(username, note, key)
+        return verified
+    
+    def _upgrade_lock(self, username: str, note: Dict, key: str) -> bool:
+        """Hash ulang kunci lama (SHA-256 tanpa salt) atau parameter KDF lama"""
+        if not needs_rehash(note["lock"]):
+            return False
+        note["lock"] = self._hash_key(key)
+        self._unlocks.remember(username, note, key)
+        return True
+    
+    def _derive_key(self, password: str, salt: bytes, algorithm: str,
+                    params: Dict[str, int]) -> bytes:
+        if self._verifier is not None:
+            return self._verifier.submit(derive_key, password, salt, algorithm, params).result()
+        return derive_key(password, salt, algorithm, params)
+    
+    @write_operation
+    def open_session(self, username: str, password: str) -> tuple[bool, str]:
+        """
+        Membuka kunci data pengguna untuk sesi ini (dipanggil setelah login)
+        
+        Kunci data dibuat saat enkripsi pertama kali dipakai dan disimpan
+        terbungkus password di metadata pengguna. KDF hanya dijalankan sekali
+        per sesi; setelah itu kunci diambil dari memori sampai end_session.
+        
+        Args:
+            username: Username pemilik catatan
+            password: Password login pengguna
+            
+        Returns:
+            Tuple (success: bool, message: str)
+        """
+        meta = self._store.meta(username)
+        record = meta.get("data_key")
+        
+        if record is None:
+            if not self.encryption:
+                return True, MESSAGES["session_opened"]
+            new_record, cipher = create_data_key(password, self.encryption, self._derive_key)
+        else:
+            try:
+                cipher = unwrap_data_key(record, password,
+                                         self.encryption or DEFAULT_ALGORITHM,
+                                         self._derive_key)
+            except ValueError:
+                return False, MESSAGES["wrong_password"]
+            # Parameter KDF sudah diganti: bungkus ulang sekali, seperti rehash password
+            new_record = rewrap_data_key(cipher, password, self._derive_key) \
+                if needs_rewrap(record) else None
+        
+        if new_record is not None:
+            meta["data_key"] = new_record
+            if not self._commit([("meta", [username], meta)]):
+                if record is None:
+                    meta.pop("data_key", None)
+                else:
+                    meta["data_key"] = record
+                return False, MESSAGES["save_failed"]
+        
+        self._keys.add(username, cipher)
+        return True, MESSAGES["session_opened"]
+    
+    @write_operation
+    def change_password(self, username: str, old_password: str,
+                        new_password: str) -> tuple[bool, str]:
+        """
+        Membungkus ulang kunci data dengan password baru
+        
+        Dipanggil oleh UserManager.change_password (lihat parameter
+        notes_manager) agar password login dan kunci data tetap sejalan;
+        isi catatan tidak perlu dienkripsi ulang.
+        
+        Args:
+            username: Username pemilik catatan
+            old_password: Password lama
+            new_password: Password baru
+            
+        Returns:
+            Tuple (success: bool, message: str)
+        """
+        meta = self._store.meta(username)
+        record = meta.get("data_key")
+        if record is None:
+            return True, "✔ Password berhasil diubah!"
+        
+        try:
+            cipher = unwrap_data_key(record, old_password,
+                                     self.encryption or DEFAULT_ALGORITHM, self._derive_key)
+        except ValueError:
+            return False, "❌ Password lama salah!"
+        
+        meta["data_key"] = rewrap_data_key(cipher, new_password, self._derive_key)
+        if not self._commit([("meta", [username], meta)]):
+            meta["data_key"] = record
+            return False, MESSAGES["save_failed"]
+        return True, "✔ Password berhasil diubah!"
+    
+    @write_operation
+    def end_session(self, username: str) -> None:
+        """Melupakan kunci catatan dan kunci data pengguna (dipanggil saat logout)"""
+        self._unlocks.forget(username)
+        self._keys.discard(username)
+    
+    def _session_required(self, username: str) -> bool:
+        """True jika isi baru harus dienkripsi tetapi kunci data belum dibuka"""
+        return bool(self.encryption) and self._keys.get(username) is None
+    
+    def _text_fields(self, username: str, text: str) -> Dict:
+        cipher = self._keys.get(username) if self.encryption else None
+        if cipher is not None:
+            blob = cipher.encrypt(text)
+            fields = {"encrypted": True, "blind": pack_blind(cipher.blind_digests(tokenize(text)))}
+            if self.external_bodies:
+                fields["body"] = self._bodies.append_bytes(blob)
+            else:
+                fields["content"] = base64.b64encode(blob).decode()
+            return fields
+        
+        if self.external_bodies:
+            return {"body": self._bodies.append(text)}
+        return {"content": encode_text(text)}
+    
+    def _set_text(self, username: str, note: Dict, text: str) -> None:
+        note.pop("content", None)
+        note.pop("body", None)
+        note.pop("encrypted", None)
+        note.pop("blind", None)
+        note.update(self._text_fields(username, text))
+    
+    def _allocate_id(self, username: str, user_notes: List[Dict]) -> int:
+        """Mengalokasikan id catatan berikutnya (tidak pernah dipakai ulang)"""
+        meta = self._store.meta(username)
+        highest = meta.get("next_id")
+        if highest is None:
+            highest = max((note.get("id") or 0 for note in user_notes), default=0) + 1
+        meta["next_id"] = highest + 1
+        return highest
+    
+    def _id_index(self, username: str) -> IdIndex:
+        id_index = self._ids.get(username)
+        if id_index.duplicates:
+            # Perbaikan data lama bisa terjadi di jalur baca; pembaca lain
+            # pengguna yang sama tidak boleh ikut memperbaikinya bersamaan
+            with self._repair_lock:
+                id_index = self._ids.get(username)
+                if id_index.duplicates:
+                    self._repair_ids(username)
+                    self._ids.discard(username)
+                    id_index = self._ids.get(username)
+        return id_index
+    
+    def _repair_ids(self, username: str) -> bool:
+        """Memberi id baru pada catatan lama yang id-nya bentrok atau kosong"""
+        user_notes = self._user_notes(username)
+        meta = self._store.meta(username)
+        highest = max((note.get("id") or 0 for note in user_notes), default=0)
+        meta["next_id"] = max(meta.get("next_id", 1), highest + 1)
+        
+        seen = set()
+        changes = []
+        for i, note in enumerate(user_notes):
+            if note.get("id") is None or note["id"] in seen:
+                note["id"] = self._allocate_id(username, user_notes)
+                changes.append(("set", [username, i], note))
+            seen.add(note["id"])
+        
+        changes.append(("meta", [username], meta))
+        return self._store.commit(changes)
+    
+    def _position_of(self, username: str, note_id: int) -> Optional[int]:
+        return self._id_index(username).find(note_id)
+    
+    # Index turunan (pencarian, tag, statistik, id) diperbarui di jalur yang sama
+    # dengan mutasi data sehingga tidak perlu dibangun ulang.
     
+    def _index_added(self, username: str, note: Dict, content: str) -> None:
+        search_index = self._search.mutable(username)
+        if search_index is not None:
+            search_index.add(None if note["is_locked"] or note.get("encrypted") else content)
+        
+        blind_index = self._blind.mutable(username)
+        if blind_index is not None:
+            blind_index.add(None if note["is_locked"] else note.get("blind"))
+        
+        tag_index = self._tags.mutable(username)
+        if tag_index is not None:
+            tag_index.add(note["tags"])
+        
+        stats = self._stats.mutable(username)
+        if stats is not None:
+            stats.add(note)
+        
+        id_index = self._ids.mutable(username)
+        if id_index is not None:
+            id_index.add(note)
+    
+    def _index_updated(self, username: str, index: int, note: Dict,
+                       content: Optional[str] = None, text_changed: bool = False,
+                       tags_changed: bool = False) -> None:
+        search_index = self._search.mutable(username)
+        if search_index is not None and text_changed:
+            if note["is_locked"] or note.get("encrypted"):
+                search_index.update(index, None)
+            else:
+                search_index.update(
+                    index, content if content is not None else self._search_text(note)
+                )
+        
+        blind_index = self._blind.mutable(username)
+        if blind_index is not None and text_changed:
+            blind_index.update(index, None if note["is_locked"] else note.get("blind"))
+        
+        tag_index = self._tags.mutable(username)
+        if tag_index is not None and tags_changed:
+            tag_index.update(index, note.get("tags", []))
+        
+        stats = self._stats.mutable(username)
+        if stats is not None:
+            stats.update(index, note)
+    
+    def _discard_indexes(self, username: str) -> None:
+        for cache in (self._search, self._blind, self._tags, self._stats, self._ids):
+            cache.discard(username)
+    
+    def _index_removed(self, username: str, index: int) -> None:
+        for cache in (self._search, self._blind, self._tags, self._stats, self._ids):
+            user_index = cache.mutable(username)
+            if user_index is not None:
+                user_index.remove(index)
+    
+    @write_operation
     def add_note(self, username: str, content: str, lock_key: str = "", 
                  tags: List[str] = None) -> tuple[bool, str]:
         """
@@ -36,32 +467,58 @@ class NotesManager:
         Returns:
             Tuple (success: bool, message: str)
         """
+        changes = []
+        savepoint = _Savepoint(self, username, create=True)
+        success, message = self._add(username, content, lock_key, tags, changes)
+        if success:
+            changes.append(("meta", [username], self._store.meta(username)))
+        return self._commit_result(success, message, changes, savepoint)
+    
+    def _commit_result(self, success: bool, message: str, changes: List,
+                       savepoint: "_Savepoint") -> tuple[bool, str]:
+        if not success:
+            savepoint.release()
+            return False, message
+        if self._commit(changes):
+            return True, message
+        # Perubahan yang ditolak tidak boleh ikut tertulis commit berikutnya
+        savepoint.restore()
+        return False, MESSAGES["save_failed"]
+    
+    # Langkah mutasi internal: mengubah data live dan index, lalu mencatat
+    # perubahan ke ``changes`` tanpa commit. Dipakai method publik dan NoteBatch.
+    
+    def _add(self, username: str, content: str, lock_key: str,
+             tags: Optional[List[str]], changes: List) -> tuple[bool, str]:
         if not content:
             return False, "❌ Catatan tidak boleh kosong!"
         
-        notes = load_data(self.notes_file)
+        if self._session_required(username):
+            return False, MESSAGES["session_locked"]
         
-        if username not in notes:
-            notes[username] = []
+        user_notes = self._store.setdefault(username, [])
+        note_data = self._new_note(username, user_notes, content, lock_key, tags)
+        user_notes.append(note_data)
         
-        note_data = {
-            "id": len(notes[username]) + 1,
-            "content": encode_text(content),
-            "lock": hash_password(lock_key) if lock_key else "",
+        self._index_added(username, note_data, content)
+        
+        changes.append(("append", [username], note_data))
+        return True, MESSAGES["note_added"]
+    
+    def _new_note(self, username: str, user_notes: List[Dict], content: str,
+                  lock_key: str = "", tags: List[str] = None) -> Dict:
+        return {
+            "id": self._allocate_id(username, user_notes),
+            **self._text_fields(username, content),
+            "lock": self._hash_key(lock_key) if lock_key else "",
             "is_locked": bool(lock_key),
             "created_at": get_timestamp(),
             "updated_at": get_timestamp(),
             "tags": tags or [],
             "favorite": False
         }
-        
-        notes[username].append(note_data)
-        
-        if save_data(self.notes_file, notes):
-            return True, MESSAGES["note_added"]
-        
-        return False, MESSAGES["save_failed"]
     
+    @read_operation
     def get_notes(self, username: str, include_locked: bool = True) -> List[Dict]:
         """
         Mendapatkan semua catatan pengguna
@@ -71,16 +528,16 @@ class NotesManager:
             include_locked: Apakah catatan terkunci disertakan
             
         Returns:
-            List catatan
+            List salinan catatan
         """
-        notes = load_data(self.notes_file)
-        user_notes = notes.get(username, [])
+        user_notes = self._store.get(username, [])
         
         if not include_locked:
-            return [note for note in user_notes if not note["is_locked"]]
+            return [_note_copy(note) for note in user_notes if not note["is_locked"]]
         
-        return user_notes
+        return [_note_copy(note) for note in user_notes]
     
+    @read_operation
     def get_note_by_index(self, username: str, index: int) -> Optional[Dict]:
         """
         Mendapatkan catatan berdasarkan index
@@ -90,29 +547,100 @@ class NotesManager:
             index: Index catatan (0-based)
             
         Returns:
-            Dictionary catatan atau None
+            Salinan dictionary catatan atau None
         """
-        notes = self.get_notes(username)
+        notes = self._user_notes(username)
         
         if 0 <= index < len(notes):
-            return notes[index]
+            return _note_copy(notes[index])
         
         return None
     
-    def display_notes_list(self, username: str, show_locked: bool = True) -> List[Dict]:
+    @read_operation
+    def get_note_by_id(self, username: str, note_id: int) -> Optional[Dict]:
+        """
+        Mendapatkan catatan berdasarkan id
+        
+        Args:
+            username: Username pemilik catatan
+            note_id: Id catatan
+            
+        Returns:
+            Salinan dictionary catatan atau None
+        """
+        index = self._position_of(username, note_id)
+        if index is None:
+            return None
+        
+        return _note_copy(self._user_notes(username)[index])
+    
+    @read_operation
+    def list_notes(self, username: str, offset: int = 0, limit: int = LIST_PAGE_SIZE,
+                   sort_by: Optional[str] = None, descending: bool = True,
+                   include_locked: bool = True) -> Tuple[List[Tuple[int, Dict]], int]:
+        """
+        Mendapatkan satu halaman catatan tanpa men-decode isi catatan
+        
+        Args:
+            username: Username pemilik catatan
+            offset: Jumlah catatan yang dilewati
+            limit: Jumlah catatan per halaman
+            sort_by: None (urutan simpan), "updated_at", "created_at"
+                atau "favorite" (favorite dulu, lalu updated_at)
+            descending: Urutan menurun untuk sort_by
+            include_locked: Apakah catatan terkunci disertakan
+            
+        Returns:
+            Tuple (list tuple (index, note), total catatan)
+        """
+        notes = self._user_notes(username)
+        entries = [(i, note) for i, note in enumerate(notes)
+                   if include_locked or not note["is_locked"]]
+        
+        if sort_by is None:
+            page = entries[offset:offset + limit]
+            return [(i, _note_copy(note)) for i, note in page], len(entries)
+        
+        if sort_by == "favorite":
+            def key(entry):
+                return entry[1].get("favorite", False), entry[1]["updated_at"]
+        elif sort_by in ("updated_at", "created_at"):
+            def key(entry):
+                return entry[1][sort_by]
+        else:
+            raise ValueError(f"sort_by tidak dikenal: {sort_by}")
+        
+        # Hanya offset + limit teratas yang perlu diurutkan penuh
+        select = heapq.nlargest if descending else heapq.nsmallest
+        page = select(offset + limit, entries, key=key)[offset:]
+        return [(i, _note_copy(note)) for i, note in page], len(entries)
+    
+    @read_operation
+    def display_notes_list(self, username: str, show_locked: bool = True,
+                           offset: int = 0, limit: Optional[int] = None,
+                           sort_by: Optional[str] = None) -> List[Dict]:
         """
         Menampilkan daftar catatan dengan format tabel
         
+        Hanya awal isi catatan yang di-decode untuk preview.
+        
         Args:
             username: Username pemilik catatan
             show_locked: Apakah menampilkan catatan terkunci
+            offset: Jumlah catatan yang dilewati
+            limit: Jumlah catatan yang ditampilkan (None = semua)
+            sort_by: Urutan tampilan, lihat list_notes
             
         Returns:
-            List catatan
+            List catatan yang ditampilkan
         """
-        notes = self.get_notes(username, include_locked=show_locked)
+        if limit is None:
+            limit = len(self._user_notes(username))
+        
+        page, total = self.list_notes(username, offset, limit, sort_by,
+                                      include_locked=show_locked)
         
-        if not notes:
+        if not page:
             print(f"\n{MESSAGES['no_notes']}")
             return []
         
@@ -120,15 +648,14 @@ class NotesManager:
         print(f"{'No':<5} {'Status':<10} {'Preview':<35} {'Tags':<15} {'Updated':<15}")
         print("-"*80)
         
-        for i, note in enumerate(notes, 1):
+        for i, note in page:
             status = "🔒 Locked" if note["is_locked"] else "🔓 Open"
             favorite = "⭐" if note.get("favorite", False) else ""
             
-            content = decode_text(note["content"])
-            preview = truncate_text(content, MAX_PREVIEW_LENGTH)
-            
             if note["is_locked"]:
                 preview = "[Catatan Terkunci]"
+            else:
+                preview = self._note_preview(note)
             
             tags_str = ", ".join(note.get("tags", [])[:2])
             if len(note.get("tags", [])) > 2:
@@ -136,11 +663,14 @@ class NotesManager:
             
             updated = note["updated_at"][:16]  # YYYY-MM-DD HH:MM
             
-            print(f"{i:<5} {status:<10} {preview:<35} {tags_str:<15} {updated:<15} {favorite}")
+            print(f"{i + 1:<5} {status:<10} {preview:<35} {tags_str:<15} {updated:<15} {favorite}")
         
         print("-"*80)
-        print(f"Total: {len(notes)} catatan\n")
-        return notes
+        if len(page) < total:
+            print(f"Menampilkan {offset + 1}-{offset + len(page)} dari {total} catatan\n")
+        else:
+            print(f"Total: {total} catatan\n")
+        return [note for _, note in page]
     
     def view_note(self, username: str, index: int, key: str = None) -> tuple[bool, Optional[str]]:
         """
@@ -154,22 +684,87 @@ class NotesManager:
         Returns:
             Tuple (success: bool, content: str atau None)
         """
-        note = self.get_note_by_index(username, index)
+        return self._read_all(*self.open_note(username, index, key))
+    
+    def open_note(self, username: str, index: int,
+                  key: str = None) -> tuple[bool, Union[Iterator[str], str]]:
+        """
+        Membuka isi catatan secara bertahap
         
-        if not note:
-            return False, MESSAGES["invalid_note_number"]
+        Isi terenkripsi didekripsi per chunk saat iterator dibaca, sehingga
+        catatan besar tidak perlu didekripsi sekaligus di memori.
         
-        # Check if note is locked
-        if note["is_locked"]:
-            if key is None:
-                return False, "🔑 Catatan terkunci! Masukkan kunci."
+        Args:
+            username: Username pemilik catatan
+            index: Index catatan
+            key: Kunci untuk membuka catatan terkunci
             
-            if hash_password(key) != note["lock"]:
-                return False, MESSAGES["wrong_key"]
+        Returns:
+            Tuple (success: bool, iterator potongan isi atau pesan error)
+        """
+        return self._open_note(username, index, key)
+    
+    def _open_note(self, username: str, index: int, key: Optional[str],
+                   by_id: bool = False) -> tuple[bool, Union[Iterator[str], str]]:
+        with self._locked(username):
+            if by_id:
+                index = self._position_of(username, index)
+                if index is None:
+                    return False, MESSAGES["note_not_found"]
+            
+            note = self.get_note_by_index(username, index)
+            
+            if not note:
+                return False, MESSAGES["invalid_note_number"]
+            
+            # Check if note is locked
+            stale_lock = False
+            if note["is_locked"]:
+                if key is None:
+                    return False, "🔑 Catatan terkunci! Masukkan kunci."
+                
+                if not self._verify_key(username, note, key):
+                    return False, MESSAGES["wrong_key"]
+                stale_lock = needs_rehash(note["lock"])
+            
+            if note.get("encrypted") and self._keys.get(username) is None:
+                return False, MESSAGES["session_locked"]
+            
+            # Iterator dibaca setelah lock dilepas: pakai salinan field saat ini
+            # (isi lama di file body tidak pernah ditimpa)
+            chunks = self._iter_text(dict(note))
+        
+        # Read lock tidak bisa dinaikkan; hash kunci lama diperbarui terpisah
+        if stale_lock:
+            self._rehash_lock(username, note["id"], key)
+        return True, chunks
+    
+    @write_operation
+    def _rehash_lock(self, username: str, note_id: int, key: str) -> None:
+        index = self._position_of(username, note_id)
+        if index is None:
+            return
+        
+        note = self._user_notes(username)[index]
+        # Kunci bisa saja sudah diganti pemanggil lain sejak diverifikasi
+        if not note["is_locked"] or not self._verify_key(username, note, key):
+            return
+        if self._upgrade_lock(username, note, key):
+            self._commit([("set", [username, index], note)])
+    
+    def _read_all(self, success: bool,
+                  result: Union[Iterator[str], str]) -> tuple[bool, Optional[str]]:
+        if not success:
+            return False, result
         
-        content = decode_text(note["content"])
-        return True, content
+        try:
+            return True, "".join(result)
+        except SessionLockedError:
+            return False, MESSAGES["session_locked"]
+        except (OSError, ValueError):
+            return True, "[ERROR: Data rusak]"
     
+    @write_operation
     def edit_note(self, username: str, index: int, new_content: str = None, 
                   new_lock: Optional[str] = None, tags: List[str] = None,
                   key: str = None) -> tuple[bool, str]:
@@ -187,25 +782,37 @@ class NotesManager:
         Returns:
             Tuple (success: bool, message: str)
         """
-        notes = load_data(self.notes_file)
-        user_notes = notes.get(username, [])
+        changes = []
+        savepoint = _Savepoint(self, username, index)
+        success, message = self._edit(username, index, new_content, new_lock,
+                                      tags, key, changes)
+        return self._commit_result(success, message, changes, savepoint)
+    
+    def _edit(self, username: str, index: int, new_content: Optional[str],
+              new_lock: Optional[str], tags: Optional[List[str]],
+              key: Optional[str], changes: List) -> tuple[bool, str]:
+        user_notes = self._store.get(username, [])
         
         if not 0 <= index < len(user_notes):
             return False, MESSAGES["invalid_note_number"]
         
         note = user_notes[index]
         
+        if new_content is not None and self._session_required(username):
+            return False, MESSAGES["session_locked"]
+        
         # Verify key if note is locked
         if note["is_locked"]:
             if key is None:
                 return False, "🔑 Masukkan kunci untuk mengedit catatan!"
             
-            if hash_password(key) != note["lock"]:
+            if not self._verify_key(username, note, key):
                 return False, MESSAGES["wrong_key"]
+            self._upgrade_lock(username, note, key)
         
         # Update content
         if new_content is not None:
-            note["content"] = encode_text(new_content)
+            self._set_text(username, note, new_content)
             note["updated_at"] = get_timestamp()
         
         # Update lock
@@ -214,18 +821,23 @@ class NotesManager:
                 note["lock"] = ""
                 note["is_locked"] = False
             else:
-                note["lock"] = hash_password(new_lock)
+                note["lock"] = self._hash_key(new_lock)
                 note["is_locked"] = True
         
         # Update tags
         if tags is not None:
             note["tags"] = tags
         
-        if save_data(self.notes_file, notes):
-            return True, MESSAGES["note_edited"]
+        self._index_updated(
+            username, index, note, new_content,
+            text_changed=new_content is not None or new_lock is not None,
+            tags_changed=tags is not None,
+        )
         
-        return False, MESSAGES["save_failed"]
+        changes.append(("set", [username, index], note))
+        return True, MESSAGES["note_edited"]
     
+    @write_operation
     def delete_note(self, username: str, index: int, key: str = None) -> tuple[bool, str]:
         """
         Menghapus catatan
@@ -238,8 +850,14 @@ class NotesManager:
         Returns:
             Tuple (success: bool, message: str)
         """
-        notes = load_data(self.notes_file)
-        user_notes = notes.get(username, [])
+        changes = []
+        savepoint = _Savepoint(self, username)
+        success, message = self._delete(username, index, key, changes)
+        return self._commit_result(success, message, changes, savepoint)
+    
+    def _delete(self, username: str, index: int, key: Optional[str],
+                changes: List) -> tuple[bool, str]:
+        user_notes = self._store.get(username, [])
         
         if not 0 <= index < len(user_notes):
             return False, MESSAGES["invalid_note_number"]
@@ -251,21 +869,27 @@ class NotesManager:
             if key is None:
                 return False, "🔑 Masukkan kunci untuk menghapus catatan!"
             
-            if hash_password(key) != note["lock"]:
+            if not self._verify_key(username, note, key):
                 return False, MESSAGES["wrong_key"]
         
         # Delete note
         del user_notes[index]
+        self._unlocks.forget(username, note.get("id"))
         
-        if save_data(self.notes_file, notes):
-            return True, MESSAGES["note_deleted"]
+        self._index_removed(username, index)
         
-        return False, MESSAGES["save_failed"]
+        changes.append(("del", [username, index], None))
+        return True, MESSAGES["note_deleted"]
     
+    @read_operation
     def search_notes(self, username: str, keyword: str, 
                      search_tags: bool = False) -> List[Tuple[int, Dict]]:
         """
-        Mencari catatan berdasarkan keyword
+        Mencari catatan berdasarkan keyword (substring, tanpa membedakan huruf)
+        
+        Hanya catatan yang lolos index pencarian yang di-decode. Catatan
+        terenkripsi dicocokkan per kata utuh lewat blind index tanpa
+        didekripsi, dan hanya jika sesi pengguna sudah dibuka.
         
         Args:
             username: Username pemilik catatan
@@ -275,30 +899,74 @@ class NotesManager:
         Returns:
             List tuple (index, note)
         """
-        notes = self.get_notes(username)
-        results = []
-        
+        notes = self._store.get(username, [])
         keyword_lower = keyword.lower()
         
-        for i, note in enumerate(notes):
+        candidates = self._search.get(username).candidates(keyword)
+        if candidates is None:
+            candidates = range(len(notes))
+        
+        matched = set()
+        for i in candidates:
+            note = notes[i]
+            
             # Skip locked notes
             if note["is_locked"]:
                 continue
             
             # Search in content
-            content = decode_text(note["content"]).lower()
-            if keyword_lower in content:
-                results.append((i, note))
-                continue
-            
-            # Search in tags if enabled
-            if search_tags:
+            content = self._search_text(note)
+            if content is not None and keyword_lower in content.lower():
+                matched.add(i)
+        
+        cipher = self._keys.get(username)
+        keyword_tokens = tokenize(keyword)
+        if cipher is not None and keyword_tokens:
+            matched.update(self._blind.get(username).find(cipher.blind_digests(keyword_tokens)))
+        
+        # Search in tags if enabled
+        if search_tags:
+            for i, note in enumerate(notes):
+                if i in matched or note["is_locked"]:
+                    continue
+                
                 tags = [tag.lower() for tag in note.get("tags", [])]
                 if any(keyword_lower in tag for tag in tags):
-                    results.append((i, note))
+                    matched.add(i)
+        
+        return [(i, _note_copy(notes[i])) for i in sorted(matched)]
+    
+    @read_operation
+    def query_notes(self, username: str, query: str,
+                    limit: int = MAX_SEARCH_RESULTS) -> List[Tuple[int, Dict]]:
+        """
+        Mencari catatan lewat index dengan hasil berperingkat
+        
+        Query mendukung kata utuh, prefix (``pyth*``) dan frasa
+        (``"python tutorial"``); semua bagian harus cocok. Catatan terenkripsi
+        ikut dicari lewat blind index (kata dan frasa sebagai kumpulan kata;
+        prefix tidak didukung) jika sesi pengguna sudah dibuka.
+        
+        Args:
+            username: Username pemilik catatan
+            query: String query
+            limit: Jumlah hasil maksimum
+            
+        Returns:
+            List tuple (index, note) dari skor tertinggi
+        """
+        notes = self._store.get(username, [])
+        results = self._search.get(username).query(query, limit)
         
-        return results
+        cipher = self._keys.get(username)
+        if cipher is not None:
+            results += self._blind.get(username).query(query, cipher.blind_digests)
+            results.sort(key=lambda item: (-item[1], item[0]))
+            results = results[:limit] if limit else results
+        
+        return [(i, _note_copy(notes[i])) for i, _ in results]
     
+    @read_operation
     def get_notes_by_tag(self, username: str, tag: str) -> List[Tuple[int, Dict]]:
         """
         Mendapatkan catatan berdasarkan tag
@@ -310,21 +978,42 @@ class NotesManager:
         Returns:
             List tuple (index, note)
         """
-        notes = self.get_notes(username)
-        results = []
-        
-        tag_lower = tag.lower()
+        return self.get_notes_by_tags(username, [tag])
+    
+    @read_operation
+    def get_notes_by_tags(self, username: str, tags: List[str],
+                          match_all: bool = True) -> List[Tuple[int, Dict]]:
+        """
+        Mendapatkan catatan berdasarkan beberapa tag
         
-        for i, note in enumerate(notes):
-            if note["is_locked"]:
-                continue
+        Args:
+            username: Username pemilik catatan
+            tags: Daftar tag yang dicari
+            match_all: True = catatan harus memiliki semua tag (AND),
+                False = cukup salah satu tag (OR)
             
-            tags = [t.lower() for t in note.get("tags", [])]
-            if tag_lower in tags:
-                results.append((i, note))
+        Returns:
+            List tuple (index, note), tanpa catatan terkunci
+        """
+        notes = self._user_notes(username)
+        positions = self._tags.get(username).find(tags, match_all)
+        return [(i, _note_copy(notes[i])) for i in positions if not notes[i]["is_locked"]]
+    
+    @read_operation
+    def get_top_tags(self, username: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Mendapatkan tag yang paling banyak dipakai
         
-        return results
+        Args:
+            username: Username pemilik catatan
+            limit: Jumlah tag maksimum
+            
+        Returns:
+            List tuple (tag, jumlah catatan), tag dalam huruf kecil
+        """
+        return self._tags.get(username).top(limit)
     
+    @write_operation
     def toggle_favorite(self, username: str, index: int) -> tuple[bool, str]:
         """
         Toggle status favorite catatan
@@ -336,22 +1025,85 @@ class NotesManager:
         Returns:
             Tuple (success: bool, message: str)
         """
-        notes = load_data(self.notes_file)
-        user_notes = notes.get(username, [])
+        changes = []
+        savepoint = _Savepoint(self, username, index)
+        success, message = self._set_favorite(username, index, None, changes)
+        return self._commit_result(success, message, changes, savepoint)
+    
+    def _set_favorite(self, username: str, index: int, favorite: Optional[bool],
+                      changes: List) -> tuple[bool, str]:
+        user_notes = self._store.get(username, [])
         
         if not 0 <= index < len(user_notes):
             return False, MESSAGES["invalid_note_number"]
         
         note = user_notes[index]
-        note["favorite"] = not note.get("favorite", False)
+        if favorite is None:
+            favorite = not note.get("favorite", False)
+        note["favorite"] = favorite
         
         status = "ditambahkan ke" if note["favorite"] else "dihapus dari"
         
-        if save_data(self.notes_file, notes):
-            return True, f"✔ Catatan {status} favorite!"
+        self._index_updated(username, index, note)
         
-        return False, MESSAGES["save_failed"]
+        changes.append(("set", [username, index], note))
+        return True, f"✔ Catatan {status} favorite!"
+    
+    def view_note_by_id(self, username: str, note_id: int,
+                        key: str = None) -> tuple[bool, Optional[str]]:
+        """Sama seperti view_note, tetapi catatan dialamatkan lewat id"""
+        return self._read_all(*self._open_note(username, note_id, key, by_id=True))
     
+    @write_operation
+    def edit_note_by_id(self, username: str, note_id: int, new_content: str = None,
+                        new_lock: Optional[str] = None, tags: List[str] = None,
+                        key: str = None) -> tuple[bool, str]:
+        """Sama seperti edit_note, tetapi catatan dialamatkan lewat id"""
+        index = self._position_of(username, note_id)
+        if index is None:
+            return False, MESSAGES["note_not_found"]
+        
+        return self.edit_note(username, index, new_content, new_lock, tags, key)
+    
+    @write_operation
+    def delete_note_by_id(self, username: str, note_id: int,
+                          key: str = None) -> tuple[bool, str]:
+        """Sama seperti delete_note, tetapi catatan dialamatkan lewat id"""
+        index = self._position_of(username, note_id)
+        if index is None:
+            return False, MESSAGES["note_not_found"]
+        
+        return self.delete_note(username, index, key)
+    
+    @write_operation
+    def toggle_favorite_by_id(self, username: str, note_id: int) -> tuple[bool, str]:
+        """Sama seperti toggle_favorite, tetapi catatan dialamatkan lewat id"""
+        index = self._position_of(username, note_id)
+        if index is None:
+            return False, MESSAGES["note_not_found"]
+        
+        return self.toggle_favorite(username, index)
+    
+    def batch(self, username: str) -> "NoteBatch":
+        """
+        Membuat batch mutasi untuk satu pengguna
+        
+        Contoh:
+            with manager.batch("alice") as batch:
+                batch.add("Catatan baru", tags=["kerja"])
+                batch.add_tags(3, ["arsip"])
+                batch.delete(7)
+            print(batch.message)
+        
+        Args:
+            username: Username pemilik catatan
+            
+        Returns:
+            NoteBatch yang diterapkan saat keluar dari blok with
+        """
+        return NoteBatch(self, username)
+    
+    @read_operation
     def get_favorites(self, username: str) -> List[Tuple[int, Dict]]:
         """
         Mendapatkan catatan favorite
@@ -362,9 +1114,11 @@ class NotesManager:
         Returns:
             List tuple (index, note)
         """
-        notes = self.get_notes(username)
-        return [(i, note) for i, note in enumerate(notes) if note.get("favorite", False)]
+        notes = self._user_notes(username)
+        return [(i, _note_copy(note)) for i, note in enumerate(notes)
+                if note.get("favorite", False)]
     
+    @read_operation
     def get_statistics(self, username: str) -> Dict:
         """
         Mendapatkan statistik catatan
@@ -373,99 +1127,408 @@ class NotesManager:
             username: Username pemilik catatan
             
         Returns:
-            Dictionary statistik
+            Dictionary statistik (bytes = ukuran isi catatan)
         """
-        notes = self.get_notes(username)
-        
-        total = len(notes)
-        locked = sum(1 for note in notes if note["is_locked"])
-        unlocked = total - locked
-        favorites = sum(1 for note in notes if note.get("favorite", False))
-        
-        # Get all tags
-        all_tags = []
-        for note in notes:
-            all_tags.extend(note.get("tags", []))
-        
-        unique_tags = len(set(all_tags))
+        stats = self._stats.get(username)
         
         return {
-            "total": total,
-            "locked": locked,
-            "unlocked": unlocked,
-            "favorites": favorites,
-            "unique_tags": unique_tags
+            "total": stats.total,
+            "locked": stats.locked,
+            "unlocked": stats.total - stats.locked,
+            "favorites": stats.favorites,
+            "unique_tags": self._tags.get(username).unique_tags,
+            "bytes": stats.bytes
         }
     
+    def _export_records(self, username: str, include_locked: bool) -> Iterator[Dict]:
+        for note in self._user_notes(username):
+            if note["is_locked"] and not include_locked:
+                continue
+            
+            yield {
+                "content": self._note_text(note),
+                "tags": note.get("tags", []),
+                "favorite": note.get("favorite", False),
+                "created_at": note["created_at"],
+                "updated_at": note["updated_at"]
+            }
+    
+    @read_operation
     def export_notes(self, username: str, filename: str, 
-                     include_locked: bool = False) -> tuple[bool, str]:
+                     include_locked: bool = False, fmt: str = EXPORT_FORMAT,
+                     compress: Optional[bool] = None,
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     lock_keys: Optional[Dict[int, str]] = None) -> tuple[bool, str]:
         """
-        Export catatan ke file JSON
+        Export catatan ke file secara streaming (satu catatan per tulis)
         
         Args:
             username: Username pemilik catatan
-            include_locked: Apakah menyertakan catatan terkunci
+            filename: Path file tujuan
+            include_locked: Apakah menyertakan catatan terkunci; setiap
+                catatan terkunci harus punya kunci yang benar di lock_keys
+            fmt: "json" (array) atau "jsonl" (satu catatan per baris)
+            compress: Kompres dengan gzip (default: jika filename berakhiran .gz)
+            progress: Callback progress(jumlah_ditulis, total)
+            lock_keys: Kunci catatan terkunci, {id catatan: kunci}
             
         Returns:
             Tuple (success: bool, message: str)
         """
-        notes = self.get_notes(username, include_locked=False)
+        if fmt not in ("json", "jsonl"):
+            return False, f"❌ Format export tidak dikenal: {fmt}"
         
-        if not notes:
+        stats = self._stats.get(username)
+        total = stats.total if include_locked else stats.total - stats.locked
+        
+        if not total:
             return False, "❌ Tidak ada catatan untuk diekspor!"
         
-        export_data = []
-        for note in notes:
-            if note["is_locked"] and not include_locked:
-                continue
-            
-            export_data.append({
-                "content": decode_text(note["content"]),
-                "tags": note.get("tags", []),
-                "favorite": note.get("favorite", False),
-                "created_at": note["created_at"],
-                "updated_at": note["updated_at"]
-            })
+        # Semua kunci diverifikasi sebelum file dibuat: isi catatan terkunci
+        # hanya keluar untuk pemanggil yang memegang kuncinya
+        if include_locked:
+            lock_keys = lock_keys or {}
+            for note in self._user_notes(username):
+                if not note["is_locked"]:
+                    continue
+                key = lock_keys.get(note["id"])
+                if key is None:
+                    return False, f"🔑 Catatan #{note['id']} terkunci! Masukkan kunci."
+                if not self._verify_key(username, note, key):
+                    return False, MESSAGES["wrong_key"]
+        
+        if self._keys.get(username) is None and any(
+                note.get("encrypted") for note in self._user_notes(username)):
+            return False, MESSAGES["session_locked"]
+        
+        if compress is None:
+            compress = filename.endswith(".gz")
+        
+        opener = gzip.open if compress else open
+        count = 0
         
         try:
-            import json
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump(export_data, f, indent=4, ensure_ascii=False)
+            with opener(filename, "wt", encoding="utf-8") as f:
+                if fmt == "json":
+                    f.write("[")
+                
+                for record in self._export_records(username, include_locked):
+                    if fmt == "jsonl":
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    else:
+                        item = json.dumps(record, indent=EXPORT_INDENT, ensure_ascii=False)
+                        pad = " " * EXPORT_INDENT
+                        f.write(("," if count else "") + "\n" + pad
+                                + item.replace("\n", "\n" + pad))
+                    
+                    count += 1
+                    if progress is not None:
+                        progress(count, total)
+                
+                if fmt == "json":
+                    f.write("\n]")
             
-            return True, f"✔ {len(export_data)} catatan berhasil diekspor ke {filename}"
+            return True, f"✔ {count} catatan berhasil diekspor ke {filename}"
         except IOError:
             return False, MESSAGES["export_failed"]
     
-    def import_notes(self, username: str, filename: str) -> tuple[bool, str]:
+    @write_operation
+    def import_notes(self, username: str, filename: str,
+                     chunk_size: Optional[int] = IMPORT_CHUNK_SIZE) -> tuple[bool, str]:
         """
-        Import catatan dari file JSON
+        Import catatan dari file JSON array atau JSON Lines .jsonl (.gz didukung)
+        
+        File dibaca secara streaming dan catatan ditulis per chunk, bukan
+        satu penulisan per catatan. Item tanpa isi atau dengan tipe yang
+        salah dilewati.
         
         Args:
             username: Username pemilik catatan
             filename: Path file yang akan diimport
+            chunk_size: Jumlah catatan per commit (None = satu commit)
             
         Returns:
             Tuple (success: bool, message: str)
         """
+        if self._session_required(username):
+            return False, MESSAGES["session_locked"]
+        
+        # Setiap chunk dimulai dari savepoint; chunk yang gagal dibatalkan
+        savepoint = _Savepoint(self, username, create=True)
+        user_notes = savepoint.user_notes
+        imported_count = 0
+        pending = []
+        
+        def commit_pending() -> bool:
+            if self._commit(pending + [("meta", [username], self._store.meta(username))]):
+                return True
+            savepoint.restore()
+            return False
+        
         try:
-            import json
-            with open(filename, "r", encoding="utf-8") as f:
-                import_data = json.load(f)
-            
-            if not isinstance(import_data, list):
-                return False, "❌ Format file tidak valid!"
-            
-            imported_count = 0
-            for item in import_data:
+            for item in iter_json_items(filename):
+                if not isinstance(item, dict):
+                    continue
+                
                 content = item.get("content", "")
                 tags = item.get("tags", [])
                 
-                if content:
-                    success, _ = self.add_note(username, content, tags=tags)
-                    if success:
-                        imported_count += 1
+                if not content or not isinstance(content, str):
+                    continue
+                if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+                    tags = []
+                
+                note = self._new_note(username, user_notes, content, tags=tags)
+                user_notes.append(note)
+                self._index_added(username, note, content)
+                pending.append(("append", [username], note))
+                
+                if chunk_size and len(pending) >= chunk_size:
+                    if not commit_pending():
+                        return False, MESSAGES["save_failed"]
+                    imported_count += len(pending)
+                    pending = []
+                    savepoint = _Savepoint(self, username, create=True)
+                    user_notes = savepoint.user_notes
+        
+        except (IOError, ValueError) as error:
+            # Buang chunk yang belum di-commit; chunk sebelumnya tetap tersimpan
+            if pending:
+                savepoint.restore()
+            else:
+                savepoint.release()
             
-            return True, f"✔ {imported_count} catatan berhasil diimport!"
+            if isinstance(error, (json.JSONDecodeError, IOError)):
+                message = "❌ Gagal membaca file!"
+            else:
+                message = "❌ Format file tidak valid!"
+            
+            if imported_count:
+                message += f" ({imported_count} catatan sudah diimport)"
+            return False, message
+        
+        if pending:
+            if not commit_pending():
+                return False, MESSAGES["save_failed"]
+            imported_count += len(pending)
+        else:
+            savepoint.release()
+        
+        return True, f"✔ {imported_count} catatan berhasil diimport!"
+
+
+class _Savepoint:
+    """
+    Keadaan data live satu pengguna sebelum mutasi
+
+    Mutasi mengubah data live dan index lebih dulu, baru kemudian commit.
+    Jika commit gagal, restore() mengembalikan daftar catatan, field
+    catatan yang dicatat lewat keep() dan metadata pengguna, lalu membuang
+    index agar dibangun ulang. Jika data pengguna sudah diganti store
+    (reload/merge dari disk), data itu sudah sesuai disk dan dibiarkan.
+    """
+
+    def __init__(self, manager: NotesManager, username: str,
+                 index: Optional[int] = None, create: bool = False):
+        store = manager._store
+        self._manager = manager
+        self._store = store
+        self.username = username
+        self.existed = username in store
+        self.user_notes = store.setdefault(username, []) if create else store.get(username)
+        self._fields: Dict[int, Tuple[Dict, Dict]] = {}
+        
+        if self.user_notes is None:
+            return
+        self.saved_notes = list(self.user_notes)
+        self.meta = store.meta(username)
+        self.saved_meta = dict(self.meta)
+        if index is not None and 0 <= index < len(self.user_notes):
+            self.keep(self.user_notes[index])
+
+    def keep(self, note: Dict) -> None:
+        """Mencatat field catatan sebelum catatan itu diubah di tempat"""
+        self._fields.setdefault(id(note), (note, dict(note)))
+
+    def release(self) -> None:
+        """Mutasi tidak terjadi; buang daftar kosong yang dibuat untuk pengguna baru"""
+        if (not self.existed and self.user_notes is not None and not self.user_notes
+                and self._store.get(self.username) is self.user_notes):
+            self._store.pop(self.username, None)
+
+    def restore(self) -> None:
+        """Mengembalikan data pengguna ke keadaan saat savepoint dibuat"""
+        if self.user_notes is None:
+            return
+        
+        if self._store.get(self.username) is self.user_notes:
+            self.user_notes[:] = self.saved_notes
+            for note, fields in self._fields.values():
+                note.clear()
+                note.update(fields)
+            self.meta.clear()
+            self.meta.update(self.saved_meta)
+            if not self.existed:
+                self._store.pop(self.username, None)
+        self._manager._discard_indexes(self.username)
+
+
+class NoteBatch:
+    """
+    Kumpulan mutasi catatan yang diterapkan sekaligus
+    
+    Operasi hanya dicatat sampai commit(). Saat commit semua operasi
+    dijalankan berurutan pada data yang sudah dimuat lalu disimpan dengan
+    satu commit store. Jika satu operasi gagal (id tidak ada, kunci salah,
+    isi kosong) atau penyimpanan gagal, seluruh batch dibatalkan dan data
+    kembali seperti sebelum batch.
+    
+    Catatan dialamatkan lewat id. Id catatan yang ditambahkan tersedia di
+    ``added_ids`` setelah commit berhasil.
+    """
+    
+    def __init__(self, manager: NotesManager, username: str):
+        self._manager = manager
+        self.username = username
+        self._ops: List[Tuple] = []
+        self.committed = False
+        self.success: Optional[bool] = None
+        self.message = ""
+        self.added_ids: List[int] = []
+    
+    def __enter__(self) -> "NoteBatch":
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        if exc_type is None and not self.committed:
+            self.commit()
+        return False
+    
+    def __len__(self) -> int:
+        return len(self._ops)
+    
+    # ==============================
+    # OPERASI
+    # ==============================
+    
+    def add(self, content: str, lock_key: str = "", tags: List[str] = None) -> None:
+        """Menambahkan catatan baru (lihat NotesManager.add_note)"""
+        self._queue("add", None, (content, lock_key, tags))
+    
+    def edit(self, note_id: int, new_content: str = None, new_lock: Optional[str] = None,
+             tags: List[str] = None, key: str = None) -> None:
+        """Mengedit catatan (lihat NotesManager.edit_note)"""
+        self._queue("edit", note_id, (new_content, new_lock, tags, key))
+    
+    def delete(self, note_id: int, key: str = None) -> None:
+        """Menghapus catatan (lihat NotesManager.delete_note)"""
+        self._queue("delete", note_id, (key,))
+    
+    def set_tags(self, note_id: int, tags: List[str], key: str = None) -> None:
+        """Mengganti seluruh tag catatan"""
+        self.edit(note_id, tags=list(tags), key=key)
+    
+    def add_tags(self, note_id: int, tags: List[str], key: str = None) -> None:
+        """Menambahkan tag yang belum ada pada catatan"""
+        def merge(current: List[str]) -> List[str]:
+            return current + [tag for tag in tags if tag not in current]
+        self._queue("edit", note_id, (None, None, merge, key))
+    
+    def remove_tags(self, note_id: int, tags: List[str], key: str = None) -> None:
+        """Menghapus tag dari catatan"""
+        def strip(current: List[str]) -> List[str]:
+            return [tag for tag in current if tag not in tags]
+        self._queue("edit", note_id, (None, None, strip, key))
+    
+    def set_favorite(self, note_id: int, favorite: bool = True) -> None:
+        """Menandai atau melepas status favorite catatan"""
+        self._queue("favorite", note_id, (favorite,))
+    
+    def _queue(self, kind: str, note_id: Optional[int], args: Tuple) -> None:
+        if self.committed:
+            raise RuntimeError("Batch sudah diterapkan")
+        self._ops.append((kind, note_id, args))
+    
+    # ==============================
+    # COMMIT
+    # ==============================
+    
+    def commit(self) -> tuple[bool, str]:
+        """
+        Menerapkan semua operasi sebagai satu kesatuan
         
-        except (IOError, json.JSONDecodeError):
-            return False, "❌ Gagal membaca file!"
+        Returns:
+            Tuple (success: bool, message: str)
+        """
+        if self.committed:
+            raise RuntimeError("Batch sudah diterapkan")
+        self.committed = True
+        
+        if not self._ops:
+            self.success, self.message = True, "⚠ Tidak ada perubahan."
+            return self.success, self.message
+        
+        with self._manager._locked(self.username, write=True):
+            return self._apply()
+    
+    def _apply(self) -> tuple[bool, str]:
+        manager = self._manager
+        store = manager._store
+        username = self.username
+        
+        # Perbaiki id bentrok lebih dulu agar tidak ikut dibatalkan
+        manager._id_index(username)
+        
+        savepoint = _Savepoint(manager, username, create=True)
+        user_notes = savepoint.user_notes
+        
+        changes = []
+        added_ids = []
+        success, message = True, ""
+        for number, (kind, note_id, args) in enumerate(self._ops, 1):
+            if kind == "add":
+                success, message = manager._add(username, *args, changes)
+                if success:
+                    added_ids.append(user_notes[-1]["id"])
+            else:
+                index = manager._position_of(username, note_id)
+                if index is None:
+                    success, message = False, MESSAGES["note_not_found"]
+                else:
+                    note = user_notes[index]
+                    savepoint.keep(note)
+                    success, message = self._run(kind, index, note, args, changes)
+            
+            if not success:
+                message = f"{message} (operasi #{number})"
+                break
+        
+        if success:
+            if added_ids:
+                changes.append(("meta", [username], store.meta(username)))
+            if manager._commit(changes):
+                self.added_ids = added_ids
+                self.success = True
+                self.message = f"✔ {len(self._ops)} perubahan berhasil diterapkan!"
+                return self.success, self.message
+            message = MESSAGES["save_failed"]
+        
+        # Batalkan semua perubahan di memori; index dibangun ulang saat dipakai
+        savepoint.restore()
+        
+        self.success, self.message = False, message
+        return self.success, self.message
+    
+    def _run(self, kind: str, index: int, note: Dict, args: Tuple,
+             changes: List) -> tuple[bool, str]:
+        manager = self._manager
+        if kind == "delete":
+            return manager._delete(self.username, index, args[0], changes)
+        if kind == "favorite":
+            return manager._set_favorite(self.username, index, args[0], changes)
+        
+        new_content, new_lock, tags, key = args
+        if callable(tags):
+            tags = tags(note.get("tags", []))
+        return manager._edit(self.username, index, new_content, new_lock,
+                             tags, key, changes)
@@ -0,0 +1,118 @@
+"""
+Reader/Writer Lock for Asisten Shadow
+"""
+
+import threading
+import weakref
+import functools
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+
+class RWLock:
+    """
+    Lock reader/writer antar thread
+
+    Banyak pembaca boleh berjalan bersamaan, penulis berjalan sendirian.
+    Penulis yang menunggu didahulukan agar tidak kelaparan oleh arus
+    pembaca. Lock reentrant per thread: pemegang write boleh mengambil
+    read/write lagi dan pemegang read boleh mengambil read lagi, tetapi
+    read tidak bisa dinaikkan menjadi write.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers: Dict[int, int] = {}
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Memegang lock sebagai pembaca selama blok with"""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers[me] -= 1
+                if not self._readers[me]:
+                    del self._readers[me]
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """
+        Memegang lock sebagai penulis selama blok with
+
+        Raises:
+            RuntimeError: Thread ini sedang memegang read
+        """
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                if me in self._readers:
+                    raise RuntimeError("Read lock tidak bisa dinaikkan menjadi write")
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+class RWLockTable:
+    """
+    RWLock per key (misalnya per username), dibuat saat dibutuhkan
+
+    Lock yang tidak sedang dipakai siapa pun dibuang otomatis.
+    """
+
+    def __init__(self):
+        self._locks: "weakref.WeakValueDictionary[str, RWLock]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> RWLock:
+        """Lock untuk key; pemanggil yang sama selalu mendapat objek yang sama"""
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = RWLock()
+            return lock
+
+
+def read_operation(method: Callable) -> Callable:
+    """
+    Decorator method manager: read lock milik pengguna (argumen pertama)
+    lewat ``self._locked(username)``
+    """
+    @functools.wraps(method)
+    def wrapper(self, username, *args, **kwargs):
+        with self._locked(username):
+            return method(self, username, *args, **kwargs)
+    return wrapper
+
+
+def write_operation(method: Callable) -> Callable:
+    """Seperti read_operation, dengan write lock"""
+    @functools.wraps(method)
+    def wrapper(self, username, *args, **kwargs):
+        with self._locked(username, write=True):
+            return method(self, username, *args, **kwargs)
+    return wrapper
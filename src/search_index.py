@@ -0,0 +1,635 @@
+"""
+Full-Text Search Index for Asisten Shadow
+"""
+
+import re
+import heapq
+import bisect
+import base64
+import hashlib
+from contextlib import nullcontext
+from typing import (
+    Any, Callable, ContextManager, Dict, Iterable, List, Optional, Set, Tuple
+)
+from utils import load_data, save_data, decode_text
+from config import SEARCH_PREFIX_MAX_TOKENS
+
+_TOKEN_RE = re.compile(r"\w+")
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# Panjang hash token yang disimpan di blind index (field "blind" catatan)
+BLIND_DIGEST_BYTES = 8
+
+
+def tokenize(text: str) -> List[str]:
+    """Memecah teks menjadi token huruf kecil"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class DocIndex:
+    """
+    Dasar index per pengguna yang dialamatkan lewat posisi catatan
+
+    Setiap catatan mendapat doc id internal; ``doc_ids`` sejajar dengan
+    urutan catatan sehingga posisi catatan bisa diterjemahkan ke doc id
+    dan sebaliknya, juga setelah ada catatan yang dihapus.
+    """
+
+    def __init__(self):
+        self.doc_ids: List[int] = []
+        self.next_doc = 0
+        self._positions: Optional[Dict[int, int]] = None
+
+    @classmethod
+    def build(cls, values: Iterable[Any]) -> "DocIndex":
+        index = cls()
+        for value in values:
+            index.add(value)
+        return index
+
+    def _index_doc(self, doc: int, value: Any) -> None:
+        raise NotImplementedError
+
+    def _unindex_doc(self, doc: int) -> None:
+        raise NotImplementedError
+
+    def _doc_positions(self) -> Dict[int, int]:
+        if self._positions is None:
+            self._positions = {doc: i for i, doc in enumerate(self.doc_ids)}
+        return self._positions
+
+    def positions(self, docs: Iterable[int]) -> List[int]:
+        """Posisi terurut untuk sekumpulan doc id"""
+        positions = self._doc_positions()
+        return sorted(positions[doc] for doc in docs)
+
+    def add(self, value: Any) -> None:
+        """Menambahkan catatan di akhir"""
+        doc = self.next_doc
+        self.next_doc += 1
+        self.doc_ids.append(doc)
+        if self._positions is not None:
+            self._positions[doc] = len(self.doc_ids) - 1
+        self._index_doc(doc, value)
+
+    def update(self, position: int, value: Any) -> None:
+        """Mengindeks ulang catatan pada posisi tertentu"""
+        doc = self.doc_ids[position]
+        self._unindex_doc(doc)
+        self._index_doc(doc, value)
+
+    def remove(self, position: int) -> None:
+        """Menghapus catatan pada posisi tertentu"""
+        doc = self.doc_ids.pop(position)
+        self._unindex_doc(doc)
+        self._positions = None
+
+
+class InvertedIndex(DocIndex):
+    """
+    Inverted index teks catatan satu pengguna
+
+    Nilai yang diindeks adalah isi catatan; catatan terkunci diindeks
+    dengan nilai None sehingga tetap punya doc id tanpa token.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.postings: Dict[str, Dict[int, List[int]]] = {}
+        self.doc_tokens: Dict[int, List[str]] = {}
+        self.vocabulary: List[str] = []
+
+    # ==============================
+    # INTERNAL HELPERS
+    # ==============================
+
+    def _index_doc(self, doc: int, text: Optional[str]) -> None:
+        if text is None:
+            return
+
+        tokens = tokenize(text)
+        for position, token in enumerate(tokens):
+            entry = self.postings.get(token)
+            if entry is None:
+                entry = self.postings[token] = {}
+                bisect.insort(self.vocabulary, token)
+            entry.setdefault(doc, []).append(position)
+
+        self.doc_tokens[doc] = list(dict.fromkeys(tokens))
+
+    def _unindex_doc(self, doc: int) -> None:
+        for token in self.doc_tokens.pop(doc, []):
+            entry = self.postings[token]
+            entry.pop(doc, None)
+            if not entry:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def _prefix_tokens(self, prefix: str) -> List[str]:
+        # Token terurut, jadi yang berawalan prefix berurutan mulai dari
+        # titik bisect; ekspansi berhenti setelah SEARCH_PREFIX_MAX_TOKENS
+        vocabulary = self.vocabulary
+        start = bisect.bisect_left(vocabulary, prefix)
+        tokens = []
+        for i in range(start, min(len(vocabulary), start + SEARCH_PREFIX_MAX_TOKENS)):
+            if not vocabulary[i].startswith(prefix):
+                break
+            tokens.append(vocabulary[i])
+        return tokens
+
+    def _phrase_counts(self, tokens: List[str]) -> Dict[int, int]:
+        entries = [self.postings.get(token) for token in tokens]
+        if not all(entries):
+            return {}
+
+        counts = {}
+        for doc in set(entries[0]).intersection(*entries[1:]):
+            later = [set(entry[doc]) for entry in entries[1:]]
+            count = sum(
+                1 for start in entries[0][doc]
+                if all(start + i + 1 in positions for i, positions in enumerate(later))
+            )
+            if count:
+                counts[doc] = count
+        return counts
+
+    # ==============================
+    # PUBLIC METHODS
+    # ==============================
+
+    def candidates(self, keyword: str) -> Optional[List[int]]:
+        """
+        Posisi catatan yang mungkin mengandung keyword sebagai substring
+
+        Setiap token keyword harus menjadi substring dari token catatan,
+        jadi hasilnya superset dari kecocokan sebenarnya.
+
+        Returns:
+            List posisi terurut, atau None jika keyword tidak punya token
+        """
+        keyword_tokens = set(tokenize(keyword))
+        if not keyword_tokens:
+            return None
+
+        # Token terpanjang biasanya paling selektif; setelah kandidat sedikit,
+        # token berikutnya dicek lewat token kandidat, bukan seluruh kosakata
+        docs: Optional[Set[int]] = None
+        for keyword_token in sorted(keyword_tokens, key=len, reverse=True):
+            if docs is not None and (
+                    sum(len(self.doc_tokens[doc]) for doc in docs) < len(self.vocabulary)):
+                docs = {doc for doc in docs
+                        if any(keyword_token in token for token in self.doc_tokens[doc])}
+            else:
+                matched = set()
+                for token in self.vocabulary:
+                    if keyword_token in token:
+                        matched.update(self.postings[token])
+                docs = matched if docs is None else docs & matched
+            if not docs:
+                return []
+
+        return self.positions(docs)
+
+    def query(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Mencari dengan query kata, prefix (``kata*``) dan frasa (``"dua kata"``)
+
+        Semua bagian query harus cocok. Skor adalah jumlah kemunculan.
+        Prefix diperluas ke paling banyak SEARCH_PREFIX_MAX_TOKENS token.
+
+        Args:
+            query: String query
+            limit: Jumlah hasil maksimum
+
+        Returns:
+            List tuple (posisi, skor) terurut dari skor tertinggi
+        """
+        scores: Optional[Dict[int, int]] = None
+
+        for phrase, word in _QUERY_RE.findall(query.lower()):
+            if phrase:
+                counts = self._phrase_counts(tokenize(phrase))
+            elif word.endswith("*"):
+                counts = {}
+                for prefix in tokenize(word[:-1])[:1]:
+                    for token in self._prefix_tokens(prefix):
+                        for doc, hits in self.postings[token].items():
+                            counts[doc] = counts.get(doc, 0) + len(hits)
+            else:
+                tokens = tokenize(word)
+                counts = (self._phrase_counts(tokens) if len(tokens) > 1 else
+                          {doc: len(hits) for token in tokens
+                           for doc, hits in self.postings.get(token, {}).items()})
+
+            if scores is None:
+                scores = counts
+            else:
+                scores = {doc: scores[doc] + counts[doc] for doc in scores if doc in counts}
+            if not scores:
+                return []
+
+        if not scores:
+            return []
+
+        positions = self._doc_positions()
+        results = ((positions[doc], score) for doc, score in scores.items())
+        if limit:
+            return heapq.nlargest(limit, results, key=lambda item: (item[1], -item[0]))
+        return sorted(results, key=lambda item: (-item[1], item[0]))
+
+    def to_dict(self) -> Dict:
+        return {
+            "doc_ids": self.doc_ids,
+            "next_doc": self.next_doc,
+            "postings": {token: {str(doc): hits for doc, hits in entry.items()}
+                         for token, entry in self.postings.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "InvertedIndex":
+        index = cls()
+        index.doc_ids = list(data["doc_ids"])
+        index.next_doc = data["next_doc"]
+        for token, entry in data["postings"].items():
+            index.postings[token] = {int(doc): hits for doc, hits in entry.items()}
+            for doc in index.postings[token]:
+                index.doc_tokens.setdefault(doc, []).append(token)
+        index.vocabulary = sorted(index.postings)
+        return index
+
+
+class TagIndex(DocIndex):
+    """
+    Index tag catatan satu pengguna
+
+    Query memakai tag huruf kecil; ``raw_counts`` menyimpan tag apa adanya
+    untuk statistik jumlah tag unik.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.tags: Dict[str, Set[int]] = {}
+        self.doc_tags: Dict[int, List[str]] = {}
+        self.raw_counts: Dict[str, int] = {}
+
+    def _index_doc(self, doc: int, tags: List[str]) -> None:
+        self.doc_tags[doc] = list(tags)
+        for tag in tags:
+            self.tags.setdefault(tag.lower(), set()).add(doc)
+            self.raw_counts[tag] = self.raw_counts.get(tag, 0) + 1
+
+    def _unindex_doc(self, doc: int) -> None:
+        for tag in self.doc_tags.pop(doc, []):
+            docs = self.tags.get(tag.lower())
+            if docs is not None:
+                docs.discard(doc)
+                if not docs:
+                    del self.tags[tag.lower()]
+
+            self.raw_counts[tag] -= 1
+            if not self.raw_counts[tag]:
+                del self.raw_counts[tag]
+
+    @property
+    def unique_tags(self) -> int:
+        return len(self.raw_counts)
+
+    def find(self, tags: List[str], match_all: bool = True) -> List[int]:
+        """
+        Posisi catatan yang memiliki tag
+
+        Args:
+            tags: Daftar tag (tanpa membedakan huruf besar/kecil)
+            match_all: True = semua tag (AND), False = salah satu (OR)
+
+        Returns:
+            List posisi terurut
+        """
+        sets = [self.tags.get(tag.lower(), set()) for tag in tags]
+        if not sets:
+            return []
+
+        docs = set.intersection(*sets) if match_all else set.union(*sets)
+        return self.positions(docs)
+
+    def top(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Tag terbanyak sebagai list (tag, jumlah catatan)"""
+        counts = sorted(((tag, len(docs)) for tag, docs in self.tags.items()),
+                        key=lambda item: (-item[1], item[0]))
+        return counts[:limit] if limit else counts
+
+
+def pack_blind(digests: Iterable[bytes]) -> str:
+    """Menyimpan hash token (dipotong, tanpa duplikat) sebagai satu string base64"""
+    unique = dict.fromkeys(digest[:BLIND_DIGEST_BYTES] for digest in digests)
+    return base64.b64encode(b"".join(sorted(unique))).decode()
+
+
+def unpack_blind(value: str) -> List[bytes]:
+    """Kebalikan pack_blind"""
+    raw = base64.b64decode(value)
+    return [raw[i:i + BLIND_DIGEST_BYTES] for i in range(0, len(raw), BLIND_DIGEST_BYTES)]
+
+
+class BlindIndex(DocIndex):
+    """
+    Index hash token catatan terenkripsi satu pengguna
+
+    Nilai yang diindeks adalah field "blind" catatan: hash HMAC setiap token
+    dengan kunci turunan kunci data pengguna. Index dibangun dari metadata
+    saja, dan pencarian cukup meng-hash token keyword dengan kunci yang sama,
+    sehingga isi catatan tidak perlu didekripsi. Hanya token utuh yang bisa
+    dicocokkan (bukan substring).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.postings: Dict[bytes, Set[int]] = {}
+        self.doc_digests: Dict[int, List[bytes]] = {}
+
+    def _index_doc(self, doc: int, value: Optional[str]) -> None:
+        if not value:
+            return
+
+        digests = unpack_blind(value)
+        for digest in digests:
+            self.postings.setdefault(digest, set()).add(doc)
+        self.doc_digests[doc] = digests
+
+    def _unindex_doc(self, doc: int) -> None:
+        for digest in self.doc_digests.pop(doc, []):
+            docs = self.postings[digest]
+            docs.discard(doc)
+            if not docs:
+                del self.postings[digest]
+
+    def find(self, digests: List[bytes]) -> List[int]:
+        """
+        Posisi catatan yang memiliki semua hash token
+
+        Args:
+            digests: Hash token keyword (dipotong otomatis)
+
+        Returns:
+            List posisi terurut
+        """
+        sets = [self.postings.get(digest[:BLIND_DIGEST_BYTES], set()) for digest in digests]
+        if not sets:
+            return []
+        return self.positions(set.intersection(*sets))
+
+    def query(self, query: str,
+              hash_tokens: Callable[[List[str]], List[bytes]]) -> List[Tuple[int, int]]:
+        """
+        Padanan InvertedIndex.query untuk catatan terenkripsi
+
+        Index hanya tahu token mana yang ada: frasa dicocokkan sebagai
+        kumpulan kata dan prefix (``kata*``) tidak didukung. Skor adalah
+        jumlah token query yang berbeda.
+
+        Args:
+            query: String query
+            hash_tokens: Fungsi yang meng-hash token dengan kunci pengguna
+
+        Returns:
+            List tuple (posisi, skor) terurut menurut posisi
+        """
+        tokens = []
+        for phrase, word in _QUERY_RE.findall(query.lower()):
+            if not phrase and word.endswith("*"):
+                return []
+            tokens.extend(tokenize(phrase or word))
+
+        unique = list(dict.fromkeys(tokens))
+        if not unique:
+            return []
+        return [(position, len(unique)) for position in self.find(hash_tokens(unique))]
+
+
+class NoteStats(DocIndex):
+    """
+    Penghitung agregat catatan satu pengguna
+
+    Dihitung dari metadata saja; ukuran isi diturunkan dari panjang string
+    base64 atau referensi file body tanpa membaca isi catatan.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.doc_stats: Dict[int, Tuple[bool, bool, int]] = {}
+        self.total = 0
+        self.locked = 0
+        self.favorites = 0
+        self.bytes = 0
+
+    def _index_doc(self, doc: int, note: Dict) -> None:
+        if "body" in note:
+            size = note["body"][1]
+        else:
+            content = note.get("content", "")
+            size = len(content) * 3 // 4 - content[-2:].count("=")
+        entry = (bool(note["is_locked"]), bool(note.get("favorite", False)), size)
+
+        self.doc_stats[doc] = entry
+        self.total += 1
+        self.locked += entry[0]
+        self.favorites += entry[1]
+        self.bytes += entry[2]
+
+    def _unindex_doc(self, doc: int) -> None:
+        entry = self.doc_stats.pop(doc, None)
+        if entry is None:
+            return
+
+        self.total -= 1
+        self.locked -= entry[0]
+        self.favorites -= entry[1]
+        self.bytes -= entry[2]
+
+
+class IdIndex(DocIndex):
+    """
+    Peta id catatan ke posisi untuk satu pengguna
+
+    ``duplicates`` menandai data lama yang id-nya bentrok atau kosong;
+    id seperti itu tidak dipetakan sampai diperbaiki.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.ids: Dict[Any, int] = {}
+        self.doc_note_ids: Dict[int, Any] = {}
+        self.duplicates = False
+
+    def _index_doc(self, doc: int, note: Dict) -> None:
+        note_id = note.get("id")
+        if note_id is None or note_id in self.ids:
+            self.duplicates = True
+        else:
+            self.ids[note_id] = doc
+        self.doc_note_ids[doc] = note_id
+
+    def _unindex_doc(self, doc: int) -> None:
+        note_id = self.doc_note_ids.pop(doc, None)
+        if self.ids.get(note_id) == doc:
+            del self.ids[note_id]
+
+    def find(self, note_id: Any) -> Optional[int]:
+        """Posisi catatan dengan id tertentu, atau None"""
+        doc = self.ids.get(note_id)
+        if doc is None:
+            return None
+        return self._doc_positions()[doc]
+
+
+class IndexCache:
+    """
+    Cache index per pengguna yang dibuang saat data pengguna dimuat ulang
+    """
+
+    def __init__(self, build: Callable[[List[Dict]], DocIndex],
+                 notes_for: Callable[[str], List[Dict]],
+                 generation_of: Callable[[str], int]):
+        """
+        Inisialisasi IndexCache
+
+        Args:
+            build: Fungsi pembangun index dari list catatan
+            notes_for: Fungsi yang mengembalikan list catatan pengguna
+            generation_of: Fungsi yang mengembalikan generasi data pengguna
+                di store; index dibuang bila generasinya berubah
+        """
+        self._build = build
+        self._notes_for = notes_for
+        self._generation_of = generation_of
+        self._indexes: Dict[str, Tuple[int, DocIndex]] = {}
+
+    def _load(self, username: str, notes: List[Dict]) -> DocIndex:
+        return self._build(notes)
+
+    def get(self, username: str) -> DocIndex:
+        """Mengambil index pengguna, membangunnya bila perlu"""
+        generation = self._generation_of(username)
+        cached = self._indexes.get(username)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
+        index = self._load(username, self._notes_for(username))
+        self._indexes[username] = (generation, index)
+        return index
+
+    def discard(self, username: str) -> None:
+        """Membuang index pengguna agar dibangun ulang saat dibutuhkan"""
+        self._indexes.pop(username, None)
+
+    def mutable(self, username: str) -> Optional[DocIndex]:
+        """
+        Index pengguna untuk diperbarui setelah mutasi
+
+        Mengembalikan None jika index belum dimuat atau sudah basi; index
+        seperti itu akan dibangun ulang saat dibutuhkan.
+        """
+        cached = self._indexes.get(username)
+        if cached is None or cached[0] != self._generation_of(username):
+            return None
+        return cached[1]
+
+
+class SearchIndex(IndexCache):
+    """
+    Cache InvertedIndex per pengguna dengan penyimpanan ke file
+
+    Index disimpan ke ``index_file`` saat ``save()`` dipanggil bersama
+    fingerprint catatan pengguna, sehingga index yang basi dibangun ulang
+    alih-alih dipakai.
+    """
+
+    def __init__(self, notes_for: Callable[[str], List[Dict]],
+                 generation_of: Callable[[str], int],
+                 index_file: Optional[str] = None,
+                 text_of: Optional[Callable[[Dict], str]] = None):
+        """
+        Inisialisasi SearchIndex
+
+        Args:
+            notes_for: Fungsi yang mengembalikan list catatan pengguna
+            generation_of: Fungsi yang mengembalikan generasi data pengguna
+            index_file: Path file index (None = hanya di memori)
+            text_of: Fungsi yang mengembalikan isi catatan (default decode
+                field "content")
+        """
+        if text_of is None:
+            def text_of(note: Dict) -> str:
+                return decode_text(note["content"])
+        super().__init__(
+            lambda notes: InvertedIndex.build(
+                None if note["is_locked"] else text_of(note)
+                for note in notes
+            ),
+            notes_for,
+            generation_of,
+        )
+        self.index_file = index_file
+        self._saved: Optional[Dict] = None
+        self._dirty = False
+
+    def _saved_indexes(self) -> Dict:
+        if self._saved is None:
+            self._saved = load_data(self.index_file) if self.index_file else {}
+        return self._saved
+
+    def _load(self, username: str, notes: List[Dict]) -> InvertedIndex:
+        saved = self._saved_indexes().get(username)
+        if saved is not None and saved.get("fingerprint") == notes_fingerprint(notes):
+            return InvertedIndex.from_dict(saved["index"])
+
+        self._dirty = True
+        return super()._load(username, notes)
+
+    def mutable(self, username: str) -> Optional[InvertedIndex]:
+        index = super().mutable(username)
+        if index is not None:
+            self._dirty = True
+        return index
+
+    def save(self, hold: Optional[Callable[[str], ContextManager]] = None) -> bool:
+        """
+        Menyimpan index yang sudah dimuat ke file
+
+        Args:
+            hold: Fungsi yang mengembalikan context manager per pengguna
+                (misalnya read lock) agar index tidak diubah saat disalin
+        """
+        if not self._dirty or not self.index_file:
+            return True
+
+        saved = self._saved_indexes()
+        for username in list(self._indexes):
+            with hold(username) if hold is not None else nullcontext():
+                cached = self._indexes.get(username)
+                if cached is None:
+                    continue
+                saved[username] = {
+                    "fingerprint": notes_fingerprint(self._notes_for(username)),
+                    "index": cached[1].to_dict(),
+                }
+
+        if not save_data(self.index_file, saved):
+            return False
+
+        self._dirty = False
+        return True
+
+
+def notes_fingerprint(notes: List[Dict]) -> str:
+    """Fingerprint isi catatan yang terindeks (tanpa decode)"""
+    digest = hashlib.sha1()
+    for note in notes:
+        if note["is_locked"]:
+            digest.update(b"\0")
+        elif "body" in note:
+            digest.update(b"@%d:%d" % tuple(note["body"]))
+        else:
+            digest.update(note["content"].encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
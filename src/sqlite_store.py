@@ -0,0 +1,362 @@
+"""
+SQLite Storage Backend for Asisten Shadow
+"""
+
+import json
+import sqlite3
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from storage import Change
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _synchronized(method):
+    # Satu koneksi dan cache dipakai bersama semua thread
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._guard:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class _SqliteStore:
+    """
+    Dasar store SQLite dengan antarmuka yang sama seperti JsonStore
+
+    Record per username di-cache di memori. Commit dari koneksi lain
+    dideteksi lewat ``PRAGMA data_version`` dan mengosongkan cache.
+    Koneksi boleh dipakai beberapa thread; aksesnya diserialkan.
+    """
+
+    SCHEMA = ""
+
+    def __init__(self, db_file: str):
+        """
+        Inisialisasi store SQLite
+
+        Args:
+            db_file: Path ke file database SQLite
+        """
+        self.db_file = db_file
+        self.filename = db_file
+        self.generation = 1
+
+        self._guard = threading.RLock()
+        self._conn = sqlite3.connect(db_file, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+
+        self._cache: Dict[str, Any] = {}
+        self._meta: Dict[str, Dict] = {}
+        self._data_version = self._current_data_version()
+        self._pins = 0
+
+    # ==============================
+    # INTERNAL HELPERS
+    # ==============================
+
+    def _current_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_external(self) -> None:
+        if self._pins:
+            return
+        version = self._current_data_version()
+        if version != self._data_version:
+            self._cache.clear()
+            self._meta.clear()
+            self._data_version = version
+            self.generation += 1
+
+    def _select(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def _select_keys(self) -> List[str]:
+        raise NotImplementedError
+
+    def _apply(self, change: Change) -> None:
+        raise NotImplementedError
+
+    def _cached(self, key: str) -> Optional[Any]:
+        if key not in self._cache:
+            value = self._select(key)
+            if value is None:
+                return None
+            self._cache[key] = value
+        return self._cache[key]
+
+    def _value(self, entry: Any) -> Any:
+        return entry
+
+    # ==============================
+    # PUBLIC METHODS
+    # ==============================
+
+    def data(self) -> Dict:
+        """Mengembalikan seluruh data sebagai dict (memuat semua key)"""
+        return {key: self.get(key) for key in self.keys()}
+
+    @contextmanager
+    def pinned(self) -> Iterator[None]:
+        """Cache tidak dikosongkan oleh commit koneksi lain selama satu operasi"""
+        with self._guard:
+            self._check_external()
+            self._pins += 1
+        try:
+            yield
+        finally:
+            with self._guard:
+                self._pins -= 1
+
+    @_synchronized
+    def generation_of(self, key: str) -> int:
+        self._check_external()
+        return self.generation
+
+    @_synchronized
+    def get(self, key: str, default: Any = None) -> Any:
+        self._check_external()
+        entry = self._cached(key)
+        return default if entry is None else self._value(entry)
+
+    @_synchronized
+    def setdefault(self, key: str, default: Any) -> Any:
+        self._check_external()
+        if self._cached(key) is None:
+            self._cache[key] = self._new_entry(default)
+        return self._value(self._cache[key])
+
+    def _new_entry(self, value: Any) -> Any:
+        return value
+
+    @_synchronized
+    def pop(self, key: str, default: Any = None) -> Any:
+        self._check_external()
+        entry = self._cached(key)
+        self._cache.pop(key, None)
+        return default if entry is None else self._value(entry)
+
+    @_synchronized
+    def meta(self, key: str) -> Dict:
+        """Metadata live untuk key; ubah lalu commit dengan op meta"""
+        self._check_external()
+        if key not in self._meta:
+            row = self._conn.execute("SELECT data FROM meta WHERE key = ?", (key,)).fetchone()
+            self._meta[key] = json.loads(row[0]) if row else {}
+        return self._meta[key]
+
+    @_synchronized
+    def keys(self) -> List[str]:
+        self._check_external()
+        keys = self._select_keys()
+        keys.extend(key for key in self._cache if key not in keys)
+        return keys
+
+    @_synchronized
+    def __contains__(self, key: str) -> bool:
+        self._check_external()
+        return self._cached(key) is not None
+
+    @property
+    def dirty(self) -> bool:
+        return False
+
+    @_synchronized
+    def commit(self, changes: Optional[List[Change]] = None) -> bool:
+        """
+        Menerapkan perubahan dalam satu transaksi
+
+        Args:
+            changes: Daftar perubahan; None berarti tulis ulang semua key
+                yang ada di cache
+
+        Returns:
+            False jika transaksi gagal
+        """
+        if changes is None:
+            changes = [("set", [key], self._value(entry))
+                       for key, entry in self._cache.items()]
+
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for change in changes:
+                if change[0] == "meta":
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, data) VALUES (?, ?)",
+                        (change[1][0], _dumps(change[2])),
+                    )
+                    self._meta[change[1][0]] = change[2]
+                else:
+                    self._apply(change)
+            self._conn.execute("COMMIT")
+        except sqlite3.Error:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            # Cache sudah diubah pemanggil; muat ulang dari database
+            self._cache.clear()
+            self._meta.clear()
+            self.generation += 1
+            return False
+
+        return True
+
+    def flush(self) -> bool:
+        return True
+
+    @_synchronized
+    def close(self) -> bool:
+        self._cache.clear()
+        self._conn.close()
+        return True
+
+
+class SqliteUserStore(_SqliteStore):
+    """Store SQLite untuk data pengguna (satu baris per username)"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+
+    def _select(self, key: str) -> Optional[Dict]:
+        row = self._conn.execute(
+            "SELECT data FROM users WHERE username = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _select_keys(self) -> List[str]:
+        return [row[0] for row in self._conn.execute("SELECT username FROM users")]
+
+    def _apply(self, change: Change) -> None:
+        op, path, value = change
+        key = path[0]
+
+        if op == "del":
+            self._conn.execute("DELETE FROM users WHERE username = ?", (key,))
+            self._cache.pop(key, None)
+            return
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO users (username, data) VALUES (?, ?)",
+            (key, _dumps(value)),
+        )
+        self._cache[key] = value
+
+
+class SqliteNoteStore(_SqliteStore):
+    """
+    Store SQLite untuk catatan (satu baris per catatan)
+
+    Entry cache berisi (list catatan, list rowid) agar perubahan
+    berbasis index bisa diterjemahkan ke update per baris.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            note_id INTEGER,
+            favorite INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_notes_username ON notes (username, id);
+        CREATE INDEX IF NOT EXISTS idx_notes_note_id ON notes (username, note_id);
+        CREATE INDEX IF NOT EXISTS idx_notes_favorite ON notes (username, favorite);
+        CREATE INDEX IF NOT EXISTS idx_notes_updated ON notes (username, updated_at);
+
+        CREATE TABLE IF NOT EXISTS note_tags (
+            note_rowid INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+            username TEXT NOT NULL,
+            tag TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_note_tags_tag ON note_tags (username, tag);
+        CREATE INDEX IF NOT EXISTS idx_note_tags_note ON note_tags (note_rowid);
+    """
+
+    def _select(self, key: str) -> Optional[Tuple[List[Dict], List[int]]]:
+        rows = self._conn.execute(
+            "SELECT id, data FROM notes WHERE username = ? ORDER BY id", (key,)
+        ).fetchall()
+        if not rows:
+            return None
+        return [json.loads(row[1]) for row in rows], [row[0] for row in rows]
+
+    def _select_keys(self) -> List[str]:
+        return [row[0] for row in
+                self._conn.execute("SELECT DISTINCT username FROM notes")]
+
+    def _value(self, entry: Tuple[List[Dict], List[int]]) -> List[Dict]:
+        return entry[0]
+
+    def _new_entry(self, value: List[Dict]) -> Tuple[List[Dict], List[int]]:
+        return value, []
+
+    def _columns(self, note: Dict) -> Tuple:
+        return (note.get("id"), int(bool(note.get("favorite", False))),
+                note.get("updated_at"), _dumps(note))
+
+    def _insert(self, username: str, note: Dict) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO notes (username, note_id, favorite, updated_at, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (username,) + self._columns(note),
+        )
+        rowid = cursor.lastrowid
+        self._write_tags(username, rowid, note)
+        return rowid
+
+    def _write_tags(self, username: str, rowid: int, note: Dict) -> None:
+        self._conn.execute("DELETE FROM note_tags WHERE note_rowid = ?", (rowid,))
+        self._conn.executemany(
+            "INSERT INTO note_tags (note_rowid, username, tag) VALUES (?, ?, ?)",
+            [(rowid, username, tag.lower()) for tag in note.get("tags", [])],
+        )
+
+    def _apply(self, change: Change) -> None:
+        op, path, value = change
+        username = path[0]
+
+        if len(path) == 1:
+            if op == "del":
+                self._conn.execute("DELETE FROM notes WHERE username = ?", (username,))
+                self._cache.pop(username, None)
+                return
+            if op == "set":
+                self._conn.execute("DELETE FROM notes WHERE username = ?", (username,))
+                rowids = [self._insert(username, note) for note in value]
+                self._cache[username] = (value, rowids)
+                return
+
+            # append: catatan biasanya sudah ditambahkan pemanggil ke cache;
+            # dalam batch bisa diikuti perubahan lain, jadi cek identitasnya
+            notes, rowids = self._cache.setdefault(username, ([], []))
+            if not any(note is value for note in reversed(notes)):
+                notes.append(value)
+            rowids.append(self._insert(username, value))
+            return
+
+        notes, rowids = self._cache[username]
+        index = path[1]
+
+        if op == "set":
+            self._conn.execute(
+                "UPDATE notes SET note_id = ?, favorite = ?, updated_at = ?, data = ? "
+                "WHERE id = ?",
+                self._columns(value) + (rowids[index],),
+            )
+            self._write_tags(username, rowids[index], value)
+        elif op == "del":
+            self._conn.execute("DELETE FROM notes WHERE id = ?", (rowids.pop(index),))
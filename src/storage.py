@@ -0,0 +1,886 @@
+"""
+Storage Module for Asisten Shadow
+"""
+
+import os
+import json
+import time
+import marshal
+import atexit
+import hashlib
+import weakref
+import threading
+from contextlib import ExitStack, contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from utils import load_data, save_data, sync_file
+from file_lock import FileLock
+from config import (
+    STORE_FLUSH_INTERVAL, STORE_MAX_PENDING, STORE_CHECK_INTERVAL, STORAGE_BACKEND,
+    JOURNAL_COMPACT_SIZE
+)
+
+# Satu perubahan: (operasi, path, nilai), misalnya
+# ("append", [username], note), ("set", [username, index], note),
+# ("del", [username, index], None), ("meta", [username], meta). Perubahan
+# sudah diterapkan pemanggil ke objek live dari store; commit hanya
+# meneruskannya ke penyimpanan.
+Change = Tuple[str, List, Any]
+
+# Key cadangan untuk metadata per key (misalnya penghitung id catatan);
+# "#" tidak pernah lolos validasi username
+META_KEY = "#meta"
+
+# Key cadangan berisi penghitung versi per key ({key: n}); naik setiap kali
+# proses mana pun menulis key tersebut
+VERSION_KEY = "#version"
+RESERVED_KEYS = (META_KEY, VERSION_KEY)
+
+
+# Semua store yang masih hidup, di-flush otomatis saat interpreter keluar
+_open_stores = weakref.WeakSet()
+
+
+def _flush_all_stores():
+    for store in list(_open_stores):
+        store.flush()
+
+
+atexit.register(_flush_all_stores)
+
+
+def _snapshot(data: Dict) -> Dict:
+    # Salinan untuk ditulis ke disk. marshal menyalin seluruhnya di C tanpa
+    # melepas GIL, sedangkan encoder JSON terindentasi berjalan di Python
+    # dan bisa melihat (atau gagal karena) perubahan dari thread lain
+    return marshal.loads(marshal.dumps(data))
+
+
+def apply_change(data: Dict, change: Change) -> None:
+    """Menerapkan satu perubahan ke dict data"""
+    op, path, value = change
+    key = path[0]
+
+    if op == "meta":
+        data.setdefault(META_KEY, {})[key] = value
+        return
+
+    if op == "version":
+        data.setdefault(VERSION_KEY, {})[key] = value
+        return
+
+    if len(path) == 1:
+        if op == "set":
+            data[key] = value
+        elif op == "del":
+            data.pop(key, None)
+        elif op == "append":
+            data.setdefault(key, []).append(value)
+        return
+
+    container = data[key]
+    if op == "set":
+        container[path[1]] = value
+    elif op == "del":
+        del container[path[1]]
+
+
+def _file_digest(filename: str) -> Optional[str]:
+    try:
+        with open(filename, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class JsonStore:
+    """
+    Penyimpanan dict JSON dengan cache in-memory dan write-back
+
+    File hanya di-parse sekali lalu disimpan di memori. Perubahan file oleh
+    proses lain dideteksi lewat mtime/ukuran/inode file dan memicu reload,
+    selama tidak ada perubahan lokal yang belum di-flush dan data tidak
+    sedang di-pin oleh operasi yang berjalan (``pinned``).
+
+    Aman dipakai beberapa thread: state internal dijaga RLock, dan data
+    disalin secara atomik sebelum ditulis. Serialisasi dan penulisan file
+    berjalan di luar RLock itu, sehingga thread lain tetap bisa membaca dan
+    mengubah key miliknya (misalnya catatan pengguna lain) selama flush.
+
+    Beberapa proses boleh memakai file yang sama: reload dilakukan di bawah
+    shared lock dan flush di bawah exclusive lock (FileLock). Konflik
+    ditangani secara optimistis lewat penghitung versi per key di file:
+    jika proses lain sudah menulis sejak data dimuat, key yang tidak ikut
+    diubah proses itu tetap ditulis, sedangkan perubahan lokal pada key yang
+    juga diubah proses lain dibuang (flush mengembalikan False) dan data
+    key tersebut diganti isi terbaru dari disk.
+    """
+
+    def __init__(self, filename: str, flush_interval: float = STORE_FLUSH_INTERVAL,
+                 max_pending: int = STORE_MAX_PENDING,
+                 check_interval: float = STORE_CHECK_INTERVAL):
+        """
+        Inisialisasi JsonStore
+
+        Args:
+            filename: Path ke file JSON
+            flush_interval: Jeda maksimum (detik) sebelum perubahan ditulis;
+                0 berarti setiap commit langsung ditulis
+            max_pending: Jumlah commit maksimum yang boleh tertunda
+            check_interval: Jeda minimum (detik) antar pengecekan perubahan
+                file oleh proses lain; 0 berarti dicek setiap akses
+        """
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.check_interval = check_interval
+        # Generasi seluruh data (naik saat data dimuat penuh) dan generasi
+        # per key (naik saat key itu diganti isi disk); lihat generation_of
+        self.generation = 0
+        self._generations: Dict[str, int] = {}
+
+        self._data: Optional[Dict] = None
+        self._signature: Any = None
+        self._pending = 0
+        self._pins = 0
+        # Key yang objeknya diganti merge saat ada operasi yang di-pin:
+        # {key: nomor penggantian}. Operasi yang mulai sebelum penggantian
+        # masih memegang objek lama, jadi commit-nya untuk key itu ditolak
+        self._swaps = 0
+        self._swapped: Dict[str, int] = {}
+        self._local = threading.local()
+        self._last_flush = time.monotonic()
+        self._last_check = 0.0
+        self._lock = FileLock(filename)
+        self._guard = threading.RLock()
+        # Menyerialkan flush; penulisan file sendiri tidak memegang _guard
+        self._flush_lock = threading.Lock()
+        # Versi key saat data terakhir dimuat/ditulis, dan key yang diubah
+        # sejak itu (None = semua key, commit tanpa daftar perubahan)
+        self._base_versions: Dict[str, int] = {}
+        self._touched: Optional[Set[str]] = set()
+
+        _open_stores.add(self)
+
+    # ==============================
+    # INTERNAL HELPERS
+    # ==============================
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None
+        # File selalu diganti lewat rename, jadi inode ikut berubah walaupun
+        # mtime/ukuran kebetulan sama
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _exists(self, signature: Any) -> bool:
+        return signature is not None
+
+    def _load(self) -> Dict:
+        return load_data(self.filename)
+
+    def _prepare_write(self) -> Any:
+        # Dipanggil di bawah _guard: salin yang akan ditulis
+        return _snapshot(self._data)
+
+    def _write(self, data: Any) -> bool:
+        # Dipanggil tanpa _guard (hanya file lock), dengan hasil _prepare_write
+        return save_data(self.filename, data)
+
+    def _written(self, data: Any, success: bool) -> None:
+        pass
+
+    def _queue(self, changes: Optional[List[Change]]) -> Any:
+        if changes is None:
+            self._touched = None
+        elif self._touched is not None:
+            self._touched.update(change[1][0] for change in changes)
+        return None
+
+    def _unqueue(self, queued: Any) -> None:
+        pass
+
+    def _ensure_loaded(self) -> Dict:
+        # Perubahan lokal yang belum di-flush selalu menang atas isi file,
+        # dan data yang sedang di-pin tidak diganti di tengah operasi
+        with self._guard:
+            if self._data is not None and (self._pending or self._pins):
+                return self._data
+
+            if self._data is not None and self.check_interval > 0:
+                now = time.monotonic()
+                if now - self._last_check < self.check_interval:
+                    return self._data
+                self._last_check = now
+
+            signature = self._file_signature()
+            if self._data is None or signature != self._signature:
+                # File yang belum ada dibaca tanpa lock (file data hanya
+                # muncul lewat rename atomik), jadi mencari key yang tidak ada
+                # tidak membuat file .lock
+                with self._lock.hold() if self._exists(signature) else nullcontext():
+                    self._signature = self._file_signature()
+                    reloaded = self._data is not None
+                    self._data = self._load()
+                versions = self._data.get(VERSION_KEY, {})
+                changed = self._changed_keys(versions) if reloaded else None
+                self._base_versions = dict(versions)
+                self._last_check = time.monotonic()
+                self._advance(changed)
+            return self._data
+
+    def _changed_keys(self, versions: Dict[str, int]) -> Set[str]:
+        return {key for key in set(versions) | set(self._base_versions)
+                if versions.get(key, 0) != self._base_versions.get(key, 0)}
+
+    def _advance(self, changed: Optional[Set[str]]) -> None:
+        # File berubah tanpa versi key yang berubah (mis. ditulis program
+        # lama): tidak diketahui key mana yang berubah, jadi anggap semua
+        if not changed:
+            self.generation += 1
+            return
+        for key in changed:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def _touched_keys(self, *datasets: Dict) -> Set[str]:
+        if self._touched is not None:
+            return set(self._touched)
+        keys = set()
+        for data in datasets:
+            keys.update(key for key in data if key not in RESERVED_KEYS)
+            keys.update(data.get(META_KEY, {}))
+        return keys
+
+    def _merge_external(self) -> Set[str]:
+        """
+        Menggabungkan perubahan lokal dengan file yang ditulis proses lain
+
+        Dipanggil di bawah exclusive lock. Key yang versinya di disk berubah
+        sejak dimuat diganti isi disk; perubahan lokal pada key seperti itu
+        dibuang (konflik). Key lain tetap memakai objek lokal yang sama.
+        Key yang objeknya diganti saat ada operasi yang di-pin dicatat agar
+        commit operasi itu ditolak (lihat ``_is_stale``).
+
+        Returns:
+            Key yang konflik; perubahan lokalnya dibuang
+        """
+        local = self._data
+        fresh = self._load()
+        disk_versions = fresh.get(VERSION_KEY, {})
+
+        changed = self._changed_keys(disk_versions)
+        touched = self._touched_keys(local, fresh)
+        conflicts = touched & changed
+        if conflicts and self._touched is None:
+            # Commit tanpa daftar perubahan tidak bisa dipisah per key
+            conflicts = touched
+
+        local_meta = local.setdefault(META_KEY, {})
+        fresh_meta = fresh.get(META_KEY, {})
+        for key in changed | conflicts:
+            if self._pins:
+                self._swaps += 1
+                self._swapped[key] = self._swaps
+            if key in fresh:
+                local[key] = fresh[key]
+            else:
+                local.pop(key, None)
+            if key in fresh_meta:
+                local_meta[key] = fresh_meta[key]
+            else:
+                local_meta.pop(key, None)
+
+        local[VERSION_KEY] = dict(disk_versions)
+        self._base_versions = dict(disk_versions)
+        self._touched = touched - conflicts
+        if changed | conflicts:
+            self._advance(changed | conflicts)
+        return conflicts
+
+    def _is_stale(self, changes: Optional[List[Change]]) -> bool:
+        """True jika operasi di thread ini memegang objek yang sudah diganti merge"""
+        since = getattr(self._local, "since", None)
+        if since is None or not self._swapped:
+            return False
+        if changes is None:
+            return max(self._swapped.values()) > since
+        return any(self._swapped.get(change[1][0], 0) > since for change in changes)
+
+    def _bump_versions(self) -> Dict[str, int]:
+        versions = self._data.setdefault(VERSION_KEY, {})
+        bumped = {}
+        for key in self._touched_keys(self._data):
+            bumped[key] = versions[key] = self._base_versions.get(key, 0) + 1
+        return bumped
+
+    # ==============================
+    # PUBLIC METHODS
+    # ==============================
+
+    def data(self) -> Dict:
+        """Mengembalikan dict data (live, bukan salinan)"""
+        return self._ensure_loaded()
+
+    @contextmanager
+    def pinned(self) -> Iterator[None]:
+        """
+        Menahan data di memori selama satu operasi
+
+        Di dalam blok, data tidak dimuat ulang walaupun file diubah proses
+        lain, sehingga objek yang diambil pemanggil tetap bagian dari data
+        yang di-commit. Tulisan proses lain tetap dideteksi saat flush.
+        """
+        with self._guard:
+            self._ensure_loaded()
+            self._pins += 1
+            depth = getattr(self._local, "depth", 0)
+            if not depth:
+                self._local.since = self._swaps
+            self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            with self._guard:
+                self._pins -= 1
+                self._local.depth -= 1
+                if not self._local.depth:
+                    self._local.since = None
+                if not self._pins:
+                    self._swapped.clear()
+
+    def generation_of(self, key: str) -> int:
+        """
+        Generasi data untuk key
+
+        Berubah saat isi key diganti isi disk (tulisan proses lain atau
+        muat ulang penuh), bukan setiap kali key lain di file berubah.
+        """
+        with self._guard:
+            self._ensure_loaded()
+            return self.generation + self._generations.get(key, 0)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._ensure_loaded().get(key, default)
+
+    def setdefault(self, key: str, default: Any) -> Any:
+        return self._ensure_loaded().setdefault(key, default)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        return self._ensure_loaded().pop(key, default)
+
+    def meta(self, key: str) -> Dict:
+        """Metadata live untuk key; ubah lalu commit dengan op meta"""
+        return self._ensure_loaded().setdefault(META_KEY, {}).setdefault(key, {})
+
+    def keys(self) -> List[str]:
+        return [key for key in self._ensure_loaded() if key not in RESERVED_KEYS]
+
+    def __contains__(self, key: str) -> bool:
+        return key not in RESERVED_KEYS and key in self._ensure_loaded()
+
+    @property
+    def dirty(self) -> bool:
+        return self._pending > 0
+
+    def commit(self, changes: Optional[List[Change]] = None) -> bool:
+        """
+        Menandai data berubah dan menulisnya bila batas batch tercapai
+
+        Args:
+            changes: Daftar perubahan yang sudah diterapkan ke data
+                (dipakai oleh store berbasis journal)
+
+        Returns:
+            False jika penulisan ke disk gagal, perubahan bentrok dengan
+            proses lain, atau objek yang diubah sudah diganti merge sejak
+            operasi ini dimulai (perubahan tidak disimpan)
+        """
+        with self._guard:
+            if self._is_stale(changes):
+                return False
+            queued = self._queue(changes)
+            self._pending += 1
+
+            if (self.flush_interval > 0
+                    and self._pending < self.max_pending
+                    and time.monotonic() - self._last_flush < self.flush_interval):
+                return True
+
+        if self.flush():
+            return True
+        with self._guard:
+            self._unqueue(queued)
+        return False
+
+    def flush(self) -> bool:
+        """
+        Menulis perubahan yang tertunda ke disk
+
+        Returns:
+            False jika penulisan gagal, atau jika sebagian perubahan dibuang
+            karena key yang sama sudah diubah proses lain
+        """
+        with self._flush_lock, ExitStack() as file_lock:
+            with self._guard:
+                if not self._pending or self._data is None:
+                    return True
+
+                # Urutan lock selalu _guard lalu file lock; file lock tetap
+                # dipegang setelah _guard dilepas sampai penulisan selesai
+                file_lock.enter_context(self._lock.hold(exclusive=True))
+                conflicts = set()
+                if self._file_signature() != self._signature:
+                    conflicts = self._merge_external()
+
+                self._bump_versions()
+                data = self._prepare_write()
+                written = self._pending
+                touched, self._touched = self._touched, set()
+
+            # _pending belum dikurangi, jadi data tidak dimuat ulang selama menulis
+            success = self._write(data)
+            signature = self._file_signature() if success else None
+            file_lock.close()
+
+            with self._guard:
+                self._written(data, success)
+                if not success:
+                    if touched is None or self._touched is None:
+                        self._touched = None
+                    else:
+                        self._touched |= touched
+                    return False
+
+                self._signature = signature
+                self._base_versions = dict(self._data.get(VERSION_KEY, {}))
+                self._pending -= written
+                self._last_flush = time.monotonic()
+                return not conflicts
+
+    def close(self) -> bool:
+        """Flush perubahan dan lepaskan cache"""
+        success = self.flush()
+        with self._guard:
+            if success and not self._pending:
+                self._data = None
+                self._signature = None
+            self._lock.close()
+        _open_stores.discard(self)
+        return success
+
+
+class JournalStore(JsonStore):
+    """
+    JsonStore dengan write-ahead log append-only
+
+    Setiap commit menambahkan satu record ringkas per perubahan ke file
+    ``<filename>.log``. Saat log melewati ``compact_size`` byte, isinya
+    dilipat ke snapshot (file JSON utama) dan log dikosongkan. Baris
+    pertama log menyimpan digest snapshot yang menjadi dasarnya, sehingga
+    log yang sudah terlipat tidak diputar ulang setelah crash.
+    """
+
+    def __init__(self, filename: str, flush_interval: float = STORE_FLUSH_INTERVAL,
+                 max_pending: int = STORE_MAX_PENDING,
+                 compact_size: int = JOURNAL_COMPACT_SIZE,
+                 check_interval: float = STORE_CHECK_INTERVAL):
+        """
+        Inisialisasi JournalStore
+
+        Args:
+            filename: Path ke file snapshot JSON
+            flush_interval: Jeda maksimum (detik) sebelum perubahan ditulis
+            max_pending: Jumlah commit maksimum yang boleh tertunda
+            compact_size: Ukuran log (byte) yang memicu kompaksi
+            check_interval: Jeda minimum (detik) antar pengecekan file
+        """
+        super().__init__(filename, flush_interval, max_pending, check_interval)
+        self.log_file = filename + ".log"
+        self.compact_size = compact_size
+
+        # Record log yang belum ditulis: (key, baris JSON)
+        self._records: List[Tuple[str, str]] = []
+        self._full_write = False
+        self._snapshot_digest: Optional[str] = None
+
+    def _file_signature(self) -> Any:
+        try:
+            stat = os.stat(self.log_file)
+            log_signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            log_signature = None
+        return super()._file_signature(), log_signature
+
+    def _exists(self, signature: Any) -> bool:
+        return signature != (None, None)
+
+    def _log_size(self) -> int:
+        try:
+            return os.path.getsize(self.log_file)
+        except OSError:
+            return 0
+
+    def _read_log(self) -> List[Dict]:
+        records = []
+        try:
+            with open(self.log_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Record terakhir terpotong saat crash; tulis ulang
+                        # log pada flush berikutnya agar tidak tersambung
+                        self._full_write = True
+                        break
+        except OSError:
+            pass
+        return records
+
+    def _load(self) -> Dict:
+        data = load_data(self.filename)
+        self._snapshot_digest = _file_digest(self.filename)
+
+        records = self._read_log()
+        if records and records[0].get("snapshot") == self._snapshot_digest:
+            for record in records[1:]:
+                try:
+                    apply_change(data, (record["op"], record["path"], record.get("value")))
+                except (KeyError, IndexError, TypeError):
+                    break
+        elif records:
+            # Log sudah dilipat ke snapshot sebelum sempat dikosongkan
+            self._records = []
+            self._full_write = True
+
+        return data
+
+    def _prepare_write(self) -> Tuple[str, List[Tuple[str, str]], Any]:
+        # Record yang diambil di sini dikembalikan oleh _written jika gagal;
+        # record dari commit selama penulisan menunggu flush berikutnya
+        records, self._records = self._records, []
+        if self._full_write or self._log_size() >= self.compact_size:
+            self._full_write = False
+            return "compact", records, _snapshot(self._data)
+        return "append", records, self._snapshot_digest
+
+    def _write(self, data: Tuple[str, List[Tuple[str, str]], Any]) -> bool:
+        mode, records, value = data
+        if mode == "compact":
+            return self._write_snapshot(value)
+
+        try:
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                if f.tell() == 0:
+                    f.write(json.dumps({"snapshot": value}) + "\n")
+                f.write("".join(line for _, line in records))
+                sync_file(f)
+        except IOError:
+            return False
+        return True
+
+    def _written(self, data: Tuple[str, List[Tuple[str, str]], Any], success: bool) -> None:
+        if not success:
+            mode, records, _ = data
+            self._records = records + self._records
+            if mode == "compact":
+                self._full_write = True
+
+    def _write_snapshot(self, data: Dict) -> bool:
+        # Dipegang file lock exclusive: pembaca digest juga memegang file lock
+        if not save_data(self.filename, data):
+            return False
+
+        self._snapshot_digest = _file_digest(self.filename)
+
+        try:
+            with open(self.log_file, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"snapshot": self._snapshot_digest}) + "\n")
+                sync_file(f)
+        except IOError:
+            return False
+        return True
+
+    def _queue(self, changes: Optional[List[Change]]) -> List[Tuple[str, str]]:
+        super()._queue(changes)
+        queued = []
+        if changes is None:
+            self._full_write = True
+        else:
+            for op, path, value in changes:
+                record = {"op": op, "path": path}
+                if value is not None:
+                    record["value"] = value
+                queued.append((path[0], self._record_line(record)))
+            self._records.extend(queued)
+        return queued
+
+    def _unqueue(self, queued: List[Tuple[str, str]]) -> None:
+        # Pemanggil boleh membatalkan perubahan di memori (mis. rollback
+        # NoteBatch), jadi record-nya jangan sampai tertulis nanti. Bila
+        # penulisan gagal, flush berikutnya menulis snapshot dari memori
+        if queued:
+            own = {id(record) for record in queued}
+            self._records = [record for record in self._records if id(record) not in own]
+        if self._pending:
+            self._full_write = True
+
+    @staticmethod
+    def _record_line(record: Dict) -> str:
+        return json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+    def _merge_external(self) -> Set[str]:
+        # Record key lain tetap berlaku: nilai dasarnya tidak diubah proses lain
+        conflicts = super()._merge_external()
+        self._records = [record for record in self._records if record[0] not in conflicts]
+        return conflicts
+
+    def _bump_versions(self) -> Dict[str, int]:
+        bumped = super()._bump_versions()
+        for key, version in bumped.items():
+            self._records.append(
+                (key, self._record_line({"op": "version", "path": [key], "value": version}))
+            )
+        return bumped
+
+    def compact(self) -> bool:
+        """Melipat log ke snapshot lalu mengosongkan log"""
+        with self._guard:
+            self._ensure_loaded()
+            self._full_write = True
+            self._pending += 1
+        return self.flush()
+
+
+class ShardedStore:
+    """
+    Store catatan dengan satu file JSON per pengguna
+
+    Shard disimpan di direktori ``<filename tanpa ekstensi>.d`` dengan nama
+    file berupa hash username, dan masing-masing dikelola oleh JsonStore
+    sendiri. Operasi satu pengguna hanya membaca dan menulis shard miliknya.
+    """
+
+    def __init__(self, filename: str, flush_interval: float = STORE_FLUSH_INTERVAL,
+                 max_pending: int = STORE_MAX_PENDING):
+        """
+        Inisialisasi ShardedStore
+
+        Args:
+            filename: Path ke file data JSON (dipakai untuk nama direktori)
+            flush_interval: Jeda maksimum (detik) sebelum perubahan ditulis
+            max_pending: Jumlah commit maksimum per shard yang boleh tertunda
+        """
+        self.filename = filename
+        self.shard_dir = shard_dir(filename)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._shards: Dict[str, JsonStore] = {}
+        self._retired_generation = 0
+        self._guard = threading.Lock()
+        # Pin berlaku per thread: setiap operasi menahan shard yang dipakainya
+        self._local = threading.local()
+
+    # ==============================
+    # INTERNAL HELPERS
+    # ==============================
+
+    def _shard_path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return os.path.join(self.shard_dir, name + ".json")
+
+    def _shard(self, key: str) -> JsonStore:
+        with self._guard:
+            shard = self._shards.get(key)
+            if shard is None:
+                shard = JsonStore(self._shard_path(key), self.flush_interval, self.max_pending)
+                self._shards[key] = shard
+
+        stack = getattr(self._local, "stack", None)
+        if stack is not None and key not in self._local.pinned:
+            stack.enter_context(shard.pinned())
+            self._local.pinned.add(key)
+        return shard
+
+    def _loaded_shards(self) -> List[Tuple[str, JsonStore]]:
+        with self._guard:
+            return list(self._shards.items())
+
+    def _drop_shard(self, key: str) -> bool:
+        with self._guard:
+            shard = self._shards.pop(key, None)
+            if shard is not None:
+                self._retired_generation += shard.generation
+        getattr(self._local, "pinned", set()).discard(key)
+        if shard is not None:
+            shard.close()
+        try:
+            os.remove(self._shard_path(key))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        return True
+
+    # ==============================
+    # PUBLIC METHODS
+    # ==============================
+
+    @property
+    def generation(self) -> int:
+        return self._retired_generation + sum(
+            shard.generation for _, shard in self._loaded_shards()
+        )
+
+    def data(self) -> Dict:
+        """Mengembalikan seluruh data sebagai dict (memuat semua shard)"""
+        return {key: self.get(key) for key in self.keys()}
+
+    @contextmanager
+    def pinned(self) -> Iterator[None]:
+        """Menahan shard yang dipakai selama satu operasi (lihat JsonStore.pinned)"""
+        if getattr(self._local, "stack", None) is not None:
+            yield
+            return
+
+        with ExitStack() as stack:
+            self._local.stack = stack
+            self._local.pinned = set()
+            try:
+                yield
+            finally:
+                self._local.stack = None
+
+    def generation_of(self, key: str) -> int:
+        return self._shard(key).generation_of(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._shard(key).data().get("notes", default)
+
+    def setdefault(self, key: str, default: Any) -> Any:
+        data = self._shard(key).data()
+        if "notes" not in data:
+            data["username"] = key
+            data["notes"] = default
+        return data["notes"]
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        return self._shard(key).data().pop("notes", default)
+
+    def meta(self, key: str) -> Dict:
+        data = self._shard(key).data()
+        data.setdefault("username", key)
+        return data.setdefault("meta", {})
+
+    def keys(self) -> List[str]:
+        keys = [key for key, shard in self._loaded_shards() if "notes" in shard.data()]
+        try:
+            names = os.listdir(self.shard_dir)
+        except OSError:
+            names = []
+
+        for name in names:
+            if name.endswith(".json"):
+                data = load_data(os.path.join(self.shard_dir, name))
+                key = data.get("username")
+                if key is not None and "notes" in data and key not in keys:
+                    keys.append(key)
+        return keys
+
+    def __contains__(self, key: str) -> bool:
+        return "notes" in self._shard(key).data()
+
+    @property
+    def dirty(self) -> bool:
+        return any(shard.dirty for _, shard in self._loaded_shards())
+
+    def commit(self, changes: Optional[List[Change]] = None) -> bool:
+        """
+        Meneruskan commit ke shard milik pengguna yang berubah
+
+        Args:
+            changes: Daftar perubahan; None berarti semua shard yang dimuat
+
+        Returns:
+            False jika penulisan salah satu shard gagal
+        """
+        if changes is None:
+            keys = [key for key, _ in self._loaded_shards()]
+        else:
+            keys = []
+            for change in changes:
+                if change[1][0] not in keys:
+                    keys.append(change[1][0])
+
+        success = True
+        for key in keys:
+            shard = self._shard(key)
+            data = shard.data()
+            # Shard tanpa catatan tetap disimpan selama metadata-nya berisi
+            # (mis. kunci data terbungkus milik pengguna terenkripsi)
+            if "notes" not in data and not data.get("meta"):
+                success = self._drop_shard(key) and success
+            else:
+                success = shard.commit() and success
+        return success
+
+    def flush(self) -> bool:
+        success = True
+        for _, shard in self._loaded_shards():
+            success = shard.flush() and success
+        return success
+
+    def close(self) -> bool:
+        success = self.flush()
+        with self._guard:
+            shards, self._shards = self._shards, {}
+        for shard in shards.values():
+            shard.close()
+        return success
+
+
+def open_store(filename: str, backend: str = STORAGE_BACKEND, kind: str = "notes"):
+    """
+    Membuat store sesuai backend yang dipilih
+
+    Args:
+        filename: Path ke file data JSON
+        backend: "json", "journal", "sharded" atau "sqlite"
+        kind: Jenis data ("notes" atau "users"), dipakai backend sqlite
+
+    Returns:
+        Instance store
+    """
+    if backend == "json":
+        return JsonStore(filename)
+
+    if backend == "journal":
+        return JournalStore(filename)
+
+    if backend == "sharded":
+        # Hanya catatan yang di-shard; data pengguna tetap satu file dengan
+        # journal agar login/update profil hanya menulis record yang berubah
+        if kind == "users":
+            return JournalStore(filename)
+        return ShardedStore(filename)
+
+    if backend == "sqlite":
+        from sqlite_store import SqliteNoteStore, SqliteUserStore
+
+        db_file = sqlite_path(filename)
+        if kind == "users":
+            return SqliteUserStore(db_file)
+        return SqliteNoteStore(db_file)
+
+    raise ValueError(f"Backend storage tidak dikenal: {backend}")
+
+
+def shard_dir(filename: str) -> str:
+    """Direktori shard untuk file data JSON (notes.json -> notes.d)"""
+    return os.path.splitext(filename)[0] + ".d"
+
+
+def sqlite_path(filename: str) -> str:
+    """Path database SQLite untuk file data JSON (notes.json -> notes.db)"""
+    return os.path.splitext(filename)[0] + ".db"
@@ -0,0 +1,93 @@
+"""
+Unlock Cache for Asisten Shadow
+"""
+
+import hmac
+import time
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import UNLOCK_CACHE_TTL, UNLOCK_CACHE_SIZE
+
+
+class UnlockCache:
+    """
+    Cache verifikasi kunci catatan per sesi pengguna (TTL + LRU)
+
+    Setelah kunci lolos verifikasi KDF, cache menyimpan HMAC kunci tersebut
+    (dengan secret acak per proses) bersama hash kunci catatan saat itu.
+    Operasi berikutnya dengan kunci yang sama cukup membandingkan HMAC.
+    Entri tidak berlaku lagi jika kunci catatan diganti, TTL habis, atau
+    sesi pengguna diakhiri.
+    """
+
+    def __init__(self, ttl: float = UNLOCK_CACHE_TTL, max_entries: int = UNLOCK_CACHE_SIZE):
+        """
+        Inisialisasi UnlockCache
+
+        Args:
+            ttl: Umur entri dalam detik; 0 menonaktifkan cache
+            max_entries: Jumlah entri maksimum sebelum yang paling lama
+                tidak dipakai dibuang
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._secret = secrets.token_bytes(32)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _digest(self, key: str) -> bytes:
+        return hmac.new(self._secret, key.encode(), hashlib.sha256).digest()
+
+    def check(self, username: str, note: Dict, key: str) -> bool:
+        """True jika kunci ini sudah terverifikasi untuk catatan dalam sesi ini"""
+        if not self.enabled or note.get("id") is None:
+            return False
+
+        cache_key = (username, note["id"])
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return False
+
+            lock, digest, expires = entry
+            if lock != note["lock"] or time.monotonic() >= expires:
+                del self._entries[cache_key]
+                return False
+
+            self._entries.move_to_end(cache_key)
+
+        return hmac.compare_digest(digest, self._digest(key))
+
+    def remember(self, username: str, note: Dict, key: str) -> None:
+        """Mencatat kunci yang baru saja lolos verifikasi"""
+        if not self.enabled or note.get("id") is None:
+            return
+
+        entry = (note["lock"], self._digest(key), time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[(username, note["id"])] = entry
+            self._entries.move_to_end((username, note["id"]))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, username: str, note_id: Optional[int] = None) -> None:
+        """Membuang entri satu catatan, atau semua entri pengguna jika note_id None"""
+        with self._lock:
+            if note_id is not None:
+                self._entries.pop((username, note_id), None)
+                return
+            for cache_key in [k for k in self._entries if k[0] == username]:
+                del self._entries[cache_key]
+
+    def clear(self) -> None:
+        """Membuang semua entri"""
+        with self._lock:
+            self._entries.clear()
@@ -3,18 +3,47 @@ User Management Module for Asisten Shadow (Hardened Version)
 Python 3.8 Compatible
 """
 
-from typing import Dict, Optional, Tuple, List
-from utils import load_data, save_data, get_timestamp
+import copy
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple, List
+from utils import get_timestamp
 from config import USER_FILE, MIN_USERNAME_LENGTH, MIN_PASSWORD_LENGTH, MESSAGES
-import hashlib
-import secrets
+from storage import open_store
+from rw_lock import RWLockTable, read_operation, write_operation
+from activity import ActivityRecorder
+from kdf import hash_secret, verify_secret, needs_rehash
+from verifier import VerificationExecutor, default_verifier
 
 
 class UserManager:
-    """Class untuk mengelola registrasi dan autentikasi pengguna"""
+    """
+    Class untuk mengelola registrasi dan autentikasi pengguna
 
-    def __init__(self, user_file: str = USER_FILE):
+    Aman dipakai dari banyak thread; operasi satu username diserialkan
+    lewat lock reader/writer miliknya.
+
+    Jika catatan dienkripsi, berikan NotesManager-nya sebagai notes_manager
+    agar change_password ikut membungkus ulang kunci data catatan.
+    """
+
+    def __init__(self, user_file: str = USER_FILE, store=None,
+                 verifier: Optional[VerificationExecutor] = None,
+                 notes_manager=None):
         self.user_file = user_file
+        self._notes = notes_manager
+        self._store = store if store is not None else open_store(user_file, kind="users")
+        self._verifier = verifier if verifier is not None else default_verifier()
+        self._activity = ActivityRecorder(self._store)
+        self._user_locks = RWLockTable()
+
+    def flush(self) -> bool:
+        """Menulis statistik login tertunda dan perubahan store ke disk"""
+        return self._activity.flush() and self._store.flush()
+
+    def close(self) -> bool:
+        """Flush lalu melepaskan cache"""
+        recorded = self._activity.close()
+        return self._store.close() and recorded
 
     # ==============================
     # INTERNAL HELPERS
@@ -23,34 +52,50 @@ class UserManager:
     def _normalize_username(self, username: str) -> str:
         return username.strip().lower()
 
+    @contextmanager
+    def _locked(self, username: str, write: bool = False) -> Iterator[None]:
+        lock = self._user_locks.get(self._normalize_username(username or ""))
+        with (lock.write() if write else lock.read()), self._store.pinned():
+            yield
+
     def _hash_password(self, password: str) -> str:
-        salt = secrets.token_hex(8)
-        hashed = hashlib.sha256((salt + password).encode()).hexdigest()
-        return f"{salt}${hashed}"
+        if self._verifier is not None:
+            return self._verifier.hash(password)
+        return hash_secret(password)
 
     def _verify_password(self, stored_password: str, password: str) -> bool:
-        try:
-            salt, stored_hash = stored_password.split("$")
-            check_hash = hashlib.sha256((salt + password).encode()).hexdigest()
-            return check_hash == stored_hash
-        except Exception:
-            return False
-
-    def _load_users(self) -> Dict:
-        return load_data(self.user_file)
-
-    def _save_users(self, users: Dict) -> bool:
-        return save_data(self.user_file, users)
+        if self._verifier is not None:
+            return self._verifier.verify(stored_password, password)
+        return verify_secret(stored_password, password)
 
     def _get_user(self, username: str) -> Optional[Dict]:
         username = self._normalize_username(username)
-        users = self._load_users()
-        return users.get(username)
+        return self._store.get(username)
+
+    def _save_user(self, username: str, user: Dict, previous: Optional[Dict]) -> bool:
+        """
+        Commit record pengguna yang sudah diubah di tempat
+
+        Jika commit gagal, record di memori dikembalikan ke ``previous``
+        (None = pengguna baru, dibuang) agar tidak ikut tertulis nanti.
+        """
+        if self._store.commit([("set", [username], user)]):
+            return True
+
+        # Record yang sudah diganti store (reload/merge) sudah sesuai disk
+        if self._store.get(username) is user:
+            if previous is None:
+                self._store.pop(username, None)
+            else:
+                user.clear()
+                user.update(previous)
+        return False
 
     # ==============================
     # PUBLIC METHODS
     # ==============================
 
+    @write_operation
     def register(self, username: str, password: str) -> Tuple[bool, str]:
 
         if not username or not password:
@@ -67,12 +112,10 @@ class UserManager:
         if len(password) < MIN_PASSWORD_LENGTH:
             return False, MESSAGES["invalid_password"]
 
-        users = self._load_users()
-
-        if username in users:
+        if username in self._store:
             return False, MESSAGES["username_exists"]
 
-        users[username] = {
+        user = self._store.setdefault(username, {
             "password": self._hash_password(password),
             "created_at": get_timestamp(),
             "last_login": None,
@@ -81,43 +124,57 @@ class UserManager:
                 "email": None,
                 "bio": None,
             },
-        }
+        })
 
-        if self._save_users(users):
+        if self._save_user(username, user, None):
             return True, MESSAGES["register_success"]
 
         return False, MESSAGES["save_failed"]
 
+    @write_operation
     def login(self, username: str, password: str) -> Tuple[bool, str]:
 
         username = self._normalize_username(username)
-        users = self._load_users()
+        user = self._store.get(username)
 
-        if username not in users:
+        if user is None:
             return False, MESSAGES["username_not_found"]
 
-        if not self._verify_password(users[username]["password"], password):
+        if not self._verify_password(user["password"], password):
             return False, MESSAGES["wrong_password"]
 
-        users[username]["last_login"] = get_timestamp()
-        users[username]["login_count"] = users[username].get("login_count", 0) + 1
+        # Hash lama atau parameter KDF yang sudah diganti: hash ulang sekali
+        if needs_rehash(user["password"]):
+            previous = copy.deepcopy(user)
+            user["password"] = self._hash_password(password)
+            self._save_user(username, user, previous)
 
-        self._save_users(users)
+        # Statistik login di-buffer; verifikasi password yang menentukan latensi
+        self._activity.record_login(username)
         return True, MESSAGES["login_success"]
 
+    @read_operation
     def get_user_info(self, username: str) -> Optional[Dict]:
         user = self._get_user(username)
         if not user:
             return None
 
+        login_count = user.get("login_count", 0)
+        last_login = user.get("last_login")
+        pending = self._activity.pending(self._normalize_username(username))
+        if pending is not None:
+            login_count += pending[0]
+            last_login = pending[1]
+
         # Tidak expose password
         return {
             "created_at": user.get("created_at"),
-            "last_login": user.get("last_login"),
-            "login_count": user.get("login_count", 0),
-            "profile": user.get("profile", {}),
+            "last_login": last_login,
+            "login_count": login_count,
+            "profile": dict(user.get("profile", {})),
         }
 
+    @write_operation
     def update_profile(
         self,
         username: str,
@@ -126,22 +183,24 @@ class UserManager:
     ) -> Tuple[bool, str]:
 
         username = self._normalize_username(username)
-        users = self._load_users()
+        user = self._store.get(username)
 
-        if username not in users:
+        if user is None:
             return False, MESSAGES["username_not_found"]
 
+        previous = copy.deepcopy(user)
         if email is not None:
-            users[username]["profile"]["email"] = email
+            user["profile"]["email"] = email
 
         if bio is not None:
-            users[username]["profile"]["bio"] = bio
+            user["profile"]["bio"] = bio
 
-        if self._save_users(users):
+        if self._save_user(username, user, previous):
             return True, "✔ Profil berhasil diupdate!"
 
         return False, MESSAGES["save_failed"]
 
+    @write_operation
     def change_password(
         self,
         username: str,
@@ -150,51 +209,66 @@ class UserManager:
     ) -> Tuple[bool, str]:
 
         username = self._normalize_username(username)
-        users = self._load_users()
+        user = self._store.get(username)
 
-        if username not in users:
+        if user is None:
             return False, MESSAGES["username_not_found"]
 
-        if not self._verify_password(users[username]["password"], old_password):
+        if not self._verify_password(user["password"], old_password):
             return False, "❌ Password lama salah!"
 
         if len(new_password) < MIN_PASSWORD_LENGTH:
             return False, MESSAGES["invalid_password"]
 
-        users[username]["password"] = self._hash_password(new_password)
+        # Kunci data catatan dibungkus password; bungkus ulang lebih dulu
+        # agar catatan terenkripsi tetap terbuka dengan password baru
+        if self._notes is not None:
+            success, message = self._notes.change_password(
+                username, old_password, new_password
+            )
+            if not success:
+                return False, message
+
+        previous = copy.deepcopy(user)
+        user["password"] = self._hash_password(new_password)
 
-        if self._save_users(users):
+        if self._save_user(username, user, previous):
             return True, "✔ Password berhasil diubah!"
 
+        if self._notes is not None:
+            self._notes.change_password(username, new_password, old_password)
         return False, MESSAGES["save_failed"]
 
+    @write_operation
     def delete_user(self, username: str, password: str) -> Tuple[bool, str]:
 
         username = self._normalize_username(username)
-        users = self._load_users()
+        user = self._store.get(username)
 
-        if username not in users:
+        if user is None:
             return False, MESSAGES["username_not_found"]
 
-        if not self._verify_password(users[username]["password"], password):
+        if not self._verify_password(user["password"], password):
             return False, MESSAGES["wrong_password"]
 
-        del users[username]
+        self._store.pop(username)
 
-        if self._save_users(users):
+        if self._store.commit([("del", [username], None)]):
+            self._activity.discard(username)
             return True, "✔ Akun berhasil dihapus!"
 
+        # Penghapusan yang gagal tidak boleh ikut tertulis commit berikutnya
+        self._store.setdefault(username, user)
         return False, MESSAGES["save_failed"]
 
     def get_all_users(self) -> List[str]:
-        users = self._load_users()
-        return list(users.keys())
+        return self._store.keys()
 
     def user_exists(self, username: str) -> bool:
         username = self._normalize_username(username)
-        users = self._load_users()
-        return username in users
+        return username in self._store
 
+    @read_operation
     def get_user_stats(self, username: str) -> Optional[Dict]:
 
         username = self._normalize_username(username)
@@ -3,38 +3,237 @@ Utility functions for Asisten Shadow
 """
 
 import os
+import gzip
 import json
 import base64
 import hashlib
 import datetime
 import shutil
-from typing import Dict, Optional, Tuple, List
-from config import HASH_ALGORITHM, SCREEN_WIDTH, HEADER_CHAR, SEPARATOR_CHAR
+import marshal
+import tempfile
+from typing import IO, Any, Dict, Iterator, Optional, Tuple, List
+from config import (
+    HASH_ALGORITHM, SCREEN_WIDTH, HEADER_CHAR, SEPARATOR_CHAR, SAVE_DURABILITY,
+    STORAGE_FORMAT
+)
+
+# Format file data yang didukung save_data; load_data mengenali semuanya
+DATA_FORMATS = ("json", "compact", "jsonl", "marshal")
+
+# Penanda awal file format "marshal" (tidak mungkin muncul di awal file JSON)
+MARSHAL_MAGIC = b"\x00ASHM1\n"
 
 
 def load_data(filename: str) -> Dict:
+    """
+    Membaca file data; format (JSON, JSON Lines atau marshal) dikenali
+    otomatis sehingga STORAGE_FORMAT bisa diganti tanpa migrasi
+    """
     if not os.path.exists(filename):
         return {}
 
     try:
-        with open(filename, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(filename, "rb") as f:
+            data = parse_data(f.read())
             return data if isinstance(data, dict) else {}
-    except (json.JSONDecodeError, IOError):
+    except (ValueError, EOFError, TypeError, IOError):
         return {}
 
 
-def save_data(filename: str, data: Dict) -> bool:
+def parse_data(raw: bytes) -> Any:
+    """Mengurai isi file data dari format apa pun di DATA_FORMATS"""
+    if raw.startswith(MARSHAL_MAGIC):
+        return marshal.loads(raw[len(MARSHAL_MAGIC):])
+
+    text = raw.decode("utf-8")
+    if text.lstrip().startswith("["):
+        # JSON Lines: satu [key, value] per baris
+        return dict(json.loads(line) for line in text.splitlines() if line.strip())
+    return json.loads(text)
+
+
+def dump_data(data: Dict, f: IO[bytes], fmt: str = STORAGE_FORMAT) -> None:
+    """
+    Menulis dict ke file biner terbuka
+
+    Args:
+        data: Data yang ditulis
+        f: File yang dibuka dalam mode biner
+        fmt: "json" (terindentasi), "compact" (JSON tanpa spasi),
+            "jsonl" (satu key per baris) atau "marshal" (biner)
+    """
+    if fmt == "marshal":
+        f.write(MARSHAL_MAGIC)
+        f.write(marshal.dumps(data))
+    elif fmt == "jsonl":
+        for item in data.items():
+            line = json.dumps(item, separators=(",", ":"), ensure_ascii=False)
+            f.write(line.encode("utf-8") + b"\n")
+    elif fmt == "compact":
+        f.write(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+    else:
+        f.write(json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8"))
+
+
+def save_data(filename: str, data: Dict, durability: str = SAVE_DURABILITY,
+              fmt: str = STORAGE_FORMAT) -> bool:
+    """
+    Menyimpan dict ke file JSON secara atomik
+
+    Data ditulis ke file sementara di direktori yang sama lalu diganti
+    namanya ke ``filename``, sehingga crash di tengah penulisan tidak
+    merusak file lama.
+
+    Args:
+        filename: Path file tujuan
+        data: Data yang disimpan
+        durability: "none" (tanpa fsync), "file" (fsync file) atau
+            "dir" (fsync file dan direktori agar rename ikut tersimpan)
+        fmt: Format file, salah satu dari DATA_FORMATS
+
+    Returns:
+        True jika berhasil
+
+    Raises:
+        ValueError: Format tidak dikenal
+    """
+    if fmt not in DATA_FORMATS:
+        raise ValueError(f"Format data tidak dikenal: {fmt}")
+
+    directory = os.path.dirname(filename)
+    temp_name = None
     try:
-        directory = os.path.dirname(filename)
         if directory:
             os.makedirs(directory, exist_ok=True)
 
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        fd, temp_name = tempfile.mkstemp(
+            prefix="." + os.path.basename(filename) + ".", suffix=".tmp",
+            dir=directory or None,
+        )
+        with os.fdopen(fd, "wb") as f:
+            dump_data(data, f, fmt)
+            sync_file(f, durability)
+
+        if os.path.exists(filename):
+            shutil.copymode(filename, temp_name)
+        os.replace(temp_name, filename)
+        temp_name = None
+
+        if durability == "dir":
+            sync_directory(directory)
         return True
-    except IOError:
+    except (OSError, TypeError, ValueError):
         return False
+    finally:
+        if temp_name is not None:
+            try:
+                os.remove(temp_name)
+            except OSError:
+                pass
+
+
+def sync_file(f: IO, durability: str = SAVE_DURABILITY) -> None:
+    """Mem-flush file terbuka ke disk; fsync kecuali durability bernilai none"""
+    f.flush()
+    if durability != "none":
+        os.fsync(f.fileno())
+
+
+def sync_directory(directory: str) -> None:
+    """fsync direktori agar rename/pembuatan file tahan crash (POSIX saja)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def iter_json_items(filename: str, chunk_size: int = 65536) -> Iterator[Any]:
+    """
+    Membaca item dari file JSON array atau JSON Lines secara streaming.
+    File .jsonl dibaca sebagai JSON Lines (satu item per baris), file lain
+    harus berisi satu array JSON. File berakhiran .gz dibaca dengan gzip.
+
+    Raises:
+        IOError: File tidak bisa dibaca
+        json.JSONDecodeError: Isi file rusak
+        ValueError: Isi file bukan array JSON
+    """
+    gzipped = filename.endswith(".gz")
+    opener = gzip.open if gzipped else open
+    json_lines = (filename[:-3] if gzipped else filename).endswith(".jsonl")
+    decoder = json.JSONDecoder()
+
+    with opener(filename, "rt", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+
+        def peek(whitespace: str = " \t\r\n") -> str:
+            """Lewati whitespace lalu kembalikan karakter berikutnya ("" = EOF)"""
+            nonlocal buffer, pos, eof
+            while True:
+                while pos < len(buffer) and buffer[pos] in whitespace:
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if eof:
+                    return ""
+                buffer, pos = f.read(chunk_size), 0
+                eof = not buffer
+
+        def decode() -> Any:
+            nonlocal buffer, pos, eof
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    end = None
+
+                # Item terpotong di batas chunk; baca lagi lalu ulangi
+                if end is not None and (end < len(buffer) or eof):
+                    pos = end
+                    return item
+                more = f.read(chunk_size)
+                eof = not more
+                buffer, pos = buffer[pos:] + more, 0
+
+        def error(message: str) -> json.JSONDecodeError:
+            return json.JSONDecodeError(message, buffer, pos)
+
+        if json_lines:
+            while peek():
+                yield decode()
+                # Item berikutnya harus dimulai di baris baru
+                if peek(" \t\r") not in ("\n", ""):
+                    raise error("Expecting newline")
+            return
+
+        char = peek()
+        if char != "[":
+            if not char:
+                raise error("Expecting value")
+            raise ValueError("Format file tidak valid")
+        pos += 1
+
+        if peek() == "]":
+            pos += 1
+        else:
+            while True:
+                yield decode()
+                char = peek()
+                if char not in ("]", ","):
+                    raise error("Expecting ',' delimiter")
+                pos += 1
+                if char == "]":
+                    break
+                if peek() in ("]", ""):
+                    raise error("Expecting value")
+
+        if peek():
+            raise error("Extra data")
 
 
 def hash_password(password: str, algorithm: str = HASH_ALGORITHM) -> str:
@@ -57,6 +256,46 @@ def decode_text(text_b64: str) -> str:
         return "[ERROR: Data rusak]"
 
 
+def decode_preview(text_b64: str, max_length: int = 30) -> str:
+    """
+    Decode awal teks Base64 secukupnya untuk preview.
+    Hanya prefix yang dibutuhkan untuk max_length karakter yang di-decode.
+    """
+    # Setiap karakter UTF-8 paling banyak 4 byte; ambil satu karakter ekstra
+    # agar truncate_text tahu teks memang lebih panjang
+    needed = ((max_length + 1) * 4 + 2) // 3 * 4
+    chunk = text_b64[:needed]
+
+    try:
+        raw = base64.b64decode(chunk.encode())
+        if len(chunk) < len(text_b64):
+            text = raw.decode("utf-8", errors="ignore")
+        else:
+            text = raw.decode()
+    except Exception:
+        return "[ERROR: Data rusak]"
+
+    return truncate_text(text, max_length)
+
+
+def decode_base64_range(text_b64: str, start: int, length: int) -> bytes:
+    """
+    Decode sebagian byte dari teks Base64 tanpa men-decode seluruhnya
+
+    Args:
+        text_b64: Teks Base64
+        start: Offset byte hasil decode
+        length: Jumlah byte yang diambil
+
+    Returns:
+        Byte [start, start + length) (lebih pendek jika data habis)
+    """
+    first = start // 3
+    last = (start + length + 2) // 3
+    raw = base64.b64decode(text_b64[first * 4:last * 4])
+    return raw[start - first * 3:start - first * 3 + length]
+
+
 def get_timestamp(fmt: str = "%Y-%m-%d %H:%M:%S") -> str:
     return datetime.datetime.now().strftime(fmt)
 
@@ -0,0 +1,125 @@
+"""
+Verification Executor for Asisten Shadow
+
+Menjalankan hash/verifikasi KDF di luar thread pemanggil agar banyak login
+dan pembukaan catatan terkunci bisa berjalan paralel di semua core.
+"""
+
+import os
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from kdf import current_scheme, hash_secret, verify_secret
+from config import VERIFY_EXECUTOR, VERIFY_WORKERS, VERIFY_MAX_QUEUE
+
+
+class VerificationExecutor:
+    """
+    Pool proses (atau thread) untuk pekerjaan KDF dengan antrean terbatas
+
+    Paling banyak ``max_queue`` pekerjaan boleh menunggu atau berjalan;
+    pemanggil berikutnya menunggu slot kosong (backpressure) alih-alih
+    menumpuk pekerjaan tanpa batas.
+    """
+
+    def __init__(self, kind: str = "process", workers: int = VERIFY_WORKERS,
+                 max_queue: int = VERIFY_MAX_QUEUE):
+        """
+        Inisialisasi VerificationExecutor
+
+        Args:
+            kind: "process" atau "thread" (KDF hashlib melepas GIL, jadi
+                thread juga berjalan paralel)
+            workers: Jumlah worker; 0 berarti jumlah core
+            max_queue: Jumlah pekerjaan maksimum yang boleh antre/berjalan
+        """
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Jenis executor tidak dikenal: {kind}")
+
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max(max_queue, self.workers)
+
+        self._executor: Optional[Executor] = None
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._lock = threading.Lock()
+
+    def _pool(self) -> Executor:
+        # Pool dibuat saat pertama dipakai, bukan saat import
+        with self._lock:
+            if self._executor is None:
+                pool_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+                self._executor = pool_class(max_workers=self.workers)
+            return self._executor
+
+    def submit(self, fn: Callable, *args: Any, timeout: Optional[float] = None) -> Future:
+        """
+        Menjadwalkan pekerjaan di pool
+
+        Args:
+            fn: Fungsi level modul (harus bisa di-pickle untuk pool proses)
+            timeout: Batas waktu menunggu slot antrean (None = tunggu terus)
+
+        Returns:
+            Future hasil pekerjaan
+
+        Raises:
+            TimeoutError: Antrean penuh sampai timeout habis
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Antrean verifikasi penuh")
+
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def verify(self, encoded: str, secret: str) -> bool:
+        """Verifikasi hash di pool dan menunggu hasilnya"""
+        return self.submit(verify_secret, encoded, secret).result()
+
+    def hash(self, secret: str) -> str:
+        """Membuat hash di pool dan menunggu hasilnya"""
+        # Parameter ditentukan di proses pemanggil, bukan dari config worker
+        return self.submit(hash_secret, secret, *current_scheme()).result()
+
+    async def verify_async(self, encoded: str, secret: str) -> bool:
+        """Versi coroutine dari verify; event loop tidak ikut terblokir"""
+        return await self._run_async(verify_secret, encoded, secret)
+
+    async def hash_async(self, secret: str) -> str:
+        """Versi coroutine dari hash"""
+        return await self._run_async(hash_secret, secret, *current_scheme())
+
+    async def _run_async(self, fn: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        # Menunggu slot antrean bisa blocking, jadi dilakukan di thread lain
+        future = await loop.run_in_executor(None, self.submit, fn, *args)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Menghentikan pool"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+_default_verifier: Optional[VerificationExecutor] = None
+_default_lock = threading.Lock()
+
+
+def default_verifier() -> Optional[VerificationExecutor]:
+    """Executor bersama sesuai VERIFY_EXECUTOR, atau None untuk verifikasi inline"""
+    global _default_verifier
+    if VERIFY_EXECUTOR is None:
+        return None
+    with _default_lock:
+        if _default_verifier is None:
+            _default_verifier = VerificationExecutor(VERIFY_EXECUTOR)
+        return _default_verifier
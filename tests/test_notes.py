@@ -5,7 +5,6 @@ Unit tests for NotesManager
 import os
 import sys
 import pytest
-import tempfile
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -13,14 +12,17 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 from notes_manager import NotesManager
 
 
+@pytest.fixture(autouse=True)
+def fast_kdf(monkeypatch):
+    """Use a cheap key-derivation cost so tests stay fast"""
+    import kdf
+    monkeypatch.setattr(kdf, "KDF_PBKDF2_ITERATIONS", 1000)
+
+
 @pytest.fixture
-def temp_notes_file():
-    """Create temporary notes file for testing"""
-    fd, path = tempfile.mkstemp(suffix='.json')
-    os.close(fd)
-    yield path
-    if os.path.exists(path):
-        os.unlink(path)
+def temp_notes_file(tmp_path):
+    """Temporary notes file; sidecars (.lock, .idx, .bodies) go in the same temp dir"""
+    return str(tmp_path / "notes.json")
 
 
 @pytest.fixture
@@ -91,6 +93,53 @@ class TestGetNotes:
         assert notes[0]["is_locked"] is False
 
 
+class TestPagedListing:
+    """Test paged listing and lazy previews"""
+    
+    def test_list_notes_pages(self, notes_manager):
+        """Test offset/limit paging in storage order"""
+        for i in range(5):
+            notes_manager.add_note("testuser", f"Note {i}")
+        
+        page, total = notes_manager.list_notes("testuser", offset=2, limit=2)
+        assert total == 5
+        assert [i for i, _ in page] == [2, 3]
+    
+    def test_list_notes_sorted(self, notes_manager):
+        """Test sorting by favorite and timestamps"""
+        for i in range(4):
+            notes_manager.add_note("testuser", f"Note {i}")
+        notes_manager.toggle_favorite("testuser", 2)
+        
+        page, _ = notes_manager.list_notes("testuser", limit=1, sort_by="favorite")
+        assert [i for i, _ in page] == [2]
+        
+        page, _ = notes_manager.list_notes(
+            "testuser", limit=2, sort_by="created_at", descending=False
+        )
+        assert [i for i, _ in page] == [0, 1]
+    
+    def test_preview_matches_full_decode(self):
+        """Test that prefix decoding gives the same preview"""
+        from utils import decode_preview, encode_text, truncate_text
+        
+        for text in ["short", "x" * 30, "y" * 31, "é" * 200, "😀" * 40, "a😀" * 50]:
+            assert decode_preview(encode_text(text), 30) == truncate_text(text, 30)
+    
+    def test_display_does_not_decode_full_bodies(self, notes_manager, monkeypatch, capsys):
+        """Test that listing only decodes previews"""
+        import notes_manager as notes_module
+        
+        notes_manager.add_note("testuser", "A" * 10000)
+        monkeypatch.setattr(
+            notes_module, "decode_text", lambda text: pytest.fail("note decoded")
+        )
+        
+        shown = notes_manager.display_notes_list("testuser", limit=10)
+        assert len(shown) == 1
+        assert "AAA..." in capsys.readouterr().out
+
+
 class TestViewNote:
     """Test viewing note content"""
     
@@ -123,6 +172,97 @@ class TestViewNote:
         success, message = notes_manager.view_note("testuser", 99)
         assert success is False
 
+    
+    def test_legacy_lock_is_upgraded(self, notes_manager, temp_notes_file):
+        """Test that unsalted SHA-256 note locks still open and get rehashed"""
+        import hashlib
+        
+        notes_manager.add_note("testuser", "Secret", lock_key="key")
+        note = notes_manager.get_note_by_index("testuser", 0)
+        assert note["lock"].startswith("pbkdf2_sha256$")
+        
+        note["lock"] = hashlib.sha256(b"key").hexdigest()
+        notes_manager._store.commit([("set", ["testuser", 0], note)])
+        
+        assert notes_manager.view_note("testuser", 0, key="wrong")[0] is False
+        assert notes_manager.view_note("testuser", 0, key="key") == (True, "Secret")
+        
+        reloaded = NotesManager(temp_notes_file)
+        assert reloaded.get_note_by_index("testuser", 0)["lock"].startswith("pbkdf2_sha256$")
+        assert reloaded.view_note("testuser", 0, key="key") == (True, "Secret")
+    
+    def test_lock_verified_in_executor(self, temp_notes_file):
+        """Test locked notes with key hashing offloaded to a pool"""
+        from verifier import VerificationExecutor
+        
+        verifier = VerificationExecutor("thread", workers=2)
+        try:
+            manager = NotesManager(temp_notes_file, verifier=verifier)
+            manager.add_note("testuser", "Secret", lock_key="key")
+            assert manager.view_note("testuser", 0, key="key") == (True, "Secret")
+            assert manager.view_note("testuser", 0, key="wrong")[0] is False
+        finally:
+            verifier.shutdown()
+
+
+class TestUnlockCache:
+    """Test per-session caching of verified note keys"""
+    
+    @pytest.fixture
+    def kdf_calls(self, monkeypatch):
+        import notes_manager as module
+        
+        calls = []
+        original = module.verify_secret
+        monkeypatch.setattr(module, "verify_secret", lambda encoded, key: (
+            calls.append(key) or original(encoded, key)
+        ))
+        return calls
+    
+    def test_repeated_unlocks_hash_once(self, notes_manager, kdf_calls):
+        """Test that view, edit and delete reuse one verification"""
+        notes_manager.add_note("testuser", "Secret", lock_key="key")
+        
+        assert notes_manager.view_note("testuser", 0, key="key")[0] is True
+        assert notes_manager.view_note("testuser", 0, key="key")[0] is True
+        assert notes_manager.edit_note("testuser", 0, new_content="Edited", key="key")[0] is True
+        assert kdf_calls == ["key"]
+        
+        assert notes_manager.view_note("testuser", 0, key="wrong")[0] is False
+        assert notes_manager.delete_note("testuser", 0, key="key")[0] is True
+        assert kdf_calls == ["key", "wrong"]
+    
+    def test_end_session_and_lock_change(self, notes_manager, kdf_calls):
+        """Test that logout and a new lock invalidate cached unlocks"""
+        notes_manager.add_note("testuser", "Secret", lock_key="key")
+        notes_manager.view_note("testuser", 0, key="key")
+        
+        notes_manager.end_session("testuser")
+        notes_manager.view_note("testuser", 0, key="key")
+        assert kdf_calls == ["key", "key"]
+        
+        notes_manager.edit_note("testuser", 0, new_lock="newkey", key="key")
+        assert notes_manager.view_note("testuser", 0, key="key")[0] is False
+        assert notes_manager.view_note("testuser", 0, key="newkey")[0] is True
+    
+    def test_ttl_and_lru_eviction(self, temp_notes_file, kdf_calls):
+        """Test that entries expire and the least recently used is evicted"""
+        import time
+        from unlock_cache import UnlockCache
+        
+        manager = NotesManager(temp_notes_file, unlock_cache=UnlockCache(ttl=3600, max_entries=1))
+        manager.add_note("testuser", "One", lock_key="a")
+        manager.add_note("testuser", "Two", lock_key="b")
+        manager.view_note("testuser", 0, key="a")
+        manager.view_note("testuser", 1, key="b")
+        manager.view_note("testuser", 0, key="a")
+        assert kdf_calls == ["a", "b", "a"]
+        
+        manager = NotesManager(temp_notes_file, unlock_cache=UnlockCache(ttl=0.01))
+        manager.view_note("testuser", 0, key="a")
+        time.sleep(0.02)
+        manager.view_note("testuser", 0, key="a")
+        assert kdf_calls == ["a", "b", "a", "a", "a"]
 
 class TestEditNote:
     """Test editing notes functionality"""
@@ -236,6 +376,148 @@ class TestSearchNotes:
         results = notes_manager.search_notes("testuser", "work", search_tags=True)
         assert len(results) >= 1
 
+    
+    def test_search_substring(self, notes_manager):
+        """Test that search still matches inside words"""
+        notes_manager.add_note("testuser", "Pythonic code")
+        notes_manager.add_note("testuser", "Java code")
+        
+        results = notes_manager.search_notes("testuser", "thon")
+        assert [i for i, _ in results] == [0]
+    
+    def test_search_follows_edits_and_deletes(self, notes_manager):
+        """Test that the index is updated on mutations"""
+        notes_manager.add_note("testuser", "Python tutorial")
+        notes_manager.add_note("testuser", "Java tutorial")
+        notes_manager.add_note("testuser", "Go tutorial")
+        assert len(notes_manager.search_notes("testuser", "python")) == 1
+        
+        notes_manager.edit_note("testuser", 1, new_content="Python again")
+        notes_manager.delete_note("testuser", 0)
+        notes_manager.edit_note("testuser", 1, new_lock="key")
+        
+        results = notes_manager.search_notes("testuser", "python")
+        assert [i for i, _ in results] == [0]
+        assert notes_manager.search_notes("testuser", "go") == []
+
+
+class TestQueryNotes:
+    """Test ranked index queries"""
+    
+    def test_word_prefix_and_phrase(self, notes_manager):
+        """Test the supported query forms"""
+        notes_manager.add_note("testuser", "python tutorial for beginners")
+        notes_manager.add_note("testuser", "advanced python programming")
+        notes_manager.add_note("testuser", "tutorial about java")
+        
+        assert len(notes_manager.query_notes("testuser", "python")) == 2
+        assert len(notes_manager.query_notes("testuser", "prog*")) == 1
+        assert len(notes_manager.query_notes("testuser", "tutorial python")) == 1
+        
+        results = notes_manager.query_notes("testuser", '"python tutorial"')
+        assert [i for i, _ in results] == [0]
+    
+    def test_ranking_and_limit(self, notes_manager):
+        """Test that results are ranked by frequency and capped"""
+        notes_manager.add_note("testuser", "todo")
+        notes_manager.add_note("testuser", "todo todo todo")
+        notes_manager.add_note("testuser", "todo todo")
+        
+        results = notes_manager.query_notes("testuser", "todo", limit=2)
+        assert [i for i, _ in results] == [1, 2]
+
+    def test_limited_results_match_full_ranking(self):
+        """Test that a limited query returns the head of the full ranking, ties by position"""
+        from search_index import InvertedIndex
+
+        index = InvertedIndex.build(" ".join(["word"] * (i % 4 + 1)) for i in range(50))
+        full = index.query("word")
+        for limit in (1, 5, 13, 50, 80):
+            assert index.query("word", limit) == full[:limit]
+
+    def test_prefix_expansion_is_capped(self, monkeypatch):
+        """Test that a prefix only expands to a bounded number of tokens"""
+        import search_index
+
+        monkeypatch.setattr(search_index, "SEARCH_PREFIX_MAX_TOKENS", 3)
+        index = search_index.InvertedIndex.build(f"w{i}" for i in range(10))
+        assert len(index.query("w*")) == 3
+        assert index.query("w5*") == [(5, 1)]
+
+    def test_candidates_with_several_keyword_tokens(self):
+        """Test substring candidates when later tokens are checked per document"""
+        from search_index import InvertedIndex
+
+        index = InvertedIndex.build(
+            [f"filler{i}" for i in range(20)] + ["python tutorial", "python", "tutorial basics"]
+        )
+        assert index.candidates("tut pyth") == [20]
+        assert index.candidates("asic tutor") == [22]
+        assert index.candidates("python zzz") == []
+
+    def test_locked_notes_not_indexed(self, notes_manager):
+        """Test that locked notes never appear in query results"""
+        notes_manager.add_note("testuser", "secret plan", lock_key="key")
+        assert notes_manager.query_notes("testuser", "secret") == []
+    
+    def test_index_is_persisted(self, tmp_path, monkeypatch):
+        """Test that a saved index is reused by a new instance"""
+        import search_index
+        
+        notes_file = str(tmp_path / "notes.json")
+        manager = NotesManager(notes_file)
+        manager.add_note("testuser", "persisted index")
+        manager.query_notes("testuser", "index")
+        assert manager.flush() is True
+        
+        monkeypatch.setattr(
+            search_index.InvertedIndex, "build",
+            classmethod(lambda cls, texts: pytest.fail("index rebuilt")),
+        )
+        reopened = NotesManager(notes_file)
+        assert len(reopened.query_notes("testuser", "persisted")) == 1
+
+
+class TestTagQueries:
+    """Test tag index queries and facets"""
+    
+    def test_get_notes_by_tag(self, notes_manager):
+        """Test case-insensitive single tag lookup skipping locked notes"""
+        notes_manager.add_note("testuser", "Note 1", tags=["Work"])
+        notes_manager.add_note("testuser", "Note 2", tags=["work"], lock_key="key")
+        notes_manager.add_note("testuser", "Note 3", tags=["home"])
+        
+        results = notes_manager.get_notes_by_tag("testuser", "WORK")
+        assert [i for i, _ in results] == [0]
+    
+    def test_and_or_queries(self, notes_manager):
+        """Test multi-tag AND/OR queries"""
+        notes_manager.add_note("testuser", "Note 1", tags=["work", "urgent"])
+        notes_manager.add_note("testuser", "Note 2", tags=["work"])
+        notes_manager.add_note("testuser", "Note 3", tags=["urgent"])
+        
+        both = notes_manager.get_notes_by_tags("testuser", ["work", "urgent"])
+        either = notes_manager.get_notes_by_tags(
+            "testuser", ["work", "urgent"], match_all=False
+        )
+        assert [i for i, _ in both] == [0]
+        assert [i for i, _ in either] == [0, 1, 2]
+    
+    def test_index_follows_mutations(self, notes_manager):
+        """Test that tag edits and deletes update facets"""
+        notes_manager.add_note("testuser", "Note 1", tags=["work"])
+        notes_manager.add_note("testuser", "Note 2", tags=["work", "home"])
+        notes_manager.add_note("testuser", "Note 3", tags=["home"])
+        assert notes_manager.get_top_tags("testuser") == [("home", 2), ("work", 2)]
+        
+        notes_manager.delete_note("testuser", 0)
+        notes_manager.edit_note("testuser", 1, tags=["idea"])
+        
+        assert notes_manager.get_top_tags("testuser") == [("home", 1), ("idea", 1), ("work", 1)]
+        assert notes_manager.get_statistics("testuser")["unique_tags"] == 3
+        results = notes_manager.get_notes_by_tag("testuser", "home")
+        assert [i for i, _ in results] == [0]
+
 
 class TestNoteStatistics:
     """Test note statistics functionality"""
@@ -257,6 +539,33 @@ class TestNoteStatistics:
         assert stats["total"] == 3
         assert stats["locked"] == 1
         assert stats["unlocked"] == 2
+    
+    def test_statistics_follow_mutations(self, notes_manager):
+        """Test that counters are updated incrementally"""
+        notes_manager.add_note("testuser", "abc")
+        notes_manager.add_note("testuser", "defgh", lock_key="key")
+        assert notes_manager.get_statistics("testuser")["bytes"] == 8
+        
+        notes_manager.toggle_favorite("testuser", 0)
+        notes_manager.edit_note("testuser", 1, new_lock="", key="key")
+        notes_manager.add_note("testuser", "x")
+        notes_manager.delete_note("testuser", 0)
+        
+        stats = notes_manager.get_statistics("testuser")
+        assert stats["total"] == 2
+        assert stats["locked"] == 0
+        assert stats["favorites"] == 0
+        assert stats["bytes"] == 6
+    
+    def test_statistics_do_not_decode_notes(self, notes_manager, monkeypatch):
+        """Test that statistics never decode note bodies"""
+        import notes_manager as notes_module
+        
+        notes_manager.add_note("testuser", "Note 1")
+        monkeypatch.setattr(
+            notes_module, "decode_text", lambda text: pytest.fail("note decoded")
+        )
+        assert notes_manager.get_statistics("testuser")["total"] == 1
 
 
 class TestFavorites:
@@ -302,6 +611,65 @@ class TestExportImport:
         assert success is True
         assert export_file.exists()
     
+    def test_export_json_matches_previous_format(self, notes_manager, tmp_path):
+        """Test that streamed JSON equals a pretty-printed array"""
+        import json
+        
+        notes_manager.add_note("testuser", "Line 1\nLine 2", tags=["a"])
+        notes_manager.add_note("testuser", "Secret", lock_key="key")
+        notes_manager.add_note("testuser", "Catatan é")
+        
+        export_file = tmp_path / "export.json"
+        notes_manager.export_notes("testuser", str(export_file))
+        
+        text = export_file.read_text(encoding="utf-8")
+        data = json.loads(text)
+        assert [item["content"] for item in data] == ["Line 1\nLine 2", "Catatan é"]
+        assert text == json.dumps(data, indent=4, ensure_ascii=False)
+    
+    def test_export_jsonl_gzip_with_progress(self, notes_manager, tmp_path):
+        """Test JSON Lines export with gzip and progress reporting"""
+        import gzip
+        import json
+        
+        for i in range(3):
+            notes_manager.add_note("testuser", f"Note {i}")
+        
+        calls = []
+        export_file = tmp_path / "export.jsonl.gz"
+        success, _ = notes_manager.export_notes(
+            "testuser", str(export_file), fmt="jsonl",
+            progress=lambda done, total: calls.append((done, total)),
+        )
+        
+        assert success is True
+        with gzip.open(export_file, "rt", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert [line["content"] for line in lines] == ["Note 0", "Note 1", "Note 2"]
+        assert calls == [(1, 3), (2, 3), (3, 3)]
+
+    def test_export_locked_notes_needs_keys(self, notes_manager, tmp_path):
+        """Test that locked notes are exported only with their verified keys"""
+        import json
+
+        notes_manager.add_note("testuser", "Open")
+        notes_manager.add_note("testuser", "Secret", lock_key="key")
+        export_file = tmp_path / "export.json"
+
+        success, message = notes_manager.export_notes(
+            "testuser", str(export_file), include_locked=True)
+        assert success is False and "#2" in message
+        success, _ = notes_manager.export_notes(
+            "testuser", str(export_file), include_locked=True, lock_keys={2: "wrong"})
+        assert success is False
+        assert not export_file.exists()
+
+        success, _ = notes_manager.export_notes(
+            "testuser", str(export_file), include_locked=True, lock_keys={2: "key"})
+        assert success is True
+        data = json.loads(export_file.read_text(encoding="utf-8"))
+        assert [item["content"] for item in data] == ["Open", "Secret"]
+
     def test_export_empty_notes(self, notes_manager, tmp_path):
         """Test exporting when no notes exist"""
         export_file = tmp_path / "export.json"
@@ -309,6 +677,1287 @@ class TestExportImport:
         
         assert success is False
 
+    
+    def test_import_roundtrip(self, notes_manager, tmp_path):
+        """Test importing an exported JSON array"""
+        notes_manager.add_note("testuser", "Note 1", tags=["work"])
+        notes_manager.add_note("testuser", "Note 2")
+        export_file = tmp_path / "export.json"
+        notes_manager.export_notes("testuser", str(export_file))
+        
+        success, message = notes_manager.import_notes("other", str(export_file))
+        assert success is True
+        assert "2 catatan" in message
+        assert notes_manager.get_notes_by_tag("other", "work")[0][1]["id"] == 1
+    
+    def test_import_jsonl_in_chunks(self, notes_manager, tmp_path, monkeypatch):
+        """Test chunked JSON Lines import with one commit per chunk"""
+        import json
+        
+        import_file = tmp_path / "import.jsonl"
+        with open(import_file, "w", encoding="utf-8") as f:
+            for i in range(7):
+                f.write(json.dumps({"content": f"Note {i}"}) + "\n")
+            f.write(json.dumps({"content": ""}) + "\n")
+            f.write(json.dumps(["not", "an", "object"]) + "\n")
+        
+        commits = []
+        original = notes_manager._store.commit
+        monkeypatch.setattr(
+            notes_manager._store, "commit",
+            lambda changes=None: commits.append(changes) or original(changes),
+        )
+        
+        success, message = notes_manager.import_notes(
+            "testuser", str(import_file), chunk_size=3
+        )
+        assert success is True
+        assert "7 catatan" in message
+        assert len(commits) == 3
+        assert len(notes_manager.query_notes("testuser", "note", limit=100)) == 7
+    
+    def test_import_streams_small_chunks(self, tmp_path):
+        """Test the streaming reader across read boundaries"""
+        import json
+        from utils import iter_json_items
+        
+        items = [{"content": "x" * i, "tags": ["t"]} for i in range(50)]
+        import_file = tmp_path / "import.json"
+        import_file.write_text(json.dumps(items, indent=2), encoding="utf-8")
+        
+        assert list(iter_json_items(str(import_file), chunk_size=7)) == items
+    
+    def test_import_corrupt_file_rolls_back(self, notes_manager, tmp_path):
+        """Test that a parse error leaves no uncommitted notes behind"""
+        import_file = tmp_path / "import.json"
+        import_file.write_text('[{"content": "a"}, {"content": "b"}, {"cont', encoding="utf-8")
+        
+        success, message = notes_manager.import_notes("testuser", str(import_file))
+        assert success is False
+        assert notes_manager.get_notes("testuser") == []
+        assert notes_manager.get_statistics("testuser")["total"] == 0
+    
+    def test_import_invalid_format(self, notes_manager, tmp_path):
+        """Test importing a file that is not an array or JSON Lines"""
+        import_file = tmp_path / "import.json"
+        import_file.write_text('"just a string"', encoding="utf-8")
+        
+        success, message = notes_manager.import_notes("testuser", str(import_file))
+        assert success is False
+        assert "tidak valid" in message
+    
+    @pytest.mark.parametrize("text", [
+        '{"content": "a"}',
+        '{"notes": [{"content": "a"}]}',
+    ])
+    def test_import_rejects_top_level_object(self, notes_manager, tmp_path, text):
+        """Test that a JSON object is not mistaken for JSON Lines"""
+        import_file = tmp_path / "import.json"
+        import_file.write_text(text, encoding="utf-8")
+        
+        success, message = notes_manager.import_notes("testuser", str(import_file))
+        assert success is False
+        assert "tidak valid" in message
+        assert notes_manager.get_notes("testuser") == []
+    
+    @pytest.mark.parametrize("filename,text", [
+        ("import.json", '[{"content": "a"} {"content": "b"}]'),
+        ("import.json", '[{"content": "a"},, {"content": "b"}]'),
+        ("import.json", '[{"content": "a"},]'),
+        ("import.json", '[{"content": "a"}] {"content": "b"}'),
+        ("import.jsonl", '{"content": "a"} {"content": "b"}\n'),
+    ])
+    def test_import_rejects_missing_separators(self, notes_manager, tmp_path,
+                                               filename, text):
+        """Test that malformed separators are reported as a broken file"""
+        import_file = tmp_path / filename
+        import_file.write_text(text, encoding="utf-8")
+        
+        success, message = notes_manager.import_notes("testuser", str(import_file))
+        assert success is False
+        assert "Gagal membaca" in message
+        assert notes_manager.get_notes("testuser") == []
+
+
+class TestNoteIds:
+    """Test stable note ids"""
+    
+    def test_ids_are_not_reused_after_delete(self, notes_manager):
+        """Test that ids stay unique after deletes"""
+        notes_manager.add_note("testuser", "Note 1")
+        notes_manager.add_note("testuser", "Note 2")
+        notes_manager.delete_note("testuser", 1)
+        notes_manager.add_note("testuser", "Note 3")
+        
+        ids = [note["id"] for note in notes_manager.get_notes("testuser")]
+        assert ids == [1, 3]
+    
+    def test_id_based_api(self, notes_manager):
+        """Test lookups and mutations by id"""
+        notes_manager.add_note("testuser", "Note 1")
+        notes_manager.add_note("testuser", "Note 2", lock_key="key")
+        notes_manager.add_note("testuser", "Note 3")
+        notes_manager.delete_note_by_id("testuser", 1)
+        
+        assert notes_manager.get_note_by_id("testuser", 1) is None
+        assert notes_manager.view_note_by_id("testuser", 2, key="key") == (True, "Note 2")
+        assert notes_manager.edit_note_by_id("testuser", 3, new_content="Edited")[0] is True
+        assert notes_manager.toggle_favorite_by_id("testuser", 3)[0] is True
+        assert notes_manager.get_note_by_id("testuser", 3)["favorite"] is True
+        assert notes_manager.view_note_by_id("testuser", 3) == (True, "Edited")
+        assert notes_manager.delete_note_by_id("testuser", 99)[0] is False
+    
+    def test_legacy_duplicate_ids_are_repaired(self, temp_notes_file):
+        """Test that colliding ids from old data are reassigned"""
+        import json
+        
+        legacy = {"testuser": [
+            {"id": 1, "content": "YQ==", "lock": "", "is_locked": False,
+             "created_at": "", "updated_at": "", "tags": [], "favorite": False},
+            {"id": 1, "content": "Yg==", "lock": "", "is_locked": False,
+             "created_at": "", "updated_at": "", "tags": [], "favorite": False},
+        ]}
+        with open(temp_notes_file, "w", encoding="utf-8") as f:
+            json.dump(legacy, f)
+        
+        manager = NotesManager(temp_notes_file)
+        assert manager.view_note_by_id("testuser", 2) == (True, "b")
+        
+        manager.add_note("testuser", "c")
+        ids = [note["id"] for note in NotesManager(temp_notes_file).get_notes("testuser")]
+        assert ids == [1, 2, 3]
+    
+    def test_id_counter_persists_on_sqlite(self, tmp_path):
+        """Test that the id counter is stored by the SQLite backend"""
+        from storage import open_store
+        
+        notes_file = str(tmp_path / "notes.json")
+        manager = NotesManager(notes_file, store=open_store(notes_file, "sqlite"))
+        manager.add_note("testuser", "Note 1")
+        manager.add_note("testuser", "Note 2")
+        manager.delete_note("testuser", 1)
+        
+        reopened = NotesManager(notes_file, store=open_store(notes_file, "sqlite"))
+        reopened.add_note("testuser", "Note 3")
+        assert [note["id"] for note in reopened.get_notes("testuser")] == [1, 3]
+
+
+class TestNoteBatch:
+    """Test batch mutations"""
+    
+    def test_batch_applies_all_operations(self, notes_manager):
+        """Test that a batch applies mixed operations with one commit"""
+        for i in range(3):
+            notes_manager.add_note("testuser", f"Note {i}", tags=["old"])
+        
+        commits = []
+        original_commit = notes_manager._store.commit
+        notes_manager._store.commit = lambda changes=None: (
+            commits.append(changes) or original_commit(changes)
+        )
+        
+        with notes_manager.batch("testuser") as batch:
+            batch.add("New note", tags=["new"])
+            batch.edit(1, new_content="Edited")
+            batch.add_tags(1, ["extra"])
+            batch.remove_tags(3, ["old"])
+            batch.set_favorite(3)
+            batch.delete(2)
+        
+        assert batch.success is True
+        assert batch.added_ids == [4]
+        assert len(commits) == 1
+        
+        notes = notes_manager.get_notes("testuser")
+        assert [note["id"] for note in notes] == [1, 3, 4]
+        assert notes_manager.view_note_by_id("testuser", 1) == (True, "Edited")
+        assert notes[0]["tags"] == ["old", "extra"]
+        assert notes[1]["tags"] == [] and notes[1]["favorite"] is True
+        assert notes_manager.search_notes("testuser", "edited")[0][0] == 0
+        assert notes_manager.get_statistics("testuser")["favorites"] == 1
+    
+    def test_failed_operation_rolls_back_batch(self, notes_manager):
+        """Test that one failing operation discards the whole batch"""
+        notes_manager.add_note("testuser", "Note 1")
+        notes_manager.add_note("testuser", "Secret", lock_key="key")
+        notes_manager.search_notes("testuser", "note")
+        
+        with notes_manager.batch("testuser") as batch:
+            batch.add("New note")
+            batch.edit(1, new_content="Edited", tags=["x"])
+            batch.delete(2, key="wrong")
+        
+        assert batch.success is False
+        assert "#3" in batch.message
+        notes = notes_manager.get_notes("testuser")
+        assert len(notes) == 2
+        assert notes_manager.view_note_by_id("testuser", 1) == (True, "Note 1")
+        assert notes[0]["tags"] == []
+        assert notes_manager.search_notes("testuser", "edited") == []
+        
+        # Id yang dialokasikan batch gagal dipakai ulang
+        notes_manager.add_note("testuser", "Note 3")
+        assert notes_manager.get_notes("testuser")[-1]["id"] == 3
+    
+    def test_batch_is_persisted(self, notes_manager, temp_notes_file):
+        """Test that batch changes reach the file"""
+        notes_manager.add_note("testuser", "Note 1")
+        
+        with notes_manager.batch("testuser") as batch:
+            batch.add("Note 2")
+            batch.set_tags(1, ["a", "b"])
+        
+        reloaded = NotesManager(temp_notes_file)
+        notes = reloaded.get_notes("testuser")
+        assert len(notes) == 2
+        assert notes[0]["tags"] == ["a", "b"]
+    
+    def test_exception_discards_batch(self, notes_manager):
+        """Test that an exception inside the with block applies nothing"""
+        with pytest.raises(KeyError):
+            with notes_manager.batch("testuser") as batch:
+                batch.add("Note 1")
+                raise KeyError("stop")
+        
+        assert batch.success is None
+        assert notes_manager.get_notes("testuser") == []
+
+    def test_failed_save_drops_journal_records(self, tmp_path, monkeypatch):
+        """Test that a batch rolled back after a failed save leaves no log records behind"""
+        from storage import JournalStore
+
+        notes_file = str(tmp_path / "notes.json")
+        store = JournalStore(notes_file)
+        manager = NotesManager(notes_file, store=store)
+        manager.add_note("testuser", "Note 1")
+        manager.add_note("testuser", "Note 2")
+
+        monkeypatch.setattr(store, "_write", lambda data: False)
+        with manager.batch("testuser") as batch:
+            batch.add("Note 3")
+            batch.delete(1)
+        monkeypatch.undo()
+
+        assert batch.success is False
+        assert manager.add_note("testuser", "Note 4")[0] is True
+
+        expected = [note["id"] for note in manager.get_notes("testuser")]
+        reopened = NotesManager(notes_file, store=JournalStore(notes_file))
+        assert [note["id"] for note in reopened.get_notes("testuser")] == expected
+        assert len(expected) == 3
+
+
+
+class TestBodyStore:
+    """Test note bodies stored outside the metadata file"""
+    
+    @pytest.fixture
+    def body_manager(self, temp_notes_file):
+        manager = NotesManager(temp_notes_file, external_bodies=True)
+        yield manager
+        manager.close()
+    
+    def test_bodies_are_not_in_metadata(self, body_manager, temp_notes_file):
+        """Test that note contents live in the body file"""
+        body_manager.add_note("testuser", "Isi rahasia ✓", tags=["work"])
+        
+        note = body_manager.get_notes("testuser")[0]
+        assert "content" not in note
+        assert note["body"] == [0, len("Isi rahasia ✓".encode())]
+        with open(temp_notes_file, encoding="utf-8") as f:
+            assert "Isi rahasia" not in f.read()
+        
+        reopened = NotesManager(temp_notes_file)
+        assert reopened.view_note("testuser", 0) == (True, "Isi rahasia ✓")
+        assert reopened.get_statistics("testuser")["bytes"] == note["body"][1]
+        reopened.close()
+    
+    def test_edit_search_and_export(self, body_manager, tmp_path):
+        """Test that edits, search and export read the body file"""
+        body_manager.add_note("testuser", "First note")
+        body_manager.add_note("testuser", "Second note")
+        body_manager.edit_note("testuser", 0, new_content="Edited note")
+        
+        assert body_manager.view_note("testuser", 0) == (True, "Edited note")
+        assert [i for i, _ in body_manager.search_notes("testuser", "edited")] == [0]
+        assert [i for i, _ in body_manager.query_notes("testuser", "second")] == [1]
+        
+        export_file = str(tmp_path / "export.json")
+        assert body_manager.export_notes("testuser", export_file)[0] is True
+        import json
+        with open(export_file, encoding="utf-8") as f:
+            assert [item["content"] for item in json.load(f)] == ["Edited note", "Second note"]
+    
+    def test_listing_reads_only_previews(self, body_manager, monkeypatch):
+        """Test that listing never reads whole bodies"""
+        from body_store import BodyStore
+        
+        body_manager.add_note("testuser", "x" * 1000)
+        body_manager.add_note("testuser", "Short")
+        
+        reads = []
+        original_read = BodyStore.read
+        monkeypatch.setattr(BodyStore, "read", lambda self, ref, limit=None: (
+            reads.append(limit) or original_read(self, ref, limit)
+        ))
+        
+        page, total = body_manager.list_notes("testuser")
+        assert total == 2 and reads == []
+        
+        body_manager.display_notes_list("testuser")
+        assert reads and all(limit is not None for limit in reads)
+    
+    def test_inline_notes_still_work(self, temp_notes_file):
+        """Test mixing inline notes with externally stored ones"""
+        NotesManager(temp_notes_file).add_note("testuser", "Inline note")
+        
+        manager = NotesManager(temp_notes_file, external_bodies=True)
+        manager.add_note("testuser", "External note")
+        manager.edit_note("testuser", 0, new_content="Now external")
+        
+        notes = manager.get_notes("testuser")
+        assert all("body" in note and "content" not in note for note in notes)
+        assert manager.view_note("testuser", 0) == (True, "Now external")
+        assert manager.view_note("testuser", 1) == (True, "External note")
+        manager.close()
+
+class TestNoteEncryption:
+    """Test authenticated encryption of note contents"""
+    
+    @pytest.fixture
+    def encrypted_manager(self, temp_notes_file):
+        pytest.importorskip("cryptography")
+        manager = NotesManager(temp_notes_file, encryption="aesgcm")
+        assert manager.open_session("testuser", "password123")[0] is True
+        yield manager
+        manager.close()
+    
+    def test_contents_encrypted_at_rest(self, encrypted_manager, temp_notes_file):
+        """Test that only metadata stays readable without the password"""
+        encrypted_manager.add_note("testuser", "Isi rahasia ✓", tags=["kerja"])
+        encrypted_manager.flush()
+        
+        with open(temp_notes_file, encoding="utf-8") as f:
+            raw = f.read()
+        assert "kerja" in raw
+        assert "Isi rahasia" not in raw
+        
+        reopened = NotesManager(temp_notes_file, encryption="aesgcm")
+        assert reopened.view_note("testuser", 0)[0] is False
+        assert reopened.open_session("testuser", "wrongpass")[0] is False
+        page, total = reopened.list_notes("testuser")
+        assert total == 1 and page[0][1]["tags"] == ["kerja"]
+        assert reopened.add_note("testuser", "Baru")[0] is False
+        
+        assert reopened.open_session("testuser", "password123")[0] is True
+        assert reopened.view_note("testuser", 0) == (True, "Isi rahasia ✓")
+        
+        reopened.end_session("testuser")
+        assert reopened.view_note("testuser", 0)[0] is False
+    
+    def test_search_and_export_with_session(self, encrypted_manager, tmp_path):
+        """Test that search, previews and export decrypt with an open session"""
+        encrypted_manager.add_note("testuser", "Python tutorial")
+        encrypted_manager.add_note("testuser", "Belanja sayur")
+        encrypted_manager.edit_note("testuser", 1, new_content="Belanja buah")
+        
+        assert [i for i, _ in encrypted_manager.search_notes("testuser", "buah")] == [1]
+        assert [i for i, _ in encrypted_manager.query_notes("testuser", "python")] == [0]
+        assert encrypted_manager._note_preview(encrypted_manager.get_notes("testuser")[0]) \
+            == "Python tutorial"
+        
+        export_file = str(tmp_path / "export.json")
+        assert encrypted_manager.export_notes("testuser", export_file)[0] is True
+        
+        encrypted_manager.end_session("testuser")
+        assert encrypted_manager.search_notes("testuser", "buah") == []
+        assert encrypted_manager.export_notes("testuser", export_file)[0] is False
+    
+    def test_search_uses_blind_index(self, encrypted_manager, temp_notes_file, monkeypatch):
+        """Test that keyword search matches token hashes without decrypting"""
+        from note_cipher import NoteCipher
+        
+        encrypted_manager.add_note("testuser", "Rapat proyek Python besok")
+        encrypted_manager.add_note("testuser", "Resep nasi goreng")
+        encrypted_manager.add_note("testuser", "Python rahasia", lock_key="kunci")
+        encrypted_manager.edit_note("testuser", 1, new_content="Resep mie goreng")
+        encrypted_manager.flush()
+        
+        with open(temp_notes_file, encoding="utf-8") as f:
+            raw = f.read()
+        assert "python" not in raw.lower() and "goreng" not in raw
+        
+        def no_decrypt(*args, **kwargs):
+            raise AssertionError("search must not decrypt")
+        monkeypatch.setattr(NoteCipher, "iter_decrypt", no_decrypt)
+        
+        assert [i for i, _ in encrypted_manager.search_notes("testuser", "python")] == [0]
+        assert [i for i, _ in encrypted_manager.search_notes("testuser", "MIE goreng")] == [1]
+        assert encrypted_manager.search_notes("testuser", "nasi") == []
+        assert [i for i, _ in encrypted_manager.query_notes("testuser", '"proyek python"')] == [0]
+        assert encrypted_manager.query_notes("testuser", "pyth*") == []
+        
+        encrypted_manager.delete_note("testuser", 0)
+        assert encrypted_manager.search_notes("testuser", "python") == []
+        assert [i for i, _ in encrypted_manager.search_notes("testuser", "resep")] == [0]
+    
+    def test_chunked_bodies_decrypt_incrementally(self, temp_notes_file, monkeypatch):
+        """Test chunked ciphertext in the body file and previews reading one chunk"""
+        pytest.importorskip("cryptography")
+        from body_store import BodyStore
+        
+        manager = NotesManager(temp_notes_file, external_bodies=True,
+                               encryption="chacha20poly1305")
+        manager.open_session("testuser", "password123")
+        manager._keys.get("testuser").chunk_size = 64
+        text = "é" * 1000
+        manager.add_note("testuser", text)
+        
+        success, pieces = manager.open_note("testuser", 0)
+        assert success is True
+        pieces = list(pieces)
+        assert len(pieces) > 1 and "".join(pieces) == text
+        
+        reads = []
+        original_read = BodyStore.read_bytes
+        monkeypatch.setattr(BodyStore, "read_bytes", lambda self, ref: (
+            reads.append(ref[1]) or original_read(self, ref)
+        ))
+        assert manager._note_preview(manager.get_notes("testuser")[0]).startswith("é")
+        assert sum(reads) < 200
+        
+        manager.close()
+    
+    def test_tampered_content_is_rejected(self, encrypted_manager):
+        """Test that modified ciphertext fails authentication"""
+        encrypted_manager.add_note("testuser", "Jangan diubah")
+        note = encrypted_manager._user_notes("testuser")[0]
+        
+        import base64
+        blob = bytearray(base64.b64decode(note["content"]))
+        blob[-1] ^= 1
+        note["content"] = base64.b64encode(bytes(blob)).decode()
+        
+        assert encrypted_manager.view_note("testuser", 0) == (True, "[ERROR: Data rusak]")
+    
+    def test_change_password_rewraps_key(self, encrypted_manager, temp_notes_file):
+        """Test that a new password opens the same data key"""
+        encrypted_manager.add_note("testuser", "Tetap terbaca")
+        assert encrypted_manager.change_password("testuser", "salah", "newpass456")[0] is False
+        assert encrypted_manager.change_password("testuser", "password123", "newpass456")[0] is True
+        encrypted_manager.flush()
+        
+        reopened = NotesManager(temp_notes_file, encryption="aesgcm")
+        assert reopened.open_session("testuser", "password123")[0] is False
+        assert reopened.open_session("testuser", "newpass456")[0] is True
+        assert reopened.view_note("testuser", 0) == (True, "Tetap terbaca")
+
+    def test_each_content_uses_its_own_key(self):
+        """Test that contents get a fresh salt-derived key, not just a nonce prefix"""
+        pytest.importorskip("cryptography")
+        import secrets
+        from note_cipher import HEADER_SIZE, NoteCipher, parse_header
+        
+        cipher = NoteCipher(secrets.token_bytes(32), b"k" * 8, "aesgcm", chunk_size=4)
+        first, second = cipher.encrypt("sama saja"), cipher.encrypt("sama saja")
+        assert parse_header(first)[3] != parse_header(second)[3]
+        assert cipher.decrypt(first) == cipher.decrypt(second) == "sama saja"
+        
+        # Chunk isi lain tidak bisa didekripsi di bawah header (salt) isi ini
+        with pytest.raises(ValueError):
+            cipher.decrypt(second[:HEADER_SIZE] + first[HEADER_SIZE:])
+    
+    def test_user_password_change_rewraps_key(self, encrypted_manager, temp_notes_file,
+                                              tmp_path):
+        """Test that UserManager.change_password keeps encrypted notes readable"""
+        import asyncio
+        from async_manager import AsyncUserManager
+        from user_manager import UserManager
+        
+        users = UserManager(str(tmp_path / "users.json"), notes_manager=encrypted_manager)
+        users.register("testuser", "password123")
+        encrypted_manager.add_note("testuser", "Tetap terbaca")
+        
+        assert users.change_password("testuser", "password123", "newpass456")[0] is True
+        
+        async def change_back():
+            async with AsyncUserManager(users) as async_users:
+                return await async_users.change_password("testuser", "newpass456", "lagi789xyz")
+        assert asyncio.run(change_back())[0] is True
+        encrypted_manager.flush()
+        
+        assert users.login("testuser", "lagi789xyz")[0] is True
+        reopened = NotesManager(temp_notes_file, encryption="aesgcm")
+        assert reopened.open_session("testuser", "newpass456")[0] is False
+        assert reopened.open_session("testuser", "lagi789xyz")[0] is True
+        assert reopened.view_note("testuser", 0) == (True, "Tetap terbaca")
+    
+    def test_failed_password_save_keeps_data_key(self, encrypted_manager, temp_notes_file,
+                                                 tmp_path, monkeypatch):
+        """Test that the data key is wrapped back when the user record is not saved"""
+        from user_manager import UserManager
+        
+        users = UserManager(str(tmp_path / "users.json"), notes_manager=encrypted_manager)
+        users.register("testuser", "password123")
+        encrypted_manager.add_note("testuser", "Tetap terbaca")
+        monkeypatch.setattr(users._store, "commit", lambda changes=None: False)
+        
+        assert users.change_password("testuser", "password123", "newpass456")[0] is False
+        encrypted_manager.flush()
+        
+        reopened = NotesManager(temp_notes_file, encryption="aesgcm")
+        assert reopened.open_session("testuser", "password123")[0] is True
+        assert reopened.view_note("testuser", 0) == (True, "Tetap terbaca")
+
+class TestWriteBackStore:
+    """Test in-memory store behaviour"""
+    
+    def test_external_change_is_reloaded(self, notes_manager, temp_notes_file):
+        """Test that changes by another instance are picked up"""
+        notes_manager.add_note("testuser", "Note 1")
+        assert len(notes_manager.get_notes("testuser")) == 1
+        
+        other = NotesManager(temp_notes_file)
+        other.add_note("testuser", "Note 2")
+        
+        assert len(notes_manager.get_notes("testuser")) == 2
+    
+    def test_batched_flush(self, temp_notes_file):
+        """Test that batched commits are written on flush"""
+        from storage import JsonStore
+        
+        store = JsonStore(temp_notes_file, flush_interval=3600, max_pending=1000)
+        manager = NotesManager(temp_notes_file, store=store)
+        manager.add_note("testuser", "Note 1")
+        manager.add_note("testuser", "Note 2")
+        
+        assert len(NotesManager(temp_notes_file).get_notes("testuser")) == 0
+        
+        assert manager.flush() is True
+        assert len(NotesManager(temp_notes_file).get_notes("testuser")) == 2
+
+    
+    def test_failed_save_keeps_previous_file(self, notes_manager, temp_notes_file):
+        """Test that an interrupted save leaves the old file intact"""
+        import os
+        from utils import save_data
+        
+        notes_manager.add_note("testuser", "Note 1")
+        with open(temp_notes_file, encoding="utf-8") as f:
+            before = f.read()
+        
+        assert save_data(temp_notes_file, {"testuser": [object()]}) is False
+        
+        with open(temp_notes_file, encoding="utf-8") as f:
+            assert f.read() == before
+        prefix = "." + os.path.basename(temp_notes_file)
+        leftovers = [name for name in os.listdir(os.path.dirname(temp_notes_file))
+                     if name.startswith(prefix) and name.endswith(".tmp")]
+        assert leftovers == []
+
+    def test_failed_commit_is_rolled_back(self, notes_manager, temp_notes_file, monkeypatch):
+        """Test that a change whose save failed is not written by a later commit"""
+        notes_manager.add_note("testuser", "Note 1")
+        notes_manager.add_note("testuser", "Note 2")
+        notes_manager.search_notes("testuser", "note")
+
+        monkeypatch.setattr(notes_manager._store, "_write", lambda data: False)
+        assert notes_manager.add_note("testuser", "Rejected")[0] is False
+        assert notes_manager.add_note("newuser", "Rejected")[0] is False
+        assert notes_manager.edit_note("testuser", 0, new_content="Rejected")[0] is False
+        assert notes_manager.toggle_favorite("testuser", 0)[0] is False
+        assert notes_manager.delete_note("testuser", 1)[0] is False
+        monkeypatch.undo()
+
+        notes = notes_manager.get_notes("testuser")
+        assert [note["id"] for note in notes] == [1, 2]
+        assert notes_manager.view_note("testuser", 0) == (True, "Note 1")
+        assert notes[0]["favorite"] is False
+        assert notes_manager.search_notes("testuser", "rejected") == []
+        assert notes_manager.get_statistics("testuser")["total"] == 2
+
+        assert notes_manager.add_note("testuser", "Note 3")[0] is True
+        reopened = NotesManager(temp_notes_file)
+        assert [note["id"] for note in reopened.get_notes("testuser")] == [1, 2, 3]
+        assert reopened.get_notes("newuser") == []
+
+    def test_returned_notes_are_copies(self, notes_manager):
+        """Test that changing a returned note does not change stored data"""
+        notes_manager.add_note("testuser", "Note 1", tags=["a"])
+
+        note = notes_manager.get_note_by_index("testuser", 0)
+        note["favorite"] = True
+        note["tags"].append("b")
+        notes_manager.get_notes("testuser")[0]["tags"].append("c")
+        notes_manager.list_notes("testuser")[0][0][1]["is_locked"] = True
+
+        stored = notes_manager.get_note_by_id("testuser", 1)
+        assert stored["favorite"] is False
+        assert stored["tags"] == ["a"]
+        assert stored["is_locked"] is False
+
+    @pytest.mark.parametrize("durability", ["none", "file", "dir"])
+    def test_durability_levels(self, tmp_path, durability):
+        """Test that every durability level writes a readable file"""
+        from utils import load_data, save_data
+        
+        filename = str(tmp_path / "data.json")
+        assert save_data(filename, {"a": 1}, durability=durability) is True
+        assert load_data(filename) == {"a": 1}
+
+    
+    @pytest.mark.parametrize("fmt", ["json", "compact", "jsonl", "marshal"])
+    def test_storage_formats_are_detected(self, notes_manager, temp_notes_file, fmt):
+        """Test that every storage format is read back transparently"""
+        from utils import load_data, save_data
+        
+        notes_manager.add_note("testuser", "Catatan ✓", tags=["a"])
+        notes_manager.add_note("other", "Note 2")
+        data = load_data(temp_notes_file)
+        
+        assert save_data(temp_notes_file, data, fmt=fmt) is True
+        assert load_data(temp_notes_file) == data
+        
+        reloaded = NotesManager(temp_notes_file)
+        assert reloaded.view_note("testuser", 0) == (True, "Catatan ✓")
+        reloaded.add_note("testuser", "Note 3")
+        assert len(NotesManager(temp_notes_file).get_notes("testuser")) == 2
+    
+    def test_compact_formats_are_smaller(self, tmp_path):
+        """Test that compact formats produce smaller files than indented JSON"""
+        import os
+        from utils import save_data
+        
+        data = {f"user{i}": [{"id": j, "tags": ["x"], "favorite": False}
+                             for j in range(20)] for i in range(10)}
+        sizes = {}
+        for fmt in ("json", "compact", "marshal"):
+            filename = str(tmp_path / f"data.{fmt}")
+            save_data(filename, data, fmt=fmt)
+            sizes[fmt] = os.path.getsize(filename)
+        
+        assert sizes["compact"] < sizes["json"]
+        assert sizes["marshal"] < sizes["json"]
+    
+    def test_unknown_storage_format(self, tmp_path):
+        """Test that an unknown format is rejected"""
+        from utils import save_data
+        
+        with pytest.raises(ValueError):
+            save_data(str(tmp_path / "data.json"), {}, fmt="xml")
+
+
+class TestJournalStore:
+    """Test journal storage mode"""
+    
+    def test_log_is_replayed(self, tmp_path):
+        """Test that mutations survive via the log"""
+        from storage import JournalStore
+        
+        notes_file = str(tmp_path / "notes.json")
+        manager = NotesManager(notes_file, store=JournalStore(notes_file))
+        manager.add_note("testuser", "Note 1")
+        manager.add_note("testuser", "Note 2")
+        manager.toggle_favorite("testuser", 1)
+        manager.delete_note("testuser", 0)
+        
+        assert (tmp_path / "notes.json.log").exists()
+        
+        reopened = NotesManager(notes_file, store=JournalStore(notes_file))
+        notes = reopened.get_notes("testuser")
+        assert len(notes) == 1
+        assert notes[0]["favorite"] is True
+    
+    def test_compaction(self, tmp_path):
+        """Test that a large log is folded into the snapshot"""
+        from storage import JournalStore
+        
+        notes_file = str(tmp_path / "notes.json")
+        store = JournalStore(notes_file, compact_size=200)
+        manager = NotesManager(notes_file, store=store)
+        for i in range(10):
+            manager.add_note("testuser", f"Note {i}")
+        
+        assert os.path.getsize(store.log_file) < 1000
+        
+        reopened = NotesManager(notes_file, store=JournalStore(notes_file))
+        assert len(reopened.get_notes("testuser")) == 10
+    
+    def test_truncated_record_is_ignored(self, tmp_path):
+        """Test recovery from a torn write at the end of the log"""
+        from storage import JournalStore
+        
+        notes_file = str(tmp_path / "notes.json")
+        manager = NotesManager(notes_file, store=JournalStore(notes_file))
+        manager.add_note("testuser", "Note 1")
+        
+        with open(notes_file + ".log", "a", encoding="utf-8") as f:
+            f.write('{"op":"append","path":["testuser"],"val')
+        
+        reopened = NotesManager(notes_file, store=JournalStore(notes_file))
+        assert len(reopened.get_notes("testuser")) == 1
+        
+        reopened.add_note("testuser", "Note 2")
+        again = NotesManager(notes_file, store=JournalStore(notes_file))
+        assert len(again.get_notes("testuser")) == 2
+
+
+def _open_process_manager(notes_file, backend):
+    from storage import JournalStore, JsonStore
+    
+    store_class = JournalStore if backend == "journal" else JsonStore
+    return NotesManager(notes_file, store=store_class(notes_file))
+
+
+def _add_notes_from_process(notes_file, backend, username, count):
+    manager = _open_process_manager(notes_file, backend)
+    for i in range(count):
+        # Kalah bentrok dengan proses lain: data sudah dimuat ulang, ulangi
+        while not manager.add_note(username, f"{username} {i}")[0]:
+            pass
+    manager.close()
+
+
+class TestMultiProcessStore:
+    """Test file locking and optimistic versioning between processes"""
+    
+    def test_other_users_changes_are_merged(self, tmp_path):
+        """Test that a flush keeps what another process wrote for other keys"""
+        from storage import JsonStore
+        
+        notes_file = str(tmp_path / "notes.json")
+        first = NotesManager(notes_file, store=JsonStore(notes_file, flush_interval=60))
+        second = NotesManager(notes_file)
+        
+        assert first.add_note("alice", "Alice note")[0] is True
+        assert second.add_note("bob", "Bob note")[0] is True
+        assert first.flush() is True
+        
+        reopened = NotesManager(notes_file)
+        assert len(reopened.get_notes("alice")) == 1
+        assert len(reopened.get_notes("bob")) == 1
+    
+    def test_conflicting_change_is_rejected(self, tmp_path):
+        """Test that a stale write to the same key is refused, not lost silently"""
+        from storage import JsonStore
+        
+        notes_file = str(tmp_path / "notes.json")
+        first = NotesManager(notes_file, store=JsonStore(notes_file, flush_interval=60))
+        second = NotesManager(notes_file)
+        
+        first.add_note("alice", "From first")
+        second.add_note("alice", "From second")
+        assert first.flush() is False
+        
+        assert [n["id"] for n in first.get_notes("alice")] == [1]
+        assert first.view_note("alice", 0) == (True, "From second")
+        assert first.add_note("alice", "Retried")[0] is True
+        first.flush()
+        
+        reopened = NotesManager(notes_file)
+        assert [n["id"] for n in reopened.get_notes("alice")] == [1, 2]
+    
+    def test_pinned_store_is_not_reloaded_mid_operation(self, tmp_path):
+        """Test that another process's write cannot swap data under an operation"""
+        from storage import JsonStore
+        
+        notes_file = str(tmp_path / "notes.json")
+        store = JsonStore(notes_file)
+        NotesManager(notes_file, store=store).add_note("alice", "First")
+        
+        with store.pinned():
+            notes = store.get("alice")
+            NotesManager(notes_file).add_note("bob", "Bob note")
+            assert store.get("alice") is notes
+            notes.append({"id": 99, "content": "Late"})
+            assert store.commit([("append", ["alice"], notes[-1])]) is True
+        
+        reopened = JsonStore(notes_file)
+        assert len(reopened.get("alice")) == 2
+        assert len(reopened.get("bob")) == 1
+
+    @pytest.mark.parametrize("backend", ["json", "journal"])
+    def test_other_users_indexes_survive_a_reload(self, tmp_path, monkeypatch, backend):
+        """Test that another process's write only invalidates that user's index"""
+        import search_index
+        from storage import JsonStore, JournalStore
+        
+        store_class = JsonStore if backend == "json" else JournalStore
+        notes_file = str(tmp_path / "notes.json")
+        writer = NotesManager(notes_file, store=store_class(notes_file, flush_interval=0))
+        writer.add_note("alice", "Apel merah")
+        writer.add_note("bob", "Apel hijau")
+        
+        manager = NotesManager(notes_file, store=store_class(notes_file, check_interval=0))
+        assert len(manager.search_notes("alice", "apel")) == 1
+        assert len(manager.search_notes("bob", "apel")) == 1
+        
+        builds = []
+        original = search_index.InvertedIndex.build
+        monkeypatch.setattr(search_index.InvertedIndex, "build",
+                            lambda values: builds.append(1) or original(values))
+        
+        writer.add_note("bob", "Apel busuk")
+        assert len(manager.search_notes("alice", "apel")) == 1
+        assert builds == []
+        assert len(manager.search_notes("bob", "apel")) == 2
+        assert builds == [1]
+    
+    @pytest.mark.parametrize("backend", ["json", "journal"])
+    def test_readers_are_not_blocked_by_a_write(self, tmp_path, monkeypatch, backend):
+        """Test that serializing and writing the file does not hold the store for other users"""
+        import threading
+        from storage import JournalStore, JsonStore
+
+        notes_file = str(tmp_path / "notes.json")
+        store = (JournalStore if backend == "journal" else JsonStore)(notes_file)
+        store.setdefault("bob", []).append({"id": 1})
+        assert store.commit([("append", ["bob"], store.get("bob")[-1])]) is True
+
+        writing, release = threading.Event(), threading.Event()
+        original = store._write
+
+        def slow_write(data):
+            writing.set()
+            release.wait(10)
+            return original(data)
+
+        monkeypatch.setattr(store, "_write", slow_write)
+        result = {}
+
+        def writer():
+            notes = store.setdefault("alice", [])
+            notes.append({"id": 1})
+            result["alice"] = store.commit([("append", ["alice"], notes[-1])])
+
+        def reader():
+            with store.pinned():
+                result["bob"] = len(store.get("bob"))
+                notes = store.get("bob")
+                notes.append({"id": 2})
+                store.flush_interval = 60
+                result["commit"] = store.commit([("append", ["bob"], notes[-1])])
+
+        writing_thread = threading.Thread(target=writer)
+        writing_thread.start()
+        assert writing.wait(10)
+        reading_thread = threading.Thread(target=reader)
+        reading_thread.start()
+        reading_thread.join(5)
+        assert not reading_thread.is_alive()
+        release.set()
+        writing_thread.join(10)
+        monkeypatch.undo()
+
+        assert result == {"alice": True, "bob": 1, "commit": True}
+        assert store.flush() is True
+        reopened = JsonStore(notes_file) if backend == "json" else JournalStore(notes_file)
+        assert len(reopened.get("alice")) == 1
+        assert len(reopened.get("bob")) == 2
+
+    def test_merge_under_pinned_thread_rejects_its_commit(self, tmp_path):
+        """Test that a key swapped by another thread's merge is not committed silently"""
+        import threading
+        from storage import JsonStore
+
+        notes_file = str(tmp_path / "notes.json")
+        store = JsonStore(notes_file)
+        NotesManager(notes_file, store=store).add_note("bob", "First")
+        holding, merged = threading.Event(), threading.Event()
+        result = {}
+
+        def pinned_writer():
+            with store.pinned():
+                notes = store.get("bob")
+                holding.set()
+                merged.wait(10)
+                notes.append({"id": 99, "content": "Late"})
+                result["commit"] = store.commit([("append", ["bob"], notes[-1])])
+
+        worker = threading.Thread(target=pinned_writer)
+        worker.start()
+        assert holding.wait(10)
+        NotesManager(notes_file).add_note("bob", "From other store")
+        store.setdefault("alice", []).append({"id": 1, "content": "Alice"})
+        assert store.commit([("append", ["alice"], store.get("alice")[-1])]) is True
+        merged.set()
+        worker.join(10)
+
+        assert result["commit"] is False
+        assert [n["id"] for n in store.get("bob")] == [1, 2]
+        reopened = JsonStore(notes_file)
+        assert [n["id"] for n in reopened.get("bob")] == [1, 2]
+        assert len(reopened.get("alice")) == 1
+
+    @pytest.mark.parametrize("backend", ["json", "journal"])
+    def test_concurrent_processes_lose_nothing(self, tmp_path, backend):
+        """Test several worker processes writing to one data file"""
+        import multiprocessing
+        
+        if not hasattr(os, "fork"):
+            pytest.skip("needs fork")
+        
+        notes_file = str(tmp_path / "notes.json")
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=_add_notes_from_process,
+                            args=(notes_file, backend, username, 10))
+            for username in ("alice", "alice", "bob", "carol")
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            assert worker.exitcode == 0
+        
+        manager = _open_process_manager(notes_file, backend)
+        alice_ids = [note["id"] for note in manager.get_notes("alice")]
+        assert len(alice_ids) == 20 and len(set(alice_ids)) == 20
+        assert len(manager.get_notes("bob")) == 10
+        assert len(manager.get_notes("carol")) == 10
+
+
+class TestThreadSafety:
+    """Test per-user reader/writer locking for threaded use"""
+    
+    def test_readers_share_and_writer_waits(self):
+        """Test that readers overlap while a writer waits for them"""
+        import threading
+        from rw_lock import RWLock
+        
+        lock = RWLock()
+        both_reading = threading.Barrier(2, timeout=5)
+        writer_done = threading.Event()
+        
+        def reader():
+            with lock.read():
+                both_reading.wait()
+        
+        def writer():
+            with lock.write():
+                writer_done.set()
+        
+        with lock.read():
+            thread = threading.Thread(target=reader)
+            thread.start()
+            both_reading.wait()
+            thread.join()
+            
+            writing = threading.Thread(target=writer)
+            writing.start()
+            assert writer_done.wait(0.1) is False
+        writing.join(5)
+        assert writer_done.is_set()
+    
+    def test_read_lock_is_reentrant_but_not_upgradable(self):
+        """Test nesting rules of the reader/writer lock"""
+        from rw_lock import RWLock
+        
+        lock = RWLock()
+        with lock.write(), lock.read(), lock.write():
+            pass
+        with lock.read(), lock.read():
+            with pytest.raises(RuntimeError):
+                with lock.write():
+                    pass
+    
+    def test_other_users_are_not_blocked(self, notes_manager):
+        """Test that a writer on one user does not block another user"""
+        import threading
+        
+        notes_manager.add_note("alice", "Alice note")
+        result = []
+        
+        with notes_manager._user_locks.get("alice").write():
+            reader = threading.Thread(
+                target=lambda: result.append(len(notes_manager.get_notes("alice")))
+            )
+            reader.start()
+            assert notes_manager.add_note("bob", "Bob note")[0] is True
+            reader.join(0.1)
+            assert reader.is_alive() and result == []
+        
+        reader.join(5)
+        assert result == [1]
+    
+    @pytest.mark.parametrize("backend", ["json", "journal", "sharded", "sqlite"])
+    def test_thread_pool_loses_nothing(self, tmp_path, backend):
+        """Test many threads adding, editing and reading notes at once"""
+        from concurrent.futures import ThreadPoolExecutor
+        from storage import open_store
+        
+        notes_file = str(tmp_path / "notes.json")
+        manager = NotesManager(notes_file, store=open_store(notes_file, backend))
+        users = ["alice", "bob", "carol", "dave"]
+        
+        def work(job):
+            username = users[job % len(users)]
+            assert manager.add_note(username, f"{username} note {job}", tags=["t"])[0]
+            assert manager.edit_note(username, 0, new_content=f"{username} first")[0]
+            assert manager.search_notes(username, username)
+            return len(manager.get_notes(username))
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(work, range(80)))
+        manager.close()
+        
+        reopened = NotesManager(notes_file, store=open_store(notes_file, backend))
+        for username in users:
+            notes = reopened.get_notes(username)
+            assert len(notes) == 20
+            assert len({note["id"] for note in notes}) == 20
+            assert reopened.view_note(username, 0) == (True, f"{username} first")
+
+
+class TestAsyncNotesManager:
+    """Test the asyncio wrapper around NotesManager"""
+    
+    def test_shares_storage_with_sync_manager(self, notes_manager):
+        """Test concurrent awaited operations on the same store"""
+        import asyncio
+        from async_manager import AsyncNotesManager
+        
+        async def run():
+            notes = AsyncNotesManager(notes_manager, max_pending=4)
+            added = await asyncio.gather(*(
+                notes.add_note(username, f"{username} note {i}")
+                for i in range(10) for username in ("alice", "bob")
+            ))
+            assert all(ok for ok, _ in added)
+            
+            success, chunks = await notes.open_note("alice", 0)
+            assert success is True
+            assert "".join([chunk async for chunk in chunks]) == "alice note 0"
+            
+            batch = notes.batch("bob")
+            batch.delete(1)
+            batch.add("Batched")
+            assert (await notes.commit_batch(batch))[0] is True
+            return await notes.search_notes("bob", "batched")
+        
+        found = asyncio.run(run())
+        assert len(found) == 1
+        assert len(notes_manager.get_notes("alice")) == 10
+        assert len(notes_manager.get_notes("bob")) == 10
+
+
+class TestShardedStore:
+    """Test per-user sharded note files"""
+    
+    def test_users_are_stored_separately(self, tmp_path):
+        """Test that each user gets their own shard file"""
+        from storage import ShardedStore
+        
+        notes_file = str(tmp_path / "notes.json")
+        manager = NotesManager(notes_file, store=ShardedStore(notes_file))
+        manager.add_note("alice", "Alice note")
+        manager.add_note("bob", "Bob note")
+        manager.add_note("bob", "Bob note 2")
+        
+        shards = list((tmp_path / "notes.d").glob("*.json"))
+        assert len(shards) == 2
+        assert not any("alice" in shard.name for shard in shards)
+        
+        reopened = NotesManager(notes_file, store=ShardedStore(notes_file))
+        assert len(reopened.get_notes("alice")) == 1
+        assert len(reopened.get_notes("bob")) == 2
+        assert sorted(reopened._store.keys()) == ["alice", "bob"]
+    
+    def test_edit_only_touches_own_shard(self, tmp_path):
+        """Test that a mutation rewrites only the owner's shard"""
+        from storage import ShardedStore
+        
+        notes_file = str(tmp_path / "notes.json")
+        store = ShardedStore(notes_file)
+        manager = NotesManager(notes_file, store=store)
+        manager.add_note("alice", "Alice note")
+        manager.add_note("bob", "Bob note")
+        
+        bob_shard = store._shard_path("bob")
+        before = os.stat(bob_shard).st_mtime_ns
+        manager.edit_note("alice", 0, new_content="Edited")
+
+        assert os.stat(bob_shard).st_mtime_ns == before
+
+    def test_shards_do_not_hold_lock_files_open(self, tmp_path):
+        """Test that many shards neither keep descriptors open nor lock missing users"""
+        from storage import ShardedStore
+
+        if not os.path.isdir("/proc/self/fd"):
+            pytest.skip("needs /proc")
+
+        notes_file = str(tmp_path / "notes.json")
+        manager = NotesManager(notes_file, store=ShardedStore(notes_file))
+        for i in range(50):
+            assert manager.get_notes(f"ghost{i}") == []
+        assert not (tmp_path / "notes.d").exists()
+
+        before = len(os.listdir("/proc/self/fd"))
+        for i in range(50):
+            assert manager.add_note(f"user{i}", "Note")[0] is True
+        assert len(os.listdir("/proc/self/fd")) - before < 5
+        assert len(list((tmp_path / "notes.d").glob("*.lock"))) == 50
+
+    def test_encrypted_user_without_notes_keeps_data_key(self, tmp_path):
+        """Test that a session opened before the first note keeps its wrapped key"""
+        pytest.importorskip("cryptography")
+        from storage import ShardedStore
+
+        notes_file = str(tmp_path / "notes.json")
+        manager = NotesManager(notes_file, store=ShardedStore(notes_file), encryption="aesgcm")
+        assert manager.open_session("alice", "password123")[0] is True
+        assert os.path.exists(manager._store._shard_path("alice"))
+        assert manager.add_note("alice", "Rahasia")[0] is True
+        manager.close()
+
+        reopened = NotesManager(notes_file, store=ShardedStore(notes_file), encryption="aesgcm")
+        assert reopened.open_session("alice", "password123")[0] is True
+        assert reopened.view_note("alice", 0) == (True, "Rahasia")
+        assert reopened._store.keys() == ["alice"]
+
+
+class TestSqliteBackend:
+    """Test SQLite storage backend"""
+    
+    @pytest.fixture
+    def sqlite_manager(self, tmp_path):
+        from storage import open_store
+        
+        notes_file = str(tmp_path / "notes.json")
+        return NotesManager(notes_file, store=open_store(notes_file, "sqlite"))
+    
+    def test_crud_roundtrip(self, sqlite_manager, tmp_path):
+        """Test add, edit, delete and favorite through SQLite"""
+        from sqlite_store import SqliteNoteStore
+        
+        sqlite_manager.add_note("testuser", "Note 1", tags=["work"])
+        sqlite_manager.add_note("testuser", "Note 2")
+        sqlite_manager.add_note("testuser", "Note 3")
+        sqlite_manager.edit_note("testuser", 0, new_content="Edited")
+        sqlite_manager.toggle_favorite("testuser", 2)
+        sqlite_manager.delete_note("testuser", 1)
+        
+        reopened = NotesManager(
+            str(tmp_path / "notes.json"),
+            store=SqliteNoteStore(str(tmp_path / "notes.db")),
+        )
+        notes = reopened.get_notes("testuser")
+        assert len(notes) == 2
+        assert reopened.view_note("testuser", 0) == (True, "Edited")
+        assert notes[1]["favorite"] is True
+    
+    def test_batch_with_deletes_and_adds(self, sqlite_manager):
+        """Test that a mixed batch keeps the row cache in sync"""
+        for i in range(3):
+            sqlite_manager.add_note("testuser", f"Note {i}")
+        
+        with sqlite_manager.batch("testuser") as batch:
+            batch.delete(1)
+            batch.add("Note 3")
+            batch.add("Note 4")
+            batch.delete(2)
+        
+        assert batch.success is True
+        ids = [note["id"] for note in sqlite_manager.get_notes("testuser")]
+        assert ids == [3, 4, 5]
+        assert sqlite_manager.delete_note_by_id("testuser", 4)[0] is True
+        assert [note["id"] for note in sqlite_manager.get_notes("testuser")] == [3, 5]
+    
+    def test_external_commit_invalidates_cache(self, sqlite_manager, tmp_path):
+        """Test that writes through another connection are visible"""
+        from sqlite_store import SqliteNoteStore
+        
+        sqlite_manager.add_note("testuser", "Note 1")
+        assert len(sqlite_manager.get_notes("testuser")) == 1
+        
+        other = NotesManager(
+            str(tmp_path / "notes.json"),
+            store=SqliteNoteStore(str(tmp_path / "notes.db")),
+        )
+        other.add_note("testuser", "Note 2")
+        
+        assert len(sqlite_manager.get_notes("testuser")) == 2
+
+    def test_failed_commit_invalidates_indexes(self, sqlite_manager, monkeypatch):
+        """Test that indexes rebuild after a rolled back transaction drops the cache"""
+        import sqlite3
+
+        sqlite_manager.add_note("testuser", "Alpha note")
+        sqlite_manager.add_note("testuser", "Beta note")
+        assert len(sqlite_manager.search_notes("testuser", "note")) == 2
+        sqlite_manager.get_statistics("testuser")
+
+        def fail(change):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(sqlite_manager._store, "_apply", fail)
+        assert sqlite_manager.add_note("testuser", "Gamma note")[0] is False
+        monkeypatch.undo()
+
+        assert len(sqlite_manager.get_notes("testuser")) == 2
+        assert len(sqlite_manager.search_notes("testuser", "note")) == 2
+        assert sqlite_manager.query_notes("testuser", "gamma") == []
+        assert sqlite_manager.get_statistics("testuser")["total"] == 2
+
+    def test_migrate_from_json(self, tmp_path):
+        """Test migrating users.json and notes.json to SQLite"""
+        from migrate import migrate_to_sqlite
+        from sqlite_store import SqliteNoteStore
+        from user_manager import UserManager
+        
+        user_file = str(tmp_path / "users.json")
+        notes_file = str(tmp_path / "notes.json")
+        UserManager(user_file).register("testuser", "password123")
+        json_manager = NotesManager(notes_file)
+        json_manager.add_note("testuser", "Note 1", tags=["work"])
+        json_manager.add_note("testuser", "Note 2")
+        
+        success, message = migrate_to_sqlite(user_file, notes_file)
+        assert success is True
+        
+        migrated = NotesManager(notes_file, store=SqliteNoteStore(str(tmp_path / "notes.db")))
+        assert len(migrated.get_notes("testuser")) == 2
+
+    @pytest.mark.parametrize("backend", ["journal", "sharded"])
+    def test_migrate_reads_configured_backend(self, tmp_path, backend):
+        """Test that journal records and shards are migrated, not just the JSON file"""
+        from migrate import migrate_to_sqlite
+        from sqlite_store import SqliteNoteStore
+        from storage import open_store
+        from user_manager import UserManager
+
+        user_file = str(tmp_path / "users.json")
+        notes_file = str(tmp_path / "notes.json")
+        UserManager(user_file, store=open_store(user_file, backend, "users")).register(
+            "testuser", "password123")
+        manager = NotesManager(notes_file, store=open_store(notes_file, backend))
+        manager.add_note("testuser", "Note 1", tags=["work"])
+        manager.add_note("testuser", "Note 2")
+        manager.flush()
+
+        success, message = migrate_to_sqlite(user_file, notes_file, backend)
+        assert success is True
+        assert "1 pengguna dan 2 catatan" in message
+
+        migrated = NotesManager(notes_file, store=SqliteNoteStore(str(tmp_path / "notes.db")))
+        assert len(migrated.get_notes("testuser")) == 2
+        assert migrated.get_notes_by_tag("testuser", "work")
+
+    def test_migrate_refuses_empty_source_with_shards(self, tmp_path):
+        """Test that migrating with the wrong source backend fails loudly"""
+        from migrate import migrate_to_sqlite
+        from storage import open_store
+
+        notes_file = str(tmp_path / "notes.json")
+        manager = NotesManager(notes_file, store=open_store(notes_file, "sharded"))
+        manager.add_note("testuser", "Note 1")
+        manager.flush()
+
+        success, message = migrate_to_sqlite(str(tmp_path / "users.json"), notes_file, "json")
+        assert success is False
+        assert "notes.d" in message
+        assert not (tmp_path / "notes.db").exists()
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
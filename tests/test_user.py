@@ -5,7 +5,6 @@ Unit tests for UserManager
 import os
 import sys
 import pytest
-import tempfile
 import json
 
 # Add src to path
@@ -14,14 +13,17 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 from user_manager import UserManager
 
 
+@pytest.fixture(autouse=True)
+def fast_kdf(monkeypatch):
+    """Use a cheap key-derivation cost so tests stay fast"""
+    import kdf
+    monkeypatch.setattr(kdf, "KDF_PBKDF2_ITERATIONS", 1000)
+
+
 @pytest.fixture
-def temp_user_file():
-    """Create temporary user file for testing"""
-    fd, path = tempfile.mkstemp(suffix='.json')
-    os.close(fd)
-    yield path
-    if os.path.exists(path):
-        os.unlink(path)
+def temp_user_file(tmp_path):
+    """Temporary user file; sidecars (.lock, .log) go in the same temp dir"""
+    return str(tmp_path / "users.json")
 
 
 @pytest.fixture
@@ -183,5 +185,310 @@ class TestUserStats:
         assert "created_at" in stats
 
 
+class TestUserCache:
+    """Test cached user records"""
+    
+    def test_logins_do_not_reparse_file(self, user_manager, monkeypatch):
+        """Test that repeated lookups reuse the parsed users file"""
+        import storage
+        
+        user_manager.register("testuser", "password123")
+        
+        loads = []
+        original_load = storage.load_data
+        monkeypatch.setattr(storage, "load_data", lambda filename: (
+            loads.append(filename) or original_load(filename)
+        ))
+        
+        for _ in range(20):
+            assert user_manager.login("testuser", "password123")[0] is True
+            assert user_manager.user_exists("testuser") is True
+            user_manager.get_user_stats("testuser")
+        
+        assert loads == []
+    
+    def test_external_change_is_reloaded(self, user_manager, temp_user_file):
+        """Test that another instance's writes invalidate the cache"""
+        user_manager.register("testuser", "password123")
+        assert user_manager.get_all_users() == ["testuser"]
+        
+        UserManager(temp_user_file).register("other", "password123")
+        
+        assert user_manager.user_exists("other") is True
+    
+    def test_check_interval_throttles_mtime_checks(self, temp_user_file, monkeypatch):
+        """Test that a check interval skips stat calls between checks"""
+        from storage import JsonStore
+        
+        store = JsonStore(temp_user_file, check_interval=3600)
+        manager = UserManager(temp_user_file, store=store)
+        manager.register("testuser", "password123")
+        
+        UserManager(temp_user_file).register("other", "password123")
+        assert manager.user_exists("other") is False
+        
+        store.check_interval = 0
+        assert manager.user_exists("other") is True
+
+    def test_failed_save_is_rolled_back(self, user_manager, temp_user_file, monkeypatch):
+        """Test that changes whose save failed are not written by a later commit"""
+        user_manager.register("testuser", "password123")
+
+        monkeypatch.setattr(user_manager._store, "_write", lambda data: False)
+        assert user_manager.register("newuser", "password123")[0] is False
+        assert user_manager.update_profile("testuser", email="x@example.com")[0] is False
+        assert user_manager.change_password("testuser", "password123", "newpass456")[0] is False
+        assert user_manager.delete_user("testuser", "password123")[0] is False
+        monkeypatch.undo()
+
+        assert user_manager.user_exists("newuser") is False
+        assert user_manager.get_user_info("testuser")["profile"]["email"] is None
+        assert user_manager.register("other", "password123")[0] is True
+
+        reopened = UserManager(temp_user_file)
+        assert sorted(reopened.get_all_users()) == ["other", "testuser"]
+        assert reopened.login("testuser", "password123")[0] is True
+        assert reopened.get_user_info("testuser")["profile"]["email"] is None
+
+
+class TestLoginActivity:
+    """Test buffered login bookkeeping"""
+    
+    def test_login_does_not_rewrite_users(self, user_manager, temp_user_file):
+        """Test that logins are buffered until flush"""
+        user_manager.register("testuser", "password123")
+        mtime = os.stat(temp_user_file).st_mtime_ns
+        
+        for _ in range(3):
+            assert user_manager.login("testuser", "password123")[0] is True
+        
+        assert os.stat(temp_user_file).st_mtime_ns == mtime
+        assert user_manager.get_user_info("testuser")["login_count"] == 3
+        assert UserManager(temp_user_file).get_user_info("testuser")["login_count"] == 0
+        
+        assert user_manager.flush() is True
+        info = UserManager(temp_user_file).get_user_info("testuser")
+        assert info["login_count"] == 3
+        assert info["last_login"] is not None
+    
+    def test_max_pending_triggers_flush(self, temp_user_file):
+        """Test that a full buffer is written in one commit"""
+        from activity import ActivityRecorder
+        
+        manager = UserManager(temp_user_file)
+        manager._activity = ActivityRecorder(manager._store, flush_interval=3600,
+                                             max_pending=2)
+        manager.register("alice", "password123")
+        manager.register("bob", "password123")
+        manager.login("alice", "password123")
+        manager.login("bob", "password123")
+        
+        reopened = UserManager(temp_user_file)
+        assert reopened.get_user_info("alice")["login_count"] == 1
+        assert reopened.get_user_info("bob")["login_count"] == 1
+    
+    def test_deleted_user_activity_is_dropped(self, user_manager):
+        """Test that buffered logins of a deleted account are discarded"""
+        user_manager.register("testuser", "password123")
+        user_manager.login("testuser", "password123")
+        user_manager.delete_user("testuser", "password123")
+        
+        assert user_manager.flush() is True
+        assert user_manager.user_exists("testuser") is False
+
+
+class TestKeyDerivation:
+    """Test password hashing with the KDF module"""
+    
+    @pytest.mark.parametrize("algorithm,params", [
+        ("pbkdf2_sha256", {"iterations": 1000}),
+        ("scrypt", {"n": 1024, "r": 8, "p": 1}),
+    ])
+    def test_hash_roundtrip(self, algorithm, params):
+        """Test hashing and verifying with each algorithm"""
+        from kdf import hash_secret, verify_secret, needs_rehash
+        
+        encoded = hash_secret("password123", algorithm, params)
+        assert encoded.startswith(algorithm + "$")
+        assert encoded != hash_secret("password123", algorithm, params)
+        assert verify_secret(encoded, "password123") is True
+        assert verify_secret(encoded, "wrong") is False
+        assert needs_rehash(encoded, algorithm, params) is False
+    
+    def test_passwords_use_kdf(self, user_manager, temp_user_file):
+        """Test that registered passwords are stored as KDF hashes"""
+        user_manager.register("testuser", "password123")
+        
+        with open(temp_user_file, encoding="utf-8") as f:
+            stored = json.load(f)["testuser"]["password"]
+        assert stored.startswith("pbkdf2_sha256$1000$")
+    
+    def test_legacy_hash_is_upgraded_on_login(self, user_manager, temp_user_file):
+        """Test that old salted SHA-256 hashes still work and get rehashed"""
+        import hashlib
+        
+        legacy = "abcd$" + hashlib.sha256(b"abcdpassword123").hexdigest()
+        with open(temp_user_file, "w", encoding="utf-8") as f:
+            json.dump({"testuser": {"password": legacy, "created_at": None,
+                                    "login_count": 0, "profile": {}}}, f)
+        
+        assert user_manager.login("testuser", "wrongpass")[0] is False
+        assert user_manager.login("testuser", "password123")[0] is True
+        
+        stored = UserManager(temp_user_file)._get_user("testuser")["password"]
+        assert stored.startswith("pbkdf2_sha256$")
+        assert user_manager.login("testuser", "password123")[0] is True
+    
+    def test_cost_change_triggers_rehash(self, user_manager, monkeypatch):
+        """Test that raising the configured cost rehashes on next login"""
+        import kdf
+        
+        user_manager.register("testuser", "password123")
+        monkeypatch.setattr(kdf, "KDF_PBKDF2_ITERATIONS", 2000)
+        
+        user_manager.login("testuser", "password123")
+        assert user_manager._get_user("testuser")["password"].startswith("pbkdf2_sha256$2000$")
+    
+    def test_calibrate_meets_target(self):
+        """Test that calibration returns parameters near the target"""
+        from kdf import calibrate
+        
+        params = calibrate(target_ms=5, algorithm="pbkdf2_sha256")
+        assert params["iterations"] >= 1000
+
+
+class TestVerificationExecutor:
+    """Test offloading KDF work to an executor"""
+    
+    @pytest.mark.parametrize("kind", ["thread", "process"])
+    def test_login_through_executor(self, temp_user_file, kind):
+        """Test register and login with hashing done in a pool"""
+        from verifier import VerificationExecutor
+        
+        verifier = VerificationExecutor(kind, workers=2)
+        try:
+            manager = UserManager(temp_user_file, verifier=verifier)
+            assert manager.register("testuser", "password123")[0] is True
+            assert manager.login("testuser", "password123")[0] is True
+            assert manager.login("testuser", "wrongpass")[0] is False
+            assert manager._get_user("testuser")["password"].startswith("pbkdf2_sha256$1000$")
+        finally:
+            verifier.shutdown()
+    
+    def test_queue_is_bounded(self):
+        """Test that submissions wait when the queue is full"""
+        import threading
+        from verifier import VerificationExecutor
+        
+        verifier = VerificationExecutor("thread", workers=1, max_queue=1)
+        release = threading.Event()
+        try:
+            blocked = verifier.submit(release.wait)
+            with pytest.raises(TimeoutError):
+                verifier.submit(release.wait, timeout=0.05)
+            
+            release.set()
+            blocked.result(timeout=5)
+            assert verifier.submit(release.wait, timeout=5).result(timeout=5) is True
+        finally:
+            release.set()
+            verifier.shutdown()
+    
+    def test_async_api(self):
+        """Test awaiting verification from an event loop"""
+        import asyncio
+        from verifier import VerificationExecutor
+        
+        verifier = VerificationExecutor("thread", workers=2)
+        
+        async def run():
+            encoded = await verifier.hash_async("password123")
+            results = await asyncio.gather(
+                verifier.verify_async(encoded, "password123"),
+                verifier.verify_async(encoded, "wrongpass"),
+            )
+            return results
+        
+        try:
+            assert asyncio.run(run()) == [True, False]
+        finally:
+            verifier.shutdown()
+
+
+class TestAsyncUserManager:
+    """Test the asyncio wrapper around UserManager"""
+    
+    def test_concurrent_requests(self, user_manager):
+        """Test many awaited requests, including racing registrations"""
+        import asyncio
+        from async_manager import AsyncUserManager
+        
+        async def run():
+            async with AsyncUserManager(user_manager, max_pending=4) as users:
+                racing = await asyncio.gather(
+                    *(users.register("testuser", "password123") for _ in range(5))
+                )
+                others = await asyncio.gather(
+                    *(users.register(f"user{i}", "password123") for i in range(10))
+                )
+                logins = await asyncio.gather(
+                    *(users.login(f"user{i}", "password123") for i in range(10))
+                )
+                return racing, others, logins, await users.get_all_users()
+        
+        racing, others, logins, all_users = asyncio.run(run())
+        assert [ok for ok, _ in racing].count(True) == 1
+        assert all(ok for ok, _ in others + logins)
+        assert len(all_users) == 11
+    
+    def test_backpressure(self, user_manager):
+        """Test that requests wait for a slot and time out when full"""
+        import asyncio
+        import threading
+        from async_manager import AsyncUserManager
+        
+        release = threading.Event()
+        user_manager.get_all_users = lambda: release.wait(5) and []
+        
+        async def run():
+            users = AsyncUserManager(user_manager, max_pending=1, timeout=0.05)
+            blocked = asyncio.ensure_future(users.get_all_users())
+            await asyncio.sleep(0.01)
+            with pytest.raises(TimeoutError):
+                await users.user_exists("testuser")
+            
+            release.set()
+            assert await blocked == []
+            assert await users.user_exists("testuser") is False
+            await users.close()
+        
+        try:
+            asyncio.run(run())
+        finally:
+            release.set()
+
+
+class TestSqliteBackend:
+    """Test UserManager on the SQLite storage backend"""
+    
+    def test_register_login_delete(self, tmp_path):
+        """Test user lifecycle persisted in SQLite"""
+        from storage import open_store
+        
+        user_file = str(tmp_path / "users.json")
+        manager = UserManager(user_file, store=open_store(user_file, "sqlite", kind="users"))
+        manager.register("testuser", "password123")
+        manager.register("other", "password123")
+        assert manager.login("testuser", "password123")[0] is True
+        assert manager.flush() is True
+        
+        reopened = UserManager(user_file, store=open_store(user_file, "sqlite", kind="users"))
+        assert reopened.get_user_info("testuser")["login_count"] == 1
+        assert sorted(reopened.get_all_users()) == ["other", "testuser"]
+        
+        assert reopened.delete_user("other", "password123")[0] is True
+        assert manager.user_exists("other") is False
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])